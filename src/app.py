@@ -1,6 +1,6 @@
 # src/app.py
 import asyncio
-import re
+import concurrent.futures
 import threading
 import time
 import os
@@ -9,25 +9,91 @@ from .core.listener import AssistantListener # pyaudio is likely used by Assista
 from .ui.chat_gui import ChatUI
 from .core.listener import AssistantListener
 from .core.dspy_handler import DspyHandler
-from .config.settings import load_settings, save_settings_from_string, save_settings_from_dict
+from .core.wake_word import create_wake_word_detector
+from .core.streaming_stt import create_streaming_recognizer
+from .core.speculation import SpeculativeDispatcher
+from .core.conversation_memory import ConversationMemory
+from .services.speech_pipeline import SpeechPipeline
+from .services.tts_service import prewarm_cache
+from .services.client_registry import registry as client_registry
+from .services.conversation_store import ConversationStore
+from .config.settings import load_settings, save_settings_from_string, save_settings_from_dict, SettingsChangeEvent
+from .config.settings import store as settings_store
+from .config.settings import HISTORY_DB_FILE
 import json # For converting dict to json string for UI
 
+# Settings that only DspyHandler depends on; changing them never touches the listener, and vice versa.
+DSPY_SETTINGS_KEYS = (
+    'GOOGLE_API_KEY', 'mcp_servers', 'mcp_lazy_start', 'mcp_startup_timeout_seconds',
+    'mcp_ping_interval_seconds', 'mcp_max_backoff_seconds', 'router_enabled', 'router_tool_threshold',
+    'react_max_tools', 'parallel_tool_calls', 'lm_history_size',
+    'tool_cache_ttl_seconds', 'tool_cache_read_only', 'tool_cache_default_ttl_seconds',
+)
+LISTENER_SETTINGS_KEYS = (
+    'assistant_name', 'wake_word_engine', 'wake_word_templates', 'wake_word_threshold', 'wake_word_energy_threshold',
+    'stt_engine', 'vosk_model_path',
+)
+
 class Application:
     def __init__(self, root):
         self.root = root
         self.settings = load_settings()
+        self.root.render_pump.fps = max(1, self.settings.get('ui_frame_rate', 30))
+        self.root.transcript_window = max(1, self.settings.get('ui_transcript_window', 200))
+        self.root.transcript_page_size = max(1, self.settings.get('history_page_size', 20))
         self.assistant_name = self.settings.get('assistant_name', 'gemini')
 
-        self.dspy_handler = DspyHandler()
-        self.listener = AssistantListener(assistant_name=self.assistant_name, callback=self.on_wake_word_detected)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.run_async_loop, daemon=True)
+        self.thread.start()
 
-        self.conversation_history = []
+        # MCP sessions are opened on self.loop, where the responses (and so the tool calls) run.
+        self.dspy_handler = DspyHandler(loop=self.loop)
+        self.listener = self._create_listener()
+        self._listener_lock = threading.Lock()
+
+        # Recent turns within a token budget; older ones are summarized in the background.
+        self.conversation_history = ConversationMemory(
+            token_budget=self.settings.get('history_token_budget', 2000),
+            summary_tokens=self.settings.get('history_summary_tokens', 300),
+            summarize=self.dspy_handler.summarize_conversation,
+            loop=self.loop,
+        )
         self.is_in_conversation_mode = False
         self.wait_timer = None
 
-        self.loop = asyncio.new_event_loop()
-        self.thread = threading.Thread(target=self.run_async_loop, daemon=True)
-        self.thread.start()
+        # Every turn is written to disk in the background; the chat window pages older turns in from there.
+        self.conversation_store = None
+        self._history_reader = None
+        if self.settings.get('store_conversations', True):
+            try:
+                self.conversation_store = ConversationStore(HISTORY_DB_FILE)
+                newest = self.conversation_store.page(limit=1)
+                self._resume_before_id = newest[-1].id + 1 if newest else 0 # Turns of earlier sessions are below this
+                # Later reads run on one long-lived thread, which keeps a single SQLite read connection open.
+                self._history_reader = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-reader")
+                self.conversation_store.close_reader() # The main thread doesn't read again
+                self.root.load_older_callback = self._load_older_messages
+            except Exception as e:
+                print(f"Conversation history store unavailable: {e}")
+                self.conversation_store = None
+
+        # Speaks responses sentence by sentence while they are still streaming in.
+        self.speech = None
+        if self.settings.get('speak_responses', True) and self.settings.get('ELEVENLABS_API_KEY'):
+            self.speech = SpeechPipeline()
+            prewarm_cache(self.settings.get('tts_prewarm_phrases', []))
+            self.root.stop_speaking_callback = self.speech.stop # Escape cuts the spoken answer off
+
+        # Starts the LLM on stable partial transcripts so it overlaps with the user's trailing silence.
+        self.speculator = None
+        if self.settings.get('speculative_dispatch', True):
+            self.speculator = SpeculativeDispatcher(
+                self.loop,
+                start_response=self._start_speculative_response,
+                stable_seconds=self.settings.get('speculation_stable_ms', 300) / 1000,
+                can_speculate=lambda text: self.dspy_handler.is_speculation_safe(text),
+            )
 
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         self.listener.start()
@@ -37,6 +103,50 @@ class Application:
         initial_settings_json_str = json.dumps(self.settings, indent=4)
         self.root.update_settings_json_for_modal(initial_settings_json_str)
         self.root.save_settings_callback = self._on_save_settings_from_ui
+        # Saves from the UI and edits to the file on disk both arrive here as change events.
+        self._unsubscribe_settings = settings_store.subscribe(self._on_settings_changed)
+        settings_store.start_watching()
+
+    def _create_listener(self):
+        """Builds the wake word listener, with a local detector and streaming STT if configured."""
+        return AssistantListener(
+            assistant_name=self.assistant_name,
+            callback=self.on_wake_word_detected,
+            wake_word_detector=create_wake_word_detector(self.settings),
+            streaming_recognizer=create_streaming_recognizer(self.settings),
+        )
+
+    def _record_turn(self, role, content):
+        """Adds a turn to the prompt memory and queues it for the on-disk store. Returns its stored id, if any."""
+        self.conversation_history.append(role, content)
+        if self.conversation_store:
+            return self.conversation_store.append(role, content)
+        return None
+
+    def _load_older_messages(self, before_id):
+        """Reads the page of stored turns before `before_id` off the UI thread and hands it to the chat window."""
+        page_size = max(1, self.settings.get('history_page_size', 20))
+
+        def _load():
+            try:
+                messages = self.conversation_store.page(before_id if before_id is not None else self._resume_before_id, page_size)
+            except Exception as e:
+                print(f"Error loading older conversation turns: {e}")
+                messages = []
+            self.root.prepend_messages(messages)
+
+        self._history_reader.submit(_load)
+
+    def _start_speculative_response(self, partial_text):
+        """Begins a response as if `partial_text` were the final command, without touching the history."""
+        history = self.conversation_history.context(extra={"role": "user", "content": partial_text})
+        return self.dspy_handler.get_streamed_response(history)
+
+    def _on_partial_transcript(self, text):
+        """Shows a partial transcript and lets the speculator decide whether to start the LLM early."""
+        self.root.set_partial_transcript(text)
+        if self.speculator:
+            self.speculator.on_partial(text)
 
     def run_async_loop(self):
         """Runs the asyncio event loop in a separate thread."""
@@ -60,16 +170,22 @@ class Application:
         self.wait_timer = threading.Timer(15.0, _exit_mode)
         self.wait_timer.start()
 
-    def on_wake_word_detected(self):
-        """Kicks off the conversation when the wake word is heard."""
+    def on_wake_word_detected(self, command=None, phrase_end=None):
+        """
+        Kicks off the conversation when the wake word is heard.
+        `command` is whatever was said after the wake word in the same phrase, and `phrase_end` is the
+        listener's ring position where that phrase ended.
+        """
         if not self.is_in_conversation_mode:
-            threading.Thread(target=self.run_conversation, daemon=True).start()
+            threading.Thread(target=self.run_conversation, args=(command, phrase_end), daemon=True).start()
 
-    def run_conversation(self):
+    def run_conversation(self, initial_command=None, phrase_end=None):
         """Manages a single, continuous conversation from start to finish."""
         self.is_in_conversation_mode = True
         self.listener.stop()
         print("Wake word detected. Starting conversation.")
+        if initial_command:
+            print(f"Using command spoken with the wake word: '{initial_command}'")
         
         # Start the inactivity timer for the first command attempt.
         self.start_wait_timer()
@@ -82,22 +198,37 @@ class Application:
             # The 15s timer is for inactivity *between* full interaction turns.
             self.cancel_wait_timer()
 
-            command = self.listener.listen_and_transcribe()
+            if initial_command:
+                # The wake phrase already carried a command, so skip a listen/STT cycle for this turn.
+                command, initial_command = initial_command, None
+            else:
+                # Only the first command right after the wake phrase is read from its end; later ones start live,
+                # so the spoken answer still in the ring buffer is never transcribed as a command.
+                command = self.listener.listen_and_transcribe(on_partial=self._on_partial_transcript, start_position=phrase_end)
+                self.root.set_partial_transcript("")
+            phrase_end = None
 
             if not self.is_in_conversation_mode:
                 # Conversation mode might have been set to False by the timer expiring
                 # (e.g., if previous listen attempt yielded no command, timer started, then expired).
                 print("Conversation mode ended (likely by inactivity timer).")
+                if self.speculator:
+                    self.speculator.reset()
                 break
 
             if command: # A command was successfully transcribed
-                self.root.add_message("You", command)
-                self.conversation_history.append({"role": "user", "content": command})
+                # Hand over a speculative response if it was started from the same text, else cancel it.
+                speculation = self.speculator.resolve(command) if self.speculator else None
+                turn_started_at = time.perf_counter()
+                self.root.add_message("You", command, self._record_turn("user", command))
                 streaming_done_event = threading.Event()
                 asyncio.run_coroutine_threadsafe(
-                    self.stream_response(streaming_done_event), self.loop
+                    self.stream_response(streaming_done_event, speculation, turn_started_at), self.loop
                 )
                 streaming_done_event.wait()
+                if self.speech:
+                    # Don't listen for the next command while the answer is still being spoken.
+                    self.speech.wait_until_idle()
                 
                 if self.is_in_conversation_mode:
                     # After a successful interaction, restart the inactivity timer for the next turn.
@@ -109,6 +240,8 @@ class Application:
                     break
             else:
                 # No command heard (e.g., listener's internal timeout for speech to start expired)
+                if self.speculator:
+                    self.speculator.reset()
                 if self.is_in_conversation_mode:
                     print("No command heard in this attempt. Restarting inactivity timer.")
                     self.start_wait_timer() # User was silent, so restart main inactivity timer.
@@ -122,38 +255,37 @@ class Application:
         self.listener.start()
         self.root.set_status(f"Listening for '{self.assistant_name}'...")
 
-    async def stream_response(self, done_event: threading.Event):
-        """Streams the LLM response to the UI and signals completion."""
+    async def stream_response(self, done_event: threading.Event, speculation=None, turn_started_at=None):
+        """Streams the LLM response to the UI (and speech, if enabled) and signals completion."""
         self.root.start_assistant_message()
+        if self.speech:
+            self.speech.begin_turn(turn_started_at)
         full_response = ""
-        history_to_send = self.conversation_history[-10:]
+        history_to_send = self.conversation_history.context()
 
         try:
-            async for chunk in self.dspy_handler.get_streamed_response(history_to_send):
+            if speculation:
+                response_stream = speculation.chunks() # Already running since the partial stabilised
+            else:
+                response_stream = self.dspy_handler.get_streamed_response(history_to_send, on_status=self.root.set_status)
+            async for chunk in response_stream:
                 full_response += chunk
                 self.root.update_assistant_message(chunk)
-            
-            if not full_response.strip():
-                try:
-                    last_interaction = self.dspy_handler.lm.history[-1]
-                    raw_content = last_interaction['response'].choices[0].message.content
-                    match = re.search(r'\[\[ ## answer ## \]\](.*)\[\[ ## completed ## \]\]', raw_content, re.DOTALL)
-                    if match:
-                        fallback_answer = match.group(1).strip()
-                        self.root.update_assistant_message(fallback_answer)
-                        full_response = fallback_answer
-                except Exception:
-                    pass
-            
-            self.root.end_assistant_message()
-            if full_response.strip():
-                self.conversation_history.append({"role": "assistant", "content": full_response})
+                if self.speech:
+                    self.speech.feed(chunk)
+
+            stored_id = self._record_turn("assistant", full_response) if full_response.strip() else None
+            self.root.end_assistant_message(stored_id)
         except Exception as e:
             error_message = f"\n[Error: {e}]"
             print(f"Error streaming response: {e}")
             self.root.update_assistant_message(error_message)
             self.is_in_conversation_mode = False
+            if self.speech:
+                self.speech.stop() # Don't finish speaking a response that failed halfway
         finally:
+            if self.speech:
+                self.speech.end_turn()
             done_event.set()
 
     def _on_save_settings_from_ui(self, new_settings_json_str: str):
@@ -168,86 +300,80 @@ class Application:
             self.root.set_status("Error: Invalid JSON in settings. Not saved.")
             return
 
-        # Deep compare old and new settings to see if re-initialization is needed
-        # For simplicity, we'll re-initialize if any part of the settings dict changes.
-        # A more granular check could be implemented for specific keys like 'assistant_name' or 'mcp_servers'.
-        settings_changed = self.settings != new_settings_dict
-
-        if settings_changed:
-            print("Settings have changed. Applying and re-initializing services.")
-            self.settings = new_settings_dict # Update internal settings
-            self.assistant_name = self.settings.get('assistant_name', 'gemini') # Update assistant name
-            save_settings_from_dict(self.settings) # Save the new dictionary
+        if self.settings != new_settings_dict:
+            save_settings_from_dict(new_settings_dict) # The settings store reports what changed to _on_settings_changed
             print("Settings saved to file.")
-
-            self.root.set_status("Applying settings changes...")
-            # Schedule the re-initialization sequence to run on the main Tkinter thread
-            # For simplicity, always pass True for both flags if settings_changed is True,
-            # as DspyHandler and Listener might both need updates.
-            self.root.after_idle(lambda: self._execute_reinitialization_sequence(True, True))
         else:
             print("No settings changed that require service re-initialization.")
             self.root.set_status(f"Listening for '{self.assistant_name}'...")
             # Update modal with the (potentially re-formatted) JSON string
             self.root.update_settings_json_for_modal(json.dumps(self.settings, indent=4))
 
-    def _execute_reinitialization_sequence(self, name_changed_flag, mcp_settings_changed_flag):
-        """Executes the re-initialization steps on the main thread."""
-        print("MainThread: Executing re-initialization sequence...")
-        self.listener.stop()
-        print("MainThread: Listener stopped for re-initialization.")
-
-        if mcp_settings_changed_flag:
-            print("MainThread: MCP settings changed. Preparing to shutdown DspyHandler.")
-            if self.dspy_handler:
-                print("MainThread: Scheduling DspyHandler shutdown via asyncio loop...")
-                async def _shutdown_task():
-                    await self.dspy_handler.shutdown()
+    def _on_settings_changed(self, event: SettingsChangeEvent):
+        """Runs on whichever thread saved or noticed the change; the work is handed to the right threads."""
+        print(f"Settings changed: {sorted(event.changed_keys)}")
+        self.root.call_on_main_thread(self._apply_settings_change, event)
 
-                shutdown_future = asyncio.run_coroutine_threadsafe(_shutdown_task(), self.loop)
-                
-                def _on_dspy_shutdown_done(future):
-                    try:
-                        future.result() 
-                        print("AsyncioThread: DspyHandler shutdown successfully completed.")
-                    except Exception as e:
-                        print(f"AsyncioThread: Error during DspyHandler shutdown: {e}")
-                    finally:
-                        self.root.after_idle(lambda: self._continue_reinitialization_after_dspy_shutdown(name_changed_flag, mcp_settings_changed_flag))
-                
-                shutdown_future.add_done_callback(_on_dspy_shutdown_done)
-            else: # No old DspyHandler to shut down
-                self.root.after_idle(lambda: self._continue_reinitialization_after_dspy_shutdown(name_changed_flag, mcp_settings_changed_flag))
-        else: # MCP settings didn't change
-            print("MainThread: MCP settings did not change.")
-            self.root.after_idle(lambda: self._continue_reinitialization_after_dspy_shutdown(name_changed_flag, mcp_settings_changed_flag))
-
-    def _continue_reinitialization_after_dspy_shutdown(self, name_changed_flag, mcp_settings_changed_flag):
-        """Continues re-initialization on the main thread after DspyHandler shutdown (if any)."""
-        print(f"MainThread: Continuing re-initialization. Name changed: {name_changed_flag}, MCP changed: {mcp_settings_changed_flag}")
-        if mcp_settings_changed_flag:
-            print("MainThread: Re-initializing DspyHandler...")
-            self.dspy_handler = DspyHandler() # This is in the main thread
-            print("MainThread: New DspyHandler initialized.")
-
-        if name_changed_flag:
-            print("MainThread: Assistant name changed. Re-initializing AssistantListener...")
-            self.listener = AssistantListener(assistant_name=self.assistant_name, callback=self.on_wake_word_detected)
-            print("MainThread: AssistantListener re-initialized.")
-        
-        print("MainThread: Starting AssistantListener...")
-        self.listener.start() 
+    def _apply_settings_change(self, event: SettingsChangeEvent):
+        """Applies a settings change on the main thread, touching only the services whose keys changed."""
+        self.settings = event.new
+        self.assistant_name = self.settings.get('assistant_name', 'gemini')
+        self.root.update_settings_json_for_modal(json.dumps(self.settings, indent=4))
+        self.root.render_pump.fps = max(1, self.settings.get('ui_frame_rate', 30))
+        self.root.transcript_window = max(1, self.settings.get('ui_transcript_window', 200))
+        self.root.transcript_page_size = max(1, self.settings.get('history_page_size', 20))
+        self.conversation_history.token_budget = self.settings.get('history_token_budget', 2000)
+        self.conversation_history.summary_tokens = self.settings.get('history_summary_tokens', 300)
+
+        if event.changed(*DSPY_SETTINGS_KEYS):
+            self.root.set_status("Applying settings changes...")
+            # MCP servers are restarted and the agent rebuilt on the asyncio thread, so the UI stays responsive.
+            future = asyncio.run_coroutine_threadsafe(self.dspy_handler.apply_settings(event.new), self.loop)
 
-        self.root.set_status(f"Listening for '{self.assistant_name}'...")
-        self.root.update_settings_json_for_modal(json.dumps(self.settings, indent=4)) # Update UI modal
-        print("MainThread: Services re-initialized and UI updated.")
+            def _on_applied(future):
+                try:
+                    future.result()
+                    print("AsyncioThread: MCP/agent settings applied.")
+                except Exception as e:
+                    print(f"AsyncioThread: Error applying MCP/agent settings: {e}")
+                self.root.set_status(f"Listening for '{self.assistant_name}'...") # Safe from any thread
+
+            future.add_done_callback(_on_applied)
+
+        if event.changed(*LISTENER_SETTINGS_KEYS):
+            print("MainThread: Wake word settings changed. Re-initializing AssistantListener...")
+            # Calibration and loading models take seconds, so the new listener is built off the UI thread
+            # while the old one keeps listening, and swapped in once it is ready.
+            threading.Thread(target=self._replace_listener, daemon=True).start()
+
+    def _replace_listener(self):
+        """Builds a listener from the current settings and swaps it in for the old one. Runs on a worker thread."""
+        with self._listener_lock: # Back-to-back changes are applied one after another
+            try:
+                listener = self._create_listener()
+            except Exception as e:
+                print(f"Error re-initializing AssistantListener: {e}. Keeping the current one.")
+                self.root.set_status(f"Error applying wake word settings: {e}")
+                return
+            old_listener, self.listener = self.listener, listener
+            old_listener.close() # Release the old listener's microphone stream
+            if not self.is_in_conversation_mode:
+                self.listener.start()
+        print("AssistantListener re-initialized.")
+        self.root.set_status(f"Listening for '{self.assistant_name}'...") # Safe from any thread
 
     def on_closing(self):
         """Handles application cleanup and shutdown."""
         print("Closing application...")
+        self._unsubscribe_settings()
+        settings_store.stop_watching()
         self.is_in_conversation_mode = False
         self.cancel_wait_timer()
-        self.listener.stop()
+        if self.speculator:
+            self.speculator.reset()
+        if self.speech:
+            self.speech.close()
+        self.listener.close()
         
         async def perform_async_shutdown():
             if self.dspy_handler:
@@ -263,6 +389,13 @@ class Application:
         if self.thread and self.thread.is_alive():
             self.thread.join(timeout=5)
 
+        client_registry.close_all()
+        if self._history_reader:
+            self._history_reader.submit(self.conversation_store.close_reader)
+            self._history_reader.shutdown(wait=True, cancel_futures=True)
+        if self.conversation_store:
+            self.conversation_store.close() # Commits turns still queued
+
         self.root.destroy()
 def main():
     root = ChatUI()
@@ -1,29 +1,170 @@
 # src/config/settings.py
+import copy
 import json
 import os
+import tempfile
+import threading
+from dataclasses import dataclass
 
 SETTINGS_FILE = os.path.expanduser("~/.ai_virtual_assistant_settings.json")
+# Caches (e.g. synthesized speech) live next to the settings file.
+CACHE_DIR = os.path.join(os.path.dirname(SETTINGS_FILE), ".ai_virtual_assistant_cache")
+# Every conversation turn, searchable across restarts.
+HISTORY_DB_FILE = os.path.join(os.path.dirname(SETTINGS_FILE), ".ai_virtual_assistant_history.sqlite3")
 
-def save_settings_from_dict(settings_dict: dict):
-    """Saves a dictionary of settings to the JSON file."""
-    with open(SETTINGS_FILE, 'w') as f:
-        json.dump(settings_dict, f, indent=4)
 
-def save_settings_from_string(settings_json_str: str):
-    """Saves a JSON string to the settings file after parsing it."""
-    settings_dict = json.loads(settings_json_str) # Assumes string is valid JSON
-    save_settings_from_dict(settings_dict)
+@dataclass(frozen=True)
+class SettingsChangeEvent:
+    """Describes a settings change. `changed_keys` lists exactly the top-level keys whose values differ."""
+    changed_keys: frozenset
+    old: dict
+    new: dict
 
-def load_settings():
-    settings = get_default_settings()
-    if os.path.exists(SETTINGS_FILE):
-        with open(SETTINGS_FILE, 'r') as f:
+    def changed(self, *keys) -> bool:
+        return any(key in self.changed_keys for key in keys)
+
+
+class SettingsStore:
+    """
+    Keeps one parsed and validated settings snapshot in memory.
+    The snapshot is reloaded only when the file's mtime/size change, writes are atomic,
+    and subscribers are told which keys changed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._snapshot = None
+        self._file_signature = None
+        self._lock = threading.RLock()
+        self._subscribers = []
+        self._watcher = None
+        self._stop_watching = threading.Event()
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+
+    def get(self) -> dict:
+        """Returns a copy of the current settings, re-reading the file only if it changed on disk."""
+        event = None
+        with self._lock:
+            signature = self._signature()
+            if self._snapshot is None or signature != self._file_signature:
+                event = self._reload(signature)
+            snapshot = copy.deepcopy(self._snapshot)
+        if event:
+            self._notify(event)
+        return snapshot
+
+    def _reload(self, signature):
+        """Re-reads the file. Caller holds the lock. Returns a change event if a previous snapshot changed."""
+        settings = get_default_settings()
+        if signature is not None:
+            with open(self.path, 'r') as f:
+                try:
+                    file_settings = json.load(f)
+                    if not isinstance(file_settings, dict):
+                        raise ValueError("top level is not an object")
+                    settings.update(file_settings)
+                except (json.JSONDecodeError, ValueError) as e:
+                    if self._snapshot is not None:
+                        # Probably an editor mid-write; keep what we have until the file changes again.
+                        print(f"Warning: Could not decode JSON from {self.path} ({e}). Keeping the current settings.")
+                        self._file_signature = signature
+                        return None
+                    print(f"Warning: Could not decode JSON from {self.path} ({e}). Using defaults.")
+        return self._set_snapshot(_validate(settings), signature)
+
+    def _set_snapshot(self, settings: dict, signature):
+        old, self._snapshot, self._file_signature = self._snapshot, settings, signature
+        if old is None:
+            return None
+        changed = frozenset(k for k in old.keys() | settings.keys() if old.get(k) != settings.get(k))
+        if not changed:
+            return None
+        return SettingsChangeEvent(changed, copy.deepcopy(old), copy.deepcopy(settings))
+
+    def save(self, settings_dict: dict):
+        """Atomically replaces the settings file (temp file + rename) and notifies subscribers."""
+        with self._lock:
+            directory = os.path.dirname(self.path) or "."
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".settings-", suffix=".tmp")
             try:
-                file_settings = json.load(f)
-                settings.update(file_settings)
-            except json.JSONDecodeError:
-                print(f"Warning: Could not decode JSON from {SETTINGS_FILE}. Using defaults.")
-    
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(settings_dict, f, indent=4)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            if self._snapshot is None:
+                self._reload(self._signature())
+            settings = get_default_settings()
+            settings.update(copy.deepcopy(settings_dict))
+            event = self._set_snapshot(_validate(settings), self._signature())
+        if event:
+            self._notify(event)
+
+    def subscribe(self, callback):
+        """Registers callback(SettingsChangeEvent). Returns a function that unsubscribes it."""
+        with self._lock:
+            self._subscribers.append(callback)
+        def _unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return _unsubscribe
+
+    def _notify(self, event: SettingsChangeEvent):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Error in settings subscriber: {e}")
+
+    def start_watching(self, interval: float = 1.0):
+        """Polls the file's mtime in the background so external edits reach subscribers without a get() call."""
+        if self._watcher is None:
+            self._stop_watching.clear()
+            self._watcher = threading.Thread(target=self._watch_loop, args=(interval,), daemon=True)
+            self._watcher.start()
+
+    def stop_watching(self):
+        self._stop_watching.set()
+        self._watcher = None
+
+    def _watch_loop(self, interval: float):
+        while not self._stop_watching.wait(interval):
+            try:
+                self.get()
+            except OSError as e:
+                print(f"Warning: Could not reload settings: {e}")
+
+
+def _validate(settings: dict) -> dict:
+    """Fills in environment fallbacks and replaces values whose type doesn't match the default."""
+    defaults = get_default_settings()
+    for key, default in defaults.items():
+        value = settings.get(key)
+        if default is None or value is None:
+            continue
+        if isinstance(value, type(default)) and isinstance(value, bool) == isinstance(default, bool): # bool is an int subclass
+            continue
+        numeric = (int, float)
+        if isinstance(default, numeric) and isinstance(value, numeric) and not isinstance(value, bool) and not isinstance(default, bool):
+            if isinstance(default, int):
+                settings[key] = int(round(value)) # e.g. "ui_frame_rate": 60.0
+            continue
+        print(f"Warning: Setting '{key}' should be {type(default).__name__}. Using the default.")
+        settings[key] = default
+
     if 'GOOGLE_API_KEY' not in settings or not settings['GOOGLE_API_KEY']:
         settings['GOOGLE_API_KEY'] = os.environ.get('GOOGLE_API_KEY')
 
@@ -36,12 +177,71 @@ def load_settings():
 
     return settings
 
+
+store = SettingsStore(SETTINGS_FILE)
+
+def save_settings_from_dict(settings_dict: dict):
+    """Saves a dictionary of settings to the JSON file."""
+    store.save(settings_dict)
+
+def save_settings_from_string(settings_json_str: str):
+    """Saves a JSON string to the settings file after parsing it."""
+    settings_dict = json.loads(settings_json_str) # Assumes string is valid JSON
+    save_settings_from_dict(settings_dict)
+
+def load_settings():
+    """Returns the current settings. Cheap to call: the file is only re-parsed when it changes."""
+    return store.get()
+
 def get_default_settings():
     return {
         'assistant_name': 'gemini',
         'GOOGLE_API_KEY': None,
         'ELEVENLABS_API_KEY': None, # Default voice: "Rachel"
         'ELEVENLABS_VOICE_ID': '21m00Tcm4TlvDq8ikWAM',
+        'ELEVENLABS_MODEL_ID': 'eleven_multilingual_v2',
+        'speak_responses': True, # Read answers aloud with ElevenLabs while they stream in
+        'tts_cache_memory_mb': 16,
+        'tts_cache_disk_mb': 200,
+        # Synthesized into the cache at startup so these play without a network round trip.
+        'tts_prewarm_phrases': [
+            "Sorry, I couldn't process that.",
+            "Okay.",
+            "Sure, one moment.",
+        ],
+        # Local wake word spotting. "template" matches against WAV recordings of the wake word,
+        # "cloud" sends every background phrase to Google speech recognition.
+        'wake_word_engine': 'template',
+        'wake_word_templates': [], # Paths to 16-bit PCM WAV recordings of the assistant name
+        'wake_word_threshold': 0.35, # Max normalised DTW distance accepted as a hit (lower is stricter)
+        'wake_word_energy_threshold': 300.0, # Min RMS (16-bit samples) for a frame to count as voiced; raise it in noisy rooms
+        # Command transcription. "vosk" streams audio into a local offline model while the user speaks,
+        # "google" transcribes the whole command after it ends.
+        'stt_engine': 'vosk',
+        'vosk_model_path': None, # Directory of an unpacked Vosk model, e.g. ~/models/vosk-model-small-en-us-0.15
+        'speculative_dispatch': True, # Start the LLM before the endpoint once the partial transcript stops changing
+        'speculation_stable_ms': 300,
+        'mcp_startup_timeout_seconds': 10.0, # Per-server limit for the initialize/list_tools handshake ("startup_timeout" overrides it per server)
+        'mcp_lazy_start': True, # Servers with a cached tool schema are only spawned when one of their tools is called
+        'mcp_ping_interval_seconds': 15.0, # Keepalive pings to running servers; 0 disables them
+        'mcp_max_backoff_seconds': 30.0, # Upper bound on the delay between respawns of a crashed server
+        # Requests that don't look like tool use skip the ReAct agent and get a single streamed LM call.
+        'router_enabled': True,
+        'router_tool_threshold': 0.15, # Tune with: python -m src.core.router fixtures.json
+        'react_max_tools': 8, # Tools shown to the agent per request, picked by relevance; 0 shows all of them
+        # MCP tool results are reused for a while when the tool opts in: explicitly here ({"tool_name": seconds} or
+        # {"server_id/tool_name": seconds}, 0 disables), or by declaring itself read-only in its annotations.
+        'tool_cache_ttl_seconds': {},
+        'tool_cache_read_only': True,
+        'tool_cache_default_ttl_seconds': 30.0,
+        'parallel_tool_calls': True, # Lets the agent run independent tool calls concurrently in one step
+        'lm_history_size': 20, # Raw LM calls kept in memory for inspection; 0 keeps none
+        'history_token_budget': 2000, # Tokens of recent conversation sent with each request
+        'history_summary_tokens': 300, # Older turns are folded into a summary of at most this size
+        'store_conversations': True, # Keep every turn in a local SQLite database; the chat window loads older turns from it
+        'history_page_size': 20, # Turns loaded into the chat window at a time when scrolling back
+        'ui_frame_rate': 30, # Most chat window redraws per second while a response streams in
+        'ui_transcript_window': 200, # Messages kept in the chat window; older ones are paged back in on scroll-up
         'mcp_servers': [
             {
                 "id": "local_computer_control", # Unique identifier for this server config
@@ -0,0 +1,120 @@
+# src/core/audio_buffer.py
+import threading
+
+import numpy as np
+import speech_recognition as sr
+
+SAMPLE_RATE = 16000
+CHUNK_SIZE = 512 # 32 ms per microphone read at 16 kHz
+
+
+class AudioRingBuffer:
+    """
+    Fixed-size ring buffer of int16 samples shared between one writer and any number of readers.
+    Positions are absolute sample counts since capture started, so readers can hold on to them as cursors.
+    """
+
+    def __init__(self, capacity_seconds: float = 30.0, sample_rate: int = SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.capacity = int(capacity_seconds * sample_rate)
+        self._data = np.zeros(self.capacity, dtype=np.int16)
+        self._write_position = 0
+        self._condition = threading.Condition()
+        self._closed = False
+
+    @property
+    def write_position(self) -> int:
+        return self._write_position
+
+    @property
+    def oldest_position(self) -> int:
+        return max(0, self._write_position - self.capacity)
+
+    def write(self, samples: np.ndarray):
+        """Copies samples into the ring, overwriting the oldest audio when full."""
+        skipped = max(0, len(samples) - self.capacity)
+        samples = samples[skipped:]
+        with self._condition:
+            self._write_position += skipped
+            start = self._write_position % self.capacity
+            first = min(len(samples), self.capacity - start)
+            self._data[start:start + first] = samples[:first]
+            self._data[:len(samples) - first] = samples[first:]
+            self._write_position += len(samples)
+            self._condition.notify_all()
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """Returns a contiguous copy of samples in [start, end), clamped to what is still buffered."""
+        with self._condition:
+            start = max(start, self.oldest_position)
+            end = min(end, self._write_position)
+            if end <= start:
+                return np.zeros(0, dtype=np.int16)
+            first, last = start % self.capacity, end % self.capacity
+            if first < last or last == 0:
+                return self._data[first:last or self.capacity].copy()
+            return np.concatenate([self._data[first:], self._data[:last]])
+
+    def wait_for(self, position: int, timeout: float = None) -> bool:
+        """Blocks until audio up to `position` has been written. Returns False on timeout or close."""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._closed or self._write_position >= position, timeout) and not self._closed
+
+    def cursor(self, position: int = None) -> "AudioCursor":
+        return AudioCursor(self, self._write_position if position is None else position)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class AudioCursor:
+    """An independent read position into an AudioRingBuffer."""
+
+    def __init__(self, ring: AudioRingBuffer, position: int):
+        self.ring = ring
+        self.position = position
+
+    def read(self, num_samples: int, timeout: float = None) -> np.ndarray:
+        """Waits for the next `num_samples` samples and advances past them. Returns an empty array on timeout."""
+        if not self.ring.wait_for(self.position + num_samples, timeout):
+            return np.zeros(0, dtype=np.int16)
+        if self.position < self.ring.oldest_position:
+            print(f"Audio reader fell behind; skipping {self.ring.oldest_position - self.position} samples.")
+            self.position = self.ring.oldest_position
+        samples = self.ring.read(self.position, self.position + num_samples)
+        self.position += len(samples)
+        return samples
+
+
+class MicrophoneCapture:
+    """Keeps one microphone stream open and feeds it into an AudioRingBuffer from a single thread."""
+
+    def __init__(self, ring: AudioRingBuffer, chunk_size: int = CHUNK_SIZE):
+        self.ring = ring
+        self.chunk_size = chunk_size
+        self.microphone = sr.Microphone(sample_rate=ring.sample_rate, chunk_size=chunk_size)
+        self._running = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._running.set()
+            self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+            self._thread.start()
+
+    def _capture_loop(self):
+        with self.microphone as source:
+            print("Microphone capture started.")
+            while self._running.is_set():
+                data = source.stream.read(self.chunk_size)
+                self.ring.write(np.frombuffer(data, dtype=np.int16))
+        print("Microphone capture stopped.")
+
+    def stop(self):
+        self._running.clear()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+        self.ring.close()
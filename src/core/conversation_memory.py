@@ -0,0 +1,134 @@
+# src/core/conversation_memory.py
+import asyncio
+import collections
+import threading
+
+CHARS_PER_TOKEN = 4 # Rough average for English text; no tokenizer is needed for budgeting
+MESSAGE_OVERHEAD_TOKENS = 4 # Role and separators the adapter adds around each message
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count of `text` (~4 characters per token)."""
+    return (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class _Message:
+    __slots__ = ("role", "content", "tokens")
+
+    def __init__(self, role: str, content: str):
+        self.role = role
+        self.content = content
+        self.tokens = count_tokens(content) + MESSAGE_OVERHEAD_TOKENS # Counted once, when the message is added
+
+    def as_dict(self) -> dict:
+        return {"role": self.role, "content": self.content}
+
+
+class ConversationMemory:
+    """
+    Conversation history that fits a token budget.
+    The newest turns are kept verbatim up to `token_budget`; older turns are evicted and folded into a
+    running summary by `summarize(summary, messages, summary_tokens)` (a coroutine run on `loop`, off the response path).
+    Resident memory stays bounded: the window by the budget, the summary by `summary_tokens`,
+    and turns waiting to be summarized by `token_budget` as well.
+    """
+
+    def __init__(self, token_budget: int = 2000, summary_tokens: int = 300, summarize=None, loop=None):
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.summarize = summarize
+        self.loop = loop
+        self.summary = ""
+        self.stats = {'messages': 0, 'evicted': 0, 'summarized': 0, 'dropped': 0}
+        self._window = collections.deque() # _Message objects, oldest first
+        self._window_tokens = 0
+        self._pending = collections.deque() # Evicted messages not yet folded into the summary
+        self._pending_tokens = 0
+        self._summarizing = None # Future of the summarization in flight
+        self._lock = threading.Lock() # User turns are added from the conversation thread, answers from the loop
+
+    def append(self, role: str, content: str):
+        """Adds a message, evicting the oldest turns once the window is over budget."""
+        with self._lock:
+            message = _Message(role, content)
+            self._window.append(message)
+            self._window_tokens += message.tokens
+            self.stats['messages'] += 1
+            # The newest message always stays, even if it alone is over budget.
+            while self._window_tokens > self.token_budget and len(self._window) > 1:
+                evicted = self._window.popleft()
+                self._window_tokens -= evicted.tokens
+                self._pending.append(evicted)
+                self._pending_tokens += evicted.tokens
+                self.stats['evicted'] += 1
+            # If summarizing can't keep up (or is unavailable), the oldest unsummarized turns are lost.
+            while self._pending_tokens > self.token_budget and self._pending:
+                self._pending_tokens -= self._pending.popleft().tokens
+                self.stats['dropped'] += 1
+        self._schedule_summary()
+
+    def context(self, extra: dict = None) -> list:
+        """
+        Messages to send with the next request, oldest first: the summary of evicted turns, then as many turns
+        as fit the budget, filled from the newest back. `extra` (e.g. a not yet committed user turn) is always included.
+        """
+        with self._lock:
+            messages = list(self._window)
+            summary = self.summary
+        if extra is not None:
+            messages.append(_Message(extra["role"], extra["content"]))
+
+        budget = self.token_budget
+        if summary:
+            budget -= count_tokens(summary) + MESSAGE_OVERHEAD_TOKENS
+        selected = []
+        for message in reversed(messages):
+            if selected and message.tokens > budget:
+                break
+            selected.append(message.as_dict())
+            budget -= message.tokens
+        selected.reverse()
+        if summary:
+            selected.insert(0, {"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+        return selected
+
+    def _schedule_summary(self):
+        """Starts folding pending turns into the summary, unless that is already running."""
+        if self.summarize is None or self.loop is None:
+            return
+        with self._lock:
+            if not self._pending or (self._summarizing and not self._summarizing.done()):
+                return
+            self._summarizing = asyncio.run_coroutine_threadsafe(self._fold_pending(), self.loop)
+
+    async def _fold_pending(self):
+        with self._lock:
+            batch = list(self._pending)
+            self._pending.clear()
+            self._pending_tokens = 0
+            summary = self.summary
+            summary_tokens = self.summary_tokens
+        try:
+            new_summary = await self.summarize(summary, [message.as_dict() for message in batch], summary_tokens)
+        except Exception as e:
+            print(f"Error summarizing conversation history: {e}")
+            new_summary = None
+
+        with self._lock:
+            if new_summary:
+                self.summary = new_summary.strip()[:summary_tokens * CHARS_PER_TOKEN]
+                self.stats['summarized'] += len(batch)
+            else:
+                self.stats['dropped'] += len(batch)
+            self._summarizing = None
+        self._schedule_summary() # Turns evicted while this ran
+
+    def clear(self):
+        with self._lock:
+            self._window.clear()
+            self._pending.clear()
+            self._window_tokens = self._pending_tokens = 0
+            self.summary = ""
+
+    def __len__(self):
+        return len(self._window)
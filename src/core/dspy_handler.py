@@ -1,17 +1,22 @@
 # src/core/dspy_handler.py
 import dspy
-from dspy.streaming import StreamResponse
-from ..config.settings import load_settings
+from dspy.clients import base_lm
+from dspy.streaming import StatusMessage, StatusMessageProvider
+from litellm import ModelResponseStream
+from ..config.settings import load_settings, CACHE_DIR
+from .mcp_manager import (
+    McpServerConnection, LazySession, ToolSchemaCache, schema_cache_key, start_servers, tool_specs,
+    DEFAULT_STARTUP_TIMEOUT, DEFAULT_PING_INTERVAL,
+)
+from .field_parser import FieldStreamParser
+from .router import IntentRouter, ToolIndex
+from .tool_calls import ToolCallLayer, make_parallel_tool
 import asyncio
-import subprocess
-import sys
+import collections
 import os
 import threading
 import time
 
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
-
 # --- Define a ReAct Signature for tool use ---
 class ExecuteTaskWithTools(dspy.Signature):
     """
@@ -26,364 +31,456 @@ class ExecuteTaskWithTools(dspy.Signature):
 
 class GenerateResponse(dspy.Signature):
     """Generate a helpful and friendly response based on the conversation history."""
-    history: list[dict] = dspy.InputField(desc="The conversation history, with roles 'user' and 'assistant'.")
+    history: list[dict] = dspy.InputField(desc="The conversation history, with roles 'user' and 'assistant', possibly led by a 'system' summary of earlier turns.")
     answer: str = dspy.OutputField(desc="The assistant's response.")
 
+class SummarizeConversation(dspy.Signature):
+    """Update the running summary of a conversation with turns that no longer fit in the context. Keep facts, names, decisions and open requests."""
+    summary: str = dspy.InputField(desc="The summary so far; may be empty.")
+    turns: list[dict] = dspy.InputField(desc="The turns to fold in, oldest first, with roles 'user' and 'assistant'.")
+    max_words: int = dspy.InputField(desc="Upper limit on the length of the updated summary, in words.")
+    updated_summary: str = dspy.OutputField(desc="The updated summary.")
+
+class AgentStatusMessages(StatusMessageProvider):
+    """Short status lines for the UI while the agent works."""
+
+    def tool_start_status_message(self, instance, inputs):
+        return f"Calling tool {instance.name}..."
+
+    def tool_end_status_message(self, outputs):
+        return "Thinking..."
+
+SUBSET_AGENT_CACHE_SIZE = 16
+# Settings baked into the agent and router when they are built.
+AGENT_SETTINGS_KEYS = ("router_enabled", "router_tool_threshold", "parallel_tool_calls")
+# Read by _tool_cache_ttl on every call; results cached under the old TTLs are dropped when they change.
+TOOL_CACHE_SETTINGS_KEYS = ("tool_cache_ttl_seconds", "tool_cache_read_only", "tool_cache_default_ttl_seconds")
+
+def _prompt_tokens(tools: list) -> int:
+    """Rough token count of the tool descriptions ReAct puts into every step's prompt (~4 characters per token)."""
+    return sum(len(str(tool)) for tool in tools) // 4
+
+class BoundedHistory(list):
+    """A history list that keeps only its last `limit` entries; dspy appends every raw LM response to these."""
+
+    def __init__(self, limit: int, entries=()):
+        super().__init__(list(entries)[-limit:] if limit > 0 else [])
+        self.limit = limit
+
+    def append(self, entry):
+        if self.limit <= 0:
+            return
+        super().append(entry)
+        if len(self) > self.limit:
+            del self[:len(self) - self.limit]
+
+# dspy registers the status callback globally on the first streamify() call, so one provider is shared by all.
+_STATUS_MESSAGES = AgentStatusMessages()
+
 class DspyHandler:
-    def __init__(self):
+    def __init__(self, loop: asyncio.AbstractEventLoop = None):
         self.settings = load_settings()
         self.lm = self._setup_dspy_lm() # LM setup is independent of MCP servers
-        
-        self.active_mcp_servers = [] # List to store Popen objects for stdio servers
-        self.active_mcp_sessions = [] # List to store ClientSessionContextManagers
+
+        # MCP sessions are bound to the event loop they were opened on, so tool calls must run there too.
+        self.loop = loop or self._start_private_loop()
+        self.mcp_connections = [] # McpServerConnection objects whose tools are offered to the agent
+        self.schema_cache = ToolSchemaCache(os.path.join(CACHE_DIR, "mcp_tools"))
+        self._server_tools = {} # server id -> list of mcp.types.Tool the agent was built from
 
         self.dspy_tools = []
         self.react_agent = None
-        self.fallback_predictor = None
-        self.fallback_stream_predictor = None
+        self.router = None # Sends conversational turns past the ReAct agent
+        self.tool_index = None # Picks the tools shown to the agent for each request
+        self._subset_agents = collections.OrderedDict() # frozenset of tool names -> ReAct over just those, LRU
+        self.tool_calls = ToolCallLayer(self._tool_cache_ttl) # Result cache and latency histograms for MCP calls
+        # Per route: number of requests and summed time to first chunk / completion, for tuning the router.
+        self.route_stats = {route: {'count': 0, 'first_chunk_ms': 0.0, 'total_ms': 0.0} for route in ('tool', 'chat')}
+        self._setup_fallback_predictor()
+        self._limit_lm_history()
 
         self._initialize_mcp_and_agent()
 
-    def _get_mcp_server_script_path(self):
-        """Determines the path to the mcp_tools_server.py script."""
-        # For PyInstaller, sys._MEIPASS is the temp folder where bundled files are
-        if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
-            # Expect mcp_tools_server.py at the root of the bundle
-            return os.path.join(sys._MEIPASS, 'mcp_tools_server.py')
-        else: # Running as a normal script
-            # Correct path assuming dspy_handler.py and mcp_tools_server.py are in the same directory
-            return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mcp_tools_server.py')
-
-    def _start_mcp_server(self, command_list: list, env_vars: dict = None):
-        """Starts an MCP server using the provided command list and optional environment variables."""
-        # This method will now return the Popen object or None
-        
-        # For local Python script, ensure the first element (python executable) is valid
-        # For external commands, command_list[0] is the command itself.
-        if command_list[0] == sys.executable and not os.path.exists(command_list[1]):
-             print(f"Error: MCP server script not found at {command_list[1]}")
-             return False
-        elif command_list[0] != sys.executable: # Check if external command exists (basic check)
-            pass # More robust check might involve shutil.which(command_list[0])
-
-        print(f"Attempting to start MCP server with command: {' '.join(command_list)}")
-        
-        current_env = os.environ.copy()
-        if env_vars:
-            current_env.update(env_vars)
-
-        try:
-            mcp_server_process = subprocess.Popen(
-                command,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                close_fds=sys.platform != "win32",
-                env=current_env
-            )
-            print(f"MCP server process starting with PID: {mcp_server_process.pid} for command: {' '.join(command_list)}")
-            # Log MCP server output for debugging
-            threading.Thread(target=self._log_subprocess_output, args=(mcp_server_process.stdout, f"MCP_OUT_{mcp_server_process.pid}"), daemon=True).start()
-            threading.Thread(target=self._log_subprocess_output, args=(mcp_server_process.stderr, f"MCP_ERR_{mcp_server_process.pid}"), daemon=True).start()
-
-            time.sleep(3) # Give server a moment to start
-            if mcp_server_process.poll() is not None: # Check if process terminated prematurely
-                print(f"MCP server for {' '.join(command_list)} failed to stay running. Exit code: {mcp_server_process.returncode}")
-                # Attempt to read stderr for more clues
-                # err_output = self.mcp_server_process.stderr.read() if self.mcp_server_process.stderr else "N/A"
-                # print(f"MCP Server stderr: {err_output}")
-                # raise RuntimeError(f"MCP server failed to stay running. Exit code: {mcp_server_process.returncode}") # Don't raise, just return None
-                return None
-            print(f"MCP server for {' '.join(command_list)} assumed to be running.")
-            return mcp_server_process
-        except Exception as e:
-            print(f"Failed to start MCP server for {' '.join(command_list)}: {e}")
-            return None
-
-    def _log_subprocess_output(self, pipe, prefix):
-        try:
-            for line in iter(pipe.readline, ''):
-                print(f"[{prefix}]: {line.strip()}")
-        except ValueError: # Pipe closed
-            pass
-        except Exception as e:
-            print(f"Error reading from {prefix}: {e}")
-        finally:
-            if hasattr(pipe, 'close') and not pipe.closed:
-                pipe.close()
-
-    async def _initialize_tools_from_server(self, mcp_popen_process, server_id: str):
-        """Initializes MCP client for a given server process, loads its tools."""
-        if not mcp_popen_process or mcp_popen_process.poll() is not None:
-            print(f"MCP server process for '{server_id}' not running. Cannot initialize tools.")
-            return [], None
-
-        server_params = StdioServerParameters(command_or_popen_obj=mcp_popen_process)
-        session_manager = ClientSessionContextManager(server_params)
-        session = await session_manager.get_session()
-
-        if not session:
-            print(f"Failed to establish MCP session for server '{server_id}'.")
-            await session_manager.close_session() # Clean up client if session failed
-            return [], None
-
-        try:
-            tool_list_response = await session.list_tools()
-            dspy_tools = [dspy.Tool.from_mcp_tool(session, tool_spec) for tool_spec in tool_list_response.tools]
-            print(f"Loaded {len(dspy_tools)} MCP tools from server '{server_id}'.")
-            return dspy_tools, session_manager
-        except Exception as e:
-            print(f"Error listing or converting tools from server '{server_id}': {e}")
-            await session_manager.close_session()
-            return [], None
-
-    def _initialize_mcp_and_agent(self):
-        self.dspy_tools = []
-        self.active_mcp_servers = []
-        self.active_mcp_sessions = []
+    @staticmethod
+    def _start_private_loop():
+        """Runs an event loop in a daemon thread, for use without an application loop."""
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, daemon=True).start()
+        return loop
 
+    def _enabled_stdio_configs(self) -> list:
         mcp_server_configs = self.settings.get("mcp_servers", [])
         if not isinstance(mcp_server_configs, list):
             print("Warning: 'mcp_servers' in settings is not a list. No MCP servers will be loaded.")
-            mcp_server_configs = []
-
-        all_loaded_dspy_tools = []
+            return []
 
+        configs = []
         for config in mcp_server_configs:
-            if not config.get("enabled", False):
-                print(f"MCP Server '{config.get('id', 'Unknown')}' is disabled. Skipping.")
-                continue
-
-            server_type = config.get("type")
             server_id = config.get("id", "UnnamedServer")
-
-            if server_type == "stdio":
-                command = config.get("command")
-                args = config.get("args", [])
-                env = config.get("env")
-
-                if command:
-                    full_command = [command] + args
-                    mcp_process = self._start_mcp_server(command_list=full_command, env_vars=env)
-                    if mcp_process:
-                        self.active_mcp_servers.append(mcp_process)
-                        # Initialize tools and session for this server
-                        # This part needs to be async, so we'll collect tools later or adapt
-                        # For now, let's assume we can run this part of init in a way that blocks or uses event loop
-                        
-                        # Running async tool initialization:
-                        loop = asyncio.get_event_loop()
-                        if loop.is_running():
-                            future = asyncio.run_coroutine_threadsafe(self._initialize_tools_from_server(mcp_process, server_id), loop)
-                            tools_from_this_server, session_mgr = future.result(timeout=15)
-                        else:
-                            tools_from_this_server, session_mgr = loop.run_until_complete(self._initialize_tools_from_server(mcp_process, server_id))
-                        
-                        if tools_from_this_server and session_mgr:
-                            all_loaded_dspy_tools.extend(tools_from_this_server)
-                            self.active_mcp_sessions.append(session_mgr)
+            server_type = config.get("type")
+            if not config.get("enabled", False):
+                print(f"MCP Server '{server_id}' is disabled. Skipping.")
+            elif server_type == "stdio":
+                if config.get("command"):
+                    configs.append(config)
                 else:
                     print(f"stdio MCP Server '{server_id}' is missing 'command'. Skipping.")
-            
             elif server_type == "http":
                 print(f"HTTP MCP Server '{server_id}' configuration found. HTTP tool loading is not yet fully implemented in this handler. Skipping.")
-                # Placeholder for future HTTP MCP client logic and dspy.Tool wrapping
-            
             else:
                 print(f"Unknown MCP Server type '{server_type}' for server '{server_id}'. Skipping.")
+        return configs
 
-        self.dspy_tools = all_loaded_dspy_tools
-
-        if self.dspy_tools:
-            self.react_agent = dspy.ReAct(ExecuteTaskWithTools, tools=self.dspy_tools, lm=self.lm)
-            print(f"ReAct agent initialized with {len(self.dspy_tools)} total MCP tools from all active servers.")
-        else:
-            print("No MCP tools loaded from any server. ReAct agent will not have tools.")
-            self._setup_fallback_predictor()
-
-    def _setup_fallback_predictor(self):
-        print("No MCP tools loaded or MCP server failed. Setting up fallback DSPy predictor.")
-        self.fallback_predictor = dspy.Predict(GenerateResponse)
-        return dspy_tools
+    def _startup_timeout(self, config: dict) -> float:
+        return config.get("startup_timeout", self.settings.get("mcp_startup_timeout_seconds", DEFAULT_STARTUP_TIMEOUT))
 
     def _initialize_mcp_and_agent(self):
-        server_started = False
-        full_command = []
-
-        # Prioritize UI-driven external Python server settings
-        if self.settings.get('mcp_use_external_python_server', False):
-            script_path = self.settings.get('mcp_external_python_script_path', '')
-            if script_path and os.path.exists(script_path):
-                print(f"UI Config: Using external Python MCP server: {script_path}")
-                full_command = [sys.executable, script_path]
-            else:
-                print(f"UI Config Error: External Python MCP script path not found or not set: '{script_path}'. Falling back.")
-        
-        # Fallback to generic external or local if UI external not used/valid
-        if not full_command:
-            mcp_server_type = self.settings.get("mcp_server_type", "local")
-            if mcp_server_type == "external":
-                command = self.settings.get("mcp_external_command")
-                args = self.settings.get("mcp_external_args", [])
-                if command:
-                    full_command = [command] + args
-                else:
-                    print("Advanced Config Error: MCP server type is 'external' but 'mcp_external_command' is not set. Falling back to local.")
+        """
+        Builds the ReAct agent from every enabled MCP server.
+        Servers with a cached tool schema are not spawned until one of their tools is called;
+        the rest are started concurrently now and their schemas cached for next time.
+        """
+        configs = self._enabled_stdio_configs()
+        if configs:
+            # Every server has its own timeout inside start_servers; this only guards against a wedged loop.
+            longest = max(self._startup_timeout(config) for config in configs)
+            future = asyncio.run_coroutine_threadsafe(self._open_connections(configs), self.loop)
+            try:
+                self.mcp_connections = future.result(timeout=longest + 5)
+            except Exception as e:
+                print(f"Error during MCP server startup: {e}")
+                future.cancel()
+        self._build_agent()
+
+    async def _open_connections(self, configs: list) -> list:
+        """Returns connections for the configs: lazy ones for cached schemas, started ones for the rest."""
+        lazy = self.settings.get("mcp_lazy_start", True)
+        connections, to_start = [], []
+        for config in configs:
+            conn = McpServerConnection(
+                config,
+                ping_interval=self.settings.get("mcp_ping_interval_seconds", DEFAULT_PING_INTERVAL),
+                max_backoff=self.settings.get("mcp_max_backoff_seconds", 30.0),
+            )
+            conn.on_tools_listed = self._on_tools_listed
+            cached_tools = self.schema_cache.get(schema_cache_key(config)) if lazy else None
+            if cached_tools is not None:
+                print(f"MCP Server '{conn.server_id}': {len(cached_tools)} tools loaded from cache; it will start on first use.")
+                self._server_tools[conn.server_id] = cached_tools
+                connections.append(conn)
             else:
-                print("Config: Using local bundled MCP server.")
-                mcp_script_path = self._get_mcp_server_script_path()
-                full_command = [sys.executable, mcp_script_path]
-
-        if full_command:
-            server_started = self._start_mcp_server(command_list=full_command, env_vars=self.settings.get("mcp_external_env"))
-        else: # Should not happen if logic is correct, but as a safeguard
-            print("Error: No valid MCP server command determined. Cannot start MCP server.")
+                to_start.append(conn)
+        if to_start:
+            default_timeout = self.settings.get("mcp_startup_timeout_seconds", DEFAULT_STARTUP_TIMEOUT)
+            connections.extend(await start_servers(to_start, default_timeout))
+        return connections
 
-        if server_started:
+    async def apply_settings(self, settings: dict):
+        """
+        Applies changed settings without rebuilding the handler. Must run on self.loop.
+        Only MCP servers whose config entry changed (or that were added/removed) are restarted;
+        the new agent is built on the side and swapped in once it is complete.
+        """
+        old_settings, self.settings = self.settings, settings
+        lm_changed = False
+        if settings.get('GOOGLE_API_KEY') != old_settings.get('GOOGLE_API_KEY'):
             try:
-                # Run async initialization in the existing event loop if available, or a new one.
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    # If called from a sync context but loop is running (e.g. from app thread)
-                    # This is tricky. For simplicity, let's assume this init is called
-                    # before the main app loop fully takes over or from a context that can block.
-                    future = asyncio.run_coroutine_threadsafe(self._initialize_tools_async(), loop)
-                    self.dspy_tools = future.result(timeout=10) # Wait for tools
-                else:
-                    self.dspy_tools = loop.run_until_complete(self._initialize_tools_async())
+                lm = self._create_lm()
+            except Exception as e:
+                print(f"Error creating the language model: {e}. Keeping the current one.")
+            else:
+                # dspy.configure() only works on the thread that first called it, so the new LM is bound
+                # to our programs instead; agents built from now on get it in _react().
+                self.lm, lm_changed = lm, True
+                for program in (self.fallback_predictor, self.summarizer):
+                    program.set_lm(lm)
+        if lm_changed or settings.get('lm_history_size') != old_settings.get('lm_history_size'):
+            self._limit_lm_history()
+        if any(settings.get(key) != old_settings.get(key) for key in TOOL_CACHE_SETTINGS_KEYS):
+            self.tool_calls.clear()
+
+        wanted = {config.get("id", "UnnamedServer"): config for config in self._enabled_stdio_configs()}
+        kept = [conn for conn in self.mcp_connections if wanted.get(conn.server_id) == conn.config]
+        kept_ids = {conn.server_id for conn in kept}
+        for conn in kept:
+            conn.ping_interval = settings.get("mcp_ping_interval_seconds", DEFAULT_PING_INTERVAL)
+            conn.max_backoff = settings.get("mcp_max_backoff_seconds", 30.0)
+        stopping = [conn for conn in self.mcp_connections if conn.server_id not in kept_ids]
+        added = [config for server_id, config in wanted.items() if server_id not in kept_ids]
+
+        if not stopping and not added:
+            if lm_changed or any(settings.get(key) != old_settings.get(key) for key in AGENT_SETTINGS_KEYS):
+                self._build_agent() # Same tools, differently configured agent
+            else:
+                print("MCP server configuration unchanged. Keeping the current agent.")
+            return
+        print(f"Applying MCP changes: keeping {sorted(kept_ids)}, stopping {[c.server_id for c in stopping]}, "
+              f"starting {sorted(wanted.keys() - kept_ids)}.")
+
+        for conn in stopping:
+            self._server_tools.pop(conn.server_id, None)
+            self.tool_calls.invalidate(conn.server_id)
+        await asyncio.gather(*(conn.close() for conn in stopping))
+        self.mcp_connections = kept + await self._open_connections(added)
+        self._build_agent()
+
+    def _on_tools_listed(self, conn: McpServerConnection):
+        """Caches a server's live schema, and rebuilds the agent if it differs from the cached one we used."""
+        previous = self._server_tools.get(conn.server_id)
+        if previous is not None and tool_specs(previous) == tool_specs(conn.tools):
+            return
+        self.schema_cache.put(schema_cache_key(conn.config), conn.tools)
+        self._server_tools[conn.server_id] = conn.tools
+        if previous is not None:
+            print(f"MCP Server '{conn.server_id}' tool schema changed since it was cached. Rebuilding the agent.")
+            self._build_agent()
 
-                if self.dspy_tools:
-                    self.react_agent = dspy.ReAct(ExecuteTaskWithTools, tools=self.dspy_tools, lm=self.lm)
-                    print("ReAct agent initialized with MCP tools.")
-                else:
-                    print("No MCP tools loaded. ReAct agent will not have tools.")
-                    self._setup_fallback_predictor()
+    def _tool_cache_ttl(self, server_id: str, tool_name: str) -> float:
+        """
+        Seconds a tool's results may be reused. Set per tool in tool_cache_ttl_seconds (keyed by
+        "server_id/tool_name" or "tool_name"); otherwise tools the server marks read-only get the default TTL.
+        """
+        overrides = self.settings.get("tool_cache_ttl_seconds") or {}
+        for key in (f"{server_id}/{tool_name}", tool_name):
+            if key in overrides:
+                return overrides[key] or 0
+        if self.settings.get("tool_cache_read_only", True):
+            for spec in self._server_tools.get(server_id, []):
+                if spec.name == tool_name and spec.annotations and spec.annotations.readOnlyHint:
+                    return self.settings.get("tool_cache_default_ttl_seconds", 30.0)
+        return 0
+
+    def _react(self, tools: list):
+        """A ReAct agent over `tools`, plus a tool for running independent calls concurrently."""
+        if len(tools) > 1 and self.settings.get("parallel_tool_calls", True):
+            tools = tools + [make_parallel_tool(tools)]
+        return self._program(dspy.ReAct(ExecuteTaskWithTools, tools=tools))
+
+    def _build_agent(self):
+        """Builds a ReAct agent over the current connections' tools and swaps it in with a single assignment."""
+        tools = []
+        for conn in self.mcp_connections:
+            session = LazySession(conn, self._startup_timeout(conn.config), calls=self.tool_calls)
+            try:
+                tools.extend(dspy.Tool.from_mcp_tool(session, tool) for tool in self._server_tools.get(conn.server_id, []))
             except Exception as e:
-                print(f"Error during MCP tool/ReAct initialization: {e}")
-                self._setup_fallback_predictor()
+                print(f"Error converting tools from server '{conn.server_id}': {e}")
+
+        react_agent, router = None, None
+        if tools:
+            react_agent = self._react(tools)
+            print(f"ReAct agent initialized with {len(tools)} total MCP tools from all active servers.")
+            if self.settings.get("router_enabled", True):
+                router = IntentRouter(
+                    [(tool.name, tool.desc, list(tool.args or {})) for tool in tools],
+                    threshold=self.settings.get("router_tool_threshold", 0.15),
+                )
         else:
-            print("MCP server failed to start. Using fallback predictor.")
-            self._setup_fallback_predictor()
+            print("No MCP tools loaded from any server. ReAct agent will not have tools.")
+        tool_index = ToolIndex([(tool.name, tool.desc, list(tool.args or {})) for tool in tools]) if tools else None
+        # Requests read react_agent once, so a request in flight keeps the agent it started with.
+        self.dspy_tools, self.react_agent, self.router = tools, react_agent, router
+        self.tool_index, self._subset_agents = tool_index, collections.OrderedDict()
 
     def _setup_fallback_predictor(self):
-        print("No MCP tools loaded or MCP server failed. Setting up fallback DSPy predictor.")
-        self.fallback_predictor = dspy.Predict(GenerateResponse)
-        self.fallback_stream_predictor = dspy.streamify(
-            self.fallback_predictor,
-            stream_listeners=[dspy.streaming.StreamListener(signature_field_name="answer")],
-        )
-
-    def _setup_dspy_lm(self):
-        """Initializes and configures the DSPy language model."""
-        # self.settings is already loaded in __init__
+        """The single-call predictor used for conversational turns, and for everything when no tools are loaded."""
+        self.fallback_predictor = self._program(dspy.Predict(GenerateResponse))
+        self.summarizer = self._program(dspy.Predict(SummarizeConversation))
+
+    def _program(self, program):
+        """Binds a new program to the handler's LM and caps its history."""
+        program.set_lm(self.lm)
+        return self._bound_history(program)
+
+    def _history_size(self) -> int:
+        return max(0, int(self.settings.get("lm_history_size", 20)))
+
+    def _bound_history(self, program):
+        """Caps the LM call history dspy keeps on `program` and each of its sub-modules."""
+        size = self._history_size()
+        for _, module in program.named_sub_modules():
+            module.history = BoundedHistory(size, module.history)
+        return program
+
+    def _limit_lm_history(self):
+        """
+        Caps every LM call history at lm_history_size entries: the LM's, dspy's global one and the programs'.
+        Each entry holds a full prompt and raw response, so unbounded histories grow for the life of the process.
+        """
+        size = self._history_size()
+        self.lm.history = BoundedHistory(size, self.lm.history)
+        # base_lm reads GLOBAL_HISTORY at call time, so a bounded replacement takes effect immediately.
+        base_lm.GLOBAL_HISTORY = BoundedHistory(size, base_lm.GLOBAL_HISTORY)
+        for program in [self.fallback_predictor, self.summarizer, self.react_agent, *self._subset_agents.values()]:
+            if program is not None:
+                self._bound_history(program)
+
+    def _create_lm(self):
+        """Creates the DSPy language model from the current settings."""
         api_key = self.settings.get('GOOGLE_API_KEY')
         
         if not api_key:
             raise ValueError("GOOGLE_API_KEY not found. Please set it in your environment variables or settings.")
-        lm = dspy.LM(model='gemini/gemini-1.5-flash', api_key=api_key, max_tokens=4000) # Adjust model as needed
+        return dspy.LM(model='gemini/gemini-1.5-flash', api_key=api_key, max_tokens=4000) # Adjust model as needed
+
+    def _setup_dspy_lm(self):
+        """Initializes and configures the DSPy language model. Only called from __init__ (see apply_settings)."""
+        # self.settings is already loaded in __init__
+        lm = self._create_lm()
         dspy.configure(lm=lm)
         return lm
 
-    async def get_streamed_response(self, history: list[dict]):
+    async def summarize_conversation(self, summary: str, turns: list[dict], summary_tokens: int = 300) -> str:
+        """
+        Folds `turns` into the running conversation `summary` (used by ConversationMemory for evicted turns).
+        `summary_tokens` is the memory's current summary budget, so the request matches what it keeps.
+        """
+        max_words = max(20, summary_tokens * 3 // 4)
+        prediction = await self.summarizer.acall(summary=summary, turns=turns, max_words=max_words)
+        return prediction.updated_summary
+
+    def tool_call_summary(self) -> dict:
+        """Call and cache-hit counts, and a latency histogram per tool."""
+        return self.tool_calls.summary()
+
+    def mcp_health(self) -> dict:
+        """Per-server health: state, uptime, restarts and ping round trip."""
+        return {conn.server_id: conn.health() for conn in self.mcp_connections}
+
+    def _route(self, user_request: str, log: bool = True) -> str:
+        """'tool' if the request should go to the ReAct agent, otherwise 'chat'. `log` prints the decision."""
+        if self.react_agent is None:
+            return 'chat'
+        router = self.router
+        if router is None:
+            return 'tool'
+        decision = router.route(user_request)
+        if log:
+            print(f"Routing: {decision.route} (score {decision.score:.2f}, best tool '{decision.tool}', "
+                  f"decided in {decision.elapsed_ms:.2f} ms)")
+        return decision.route
+
+    def is_speculation_safe(self, user_request: str) -> bool:
+        """Whether a request may be answered speculatively, i.e. without running tools that have side effects."""
+        # Checked for every stable partial; only the final transcript's route is worth logging.
+        return self._route(user_request, log=False) == 'chat'
+
+    def route_summary(self) -> dict:
+        """Average time to first chunk and to completion per route."""
+        return {
+            route: {
+                'count': stats['count'],
+                'avg_first_chunk_ms': stats['first_chunk_ms'] / stats['count'] if stats['count'] else None,
+                'avg_total_ms': stats['total_ms'] / stats['count'] if stats['count'] else None,
+            }
+            for route, stats in self.route_stats.items()
+        }
+
+    def _agent_for(self, user_request: str, react_agent):
+        """
+        Returns a ReAct agent that only sees the tools most relevant to the request.
+        Agents are cached per tool subset; the full agent is used when the index finds nothing relevant.
+        """
+        max_tools = self.settings.get("react_max_tools", 8)
+        tools, tool_index = self.dspy_tools, self.tool_index
+        if not max_tools or tool_index is None or len(tools) <= max_tools or react_agent is not self.react_agent:
+            return react_agent, tools
+
+        selected = tool_index.top_k(user_request, max_tools)
+        if not selected:
+            return react_agent, tools
+        key = frozenset(selected)
+        agent = self._subset_agents.get(key)
+        if agent is None:
+            agent = self._react([tool for tool in tools if tool.name in key])
+            self._subset_agents[key] = agent
+            if len(self._subset_agents) > SUBSET_AGENT_CACHE_SIZE:
+                self._subset_agents.popitem(last=False)
+        else:
+            self._subset_agents.move_to_end(key)
+        return agent, [tool for tool in tools if tool.name in key]
+
+    async def _stream_answer(self, program, on_status=None, **inputs):
+        """
+        Runs `program` and yields its `answer` field as the LM produces it.
+        Raw LM deltas are fed through a FieldStreamParser, so answer text is released as soon as
+        its marker has been seen. Status messages (e.g. tool calls) go to `on_status`.
+        """
+        stream = dspy.streamify(program, status_message_provider=_STATUS_MESSAGES, is_async_program=True)
+        parser = FieldStreamParser("answer")
+        completion = None
+        async for item in stream(**inputs):
+            if isinstance(item, ModelResponseStream):
+                # Multi-step programs (ReAct) stream one completion per LM call; each has its own field markers.
+                key = (getattr(item, "predict_id", None), item.id)
+                if key != completion:
+                    completion = key
+                    parser.reset()
+                delta = item.choices[0].delta.content if item.choices else None
+                text = parser.feed(delta or "")
+                if text:
+                    yield text
+            elif isinstance(item, StatusMessage):
+                print(f"Agent status: {item.message}")
+                if on_status:
+                    on_status(item.message)
+            elif isinstance(item, dspy.Prediction):
+                text = parser.finish()
+                if text:
+                    yield text
+                elif not parser.emitted:
+                    # Nothing was streamed (e.g. an LM cache hit), so the answer only arrives with the prediction.
+                    answer = item.get('answer')
+                    yield str(answer) if answer is not None else "No answer from agent."
+
+    async def get_streamed_response(self, history: list[dict], on_status=None):
         """
         Calls the LM with conversation history and yields streamed response chunks.
+        `on_status(text)` is called with progress messages such as the tool being called.
         """
         if not history:
             yield "No history provided to DspyHandler."
             return
 
         user_request = history[-1]['content']
+        react_agent = self.react_agent # May be swapped by apply_settings while this request runs
+        route = self._route(user_request) if react_agent else 'chat'
+        started = time.perf_counter()
+        first_chunk_at = None
 
-        if self.react_agent and self.dspy_tools:
+        if route == 'tool':
+            agent, agent_tools = self._agent_for(user_request, react_agent)
             print(f"Using ReAct agent for request: {user_request}")
-            # Note: ReAct with tools from multiple MCP servers.
-            # The dspy.Tool objects created by from_mcp_tool hold a reference to their session.
-            # So, ReAct should be able to call the correct server via the tool's session.
+            print(f"ReAct tools: {len(agent_tools)} of {len(self.dspy_tools)}, tool descriptions "
+                  f"~{_prompt_tokens(agent_tools)} of ~{_prompt_tokens(self.dspy_tools)} prompt tokens per step "
+                  f"[{', '.join(tool.name for tool in agent_tools)}]")
+            # The dspy.Tool objects hold a LazySession for their server, so each call reaches the right process.
             try:
-                prediction = await self.react_agent.acall(user_request=user_request)
-                final_answer = prediction.answer
-                # print(f"ReAct Trajectory: {prediction.trajectory}") # For debugging
-                # Stream the final answer
-                # Ensure final_answer is a string
-                final_answer = str(final_answer) if final_answer is not None else "No answer from agent."
-                for i in range(0, len(final_answer), 10): # Chunk for streaming effect
-                    yield final_answer[i:i+10]
-                    await asyncio.sleep(0.01)
+                async for chunk in self._stream_answer(agent, on_status, user_request=user_request):
+                    first_chunk_at = first_chunk_at or time.perf_counter()
+                    yield chunk
             except Exception as e:
                 print(f"Error during ReAct agent call: {e}")
                 yield f"Error processing your request with tools: {str(e)}"
-        elif self.fallback_stream_predictor:
+        elif self.fallback_predictor:
             print(f"Using fallback stream predictor for request: {user_request}")
-            output_stream = self.fallback_stream_predictor(history=history)
-            async for item in output_stream:
-                if isinstance(item, StreamResponse):
-                    yield item.chunk
+            async for chunk in self._stream_answer(self.fallback_predictor, on_status, history=history):
+                first_chunk_at = first_chunk_at or time.perf_counter()
+                yield chunk
         else:
             yield "Error: No valid DSPy agent or predictor is configured."
+            return
+
+        finished = time.perf_counter()
+        stats = self.route_stats[route]
+        stats['count'] += 1
+        stats['total_ms'] += (finished - started) * 1000
+        stats['first_chunk_ms'] += ((first_chunk_at or finished) - started) * 1000
+        print(f"Route '{route}': first chunk after {((first_chunk_at or finished) - started) * 1000:.0f} ms, "
+              f"done after {(finished - started) * 1000:.0f} ms")
 
     async def shutdown(self):
-        """Shuts down the DspyHandler, including the MCP server and client session."""
+        """Shuts down the DspyHandler, closing every MCP session and its server process."""
         print("Shutting down DspyHandler...")
-        
-        for session_manager in self.active_mcp_sessions:
-            if session_manager:
-                await session_manager.close_session()
-        self.active_mcp_sessions = []
-
-        for mcp_server_proc in self.active_mcp_servers:
-            if mcp_server_proc and mcp_server_proc.poll() is None:
-                print(f"Terminating MCP server process PID: {mcp_server_proc.pid}...")
-                mcp_server_proc.terminate()
-                try:
-                    mcp_server_proc.wait(timeout=5)
-                    print(f"MCP server process PID: {mcp_server_proc.pid} terminated.")
-                except subprocess.TimeoutExpired:
-                    print(f"MCP server process PID: {mcp_server_proc.pid} did not terminate in time, killing.")
-                    mcp_server_proc.kill()
-                    mcp_server_proc.wait()
-        self.active_mcp_servers = []
-
-# Helper class to manage MCP ClientSession lifecycle for ReAct
-class ClientSessionContextManager:
-    def __init__(self, server_params: StdioServerParameters):
-        self.server_params = server_params
-        self._client_cm = None
-        self._read_pipe = None
-        self._write_pipe = None
-        self._session_cm = None
-        self.session = None
-
-    async def get_session(self):
-        if self.session and await self.is_active(): # Simplistic check
-            return self.session
-        
-        self._client_cm = stdio_client(self.server_params)
-        self._read_pipe, self._write_pipe = await self._client_cm.__aenter__()
-
-        self._session_cm = ClientSession(self._read_pipe, self._write_pipe)
-        self.session = await self._session_cm.__aenter__()
-        await self.session.initialize()
-        return self.session
-
-    async def is_active(self):
-        # A more robust check would involve a ping or status check with the MCP server
-        return self.session is not None # and self.server_params.command_or_popen_obj.poll() is None
-
-    async def close_session(self):
-        if self._session_cm:
-            try:
-                await self._session_cm.__aexit__(None, None, None)
-            except Exception as e:
-                print(f"Error closing MCP session: {e}")
-            self.session = None
-            self._session_cm = None
-        if self._client_cm:
-            try:
-                await self._client_cm.__aexit__(None, None, None)
-            except Exception as e:
-                print(f"Error closing MCP client: {e}")
-            self._read_pipe = None
-            self._write_pipe = None
-            self._client_cm = None
\ No newline at end of file
+        await asyncio.gather(*(conn.close() for conn in self.mcp_connections))
+        self.mcp_connections = []
@@ -0,0 +1,94 @@
+# src/core/field_parser.py
+import re
+
+# DSPy's ChatAdapter separates output fields with "[[ ## field_name ## ]]" lines.
+_MARKER = re.compile(r"\[\[ ## (\w+) ## \]\]")
+_MARKER_HEAD = "[[ ## "
+_MARKER_TAIL = " ## ]]"
+_LONGEST_HELD = 64 # Field names are short; anything longer that starts with "[[" is ordinary text
+
+
+def _is_marker_prefix(text: str) -> bool:
+    """Whether `text` could still grow into a complete "[[ ## name ## ]]" marker."""
+    if len(text) <= len(_MARKER_HEAD):
+        return _MARKER_HEAD.startswith(text)
+    if not text.startswith(_MARKER_HEAD):
+        return False
+    rest = text[len(_MARKER_HEAD):]
+    name_end = re.match(r"\w*", rest).end()
+    if name_end == len(rest):
+        return True
+    tail = rest[name_end:]
+    return name_end > 0 and len(tail) < len(_MARKER_TAIL) and _MARKER_TAIL.startswith(tail)
+
+
+class FieldStreamParser:
+    """
+    Pulls one output field out of a raw ChatAdapter completion as it streams.
+    Text is emitted as soon as it is known to belong to the field: only a possible partial marker
+    and trailing whitespace are held back, so markers split across chunks are handled.
+    """
+
+    def __init__(self, field: str = "answer"):
+        self.field = field
+        self.state = "before" # "before" the field's marker, "inside" the field, or "done"
+        self.emitted = False
+        self._field_started = False
+        self._buffer = ""
+
+    def reset(self):
+        """Starts over for a new completion (e.g. the next LM call of a multi-step program)."""
+        self.state = "before"
+        self._field_started = False
+        self._buffer = ""
+
+    def feed(self, delta: str) -> str:
+        """Consumes a raw delta and returns whatever field text it released (possibly "")."""
+        if self.state == "done" or not delta:
+            return ""
+        self._buffer += delta
+
+        if self.state == "before":
+            for match in _MARKER.finditer(self._buffer):
+                if match.group(1) == self.field:
+                    self.state = "inside"
+                    self._buffer = self._buffer[match.end():]
+                    break
+            else:
+                # Keep only what could be the start of a marker.
+                self._buffer = self._buffer[self._partial_marker_start():]
+                return ""
+
+        if not self._field_started:
+            # The field's text starts after the newline(s) that follow its marker.
+            self._buffer = self._buffer.lstrip()
+            self._field_started = bool(self._buffer)
+
+        match = _MARKER.search(self._buffer)
+        if match:
+            self.state = "done"
+            return self._release(self._buffer[:match.start()].rstrip(), "")
+
+        hold_from = self._partial_marker_start()
+        text, held = self._buffer[:hold_from], self._buffer[hold_from:]
+        stripped = text.rstrip()
+        return self._release(stripped, text[len(stripped):] + held)
+
+    def _partial_marker_start(self) -> int:
+        """Index where an incomplete marker begins at the end of the buffer, or len(buffer) if there is none."""
+        for i in range(max(0, len(self._buffer) - _LONGEST_HELD), len(self._buffer)):
+            if self._buffer[i] == "[" and _is_marker_prefix(self._buffer[i:]):
+                return i
+        return len(self._buffer)
+
+    def finish(self) -> str:
+        """Returns the field's remaining text once the completion has ended without a closing marker."""
+        if self.state != "inside":
+            return ""
+        self.state = "done"
+        return self._release(self._buffer.rstrip(), "")
+
+    def _release(self, text: str, keep: str) -> str:
+        self._buffer = keep
+        self.emitted = self.emitted or bool(text)
+        return text
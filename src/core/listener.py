@@ -1,68 +1,194 @@
 # src/core/listener.py
+import threading
+
 import speech_recognition as sr
 
+from .audio_buffer import AudioRingBuffer, MicrophoneCapture, CHUNK_SIZE
+from .vad import VadEndpointer
+
 class AssistantListener:
-    def __init__(self, assistant_name, callback):
+    def __init__(self, assistant_name, callback, wake_word_detector=None, streaming_recognizer=None):
         self.assistant_name = assistant_name.lower()
         self.callback = callback
+        # Optional local keyword spotter. When set, cloud recognition only runs on phrases it accepts.
+        self.wake_word_detector = wake_word_detector
+        # Optional streaming STT. When set, commands are transcribed while they are spoken.
+        self.streaming_recognizer = streaming_recognizer
         self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
-        self.stop_listening = None
-        self.recognizer.pause_threshold = 2.0
+        # Separate endpointers because wake detection and command capture run on different threads.
+        self.wake_vad = VadEndpointer()
+        self.command_vad = VadEndpointer()
+        self.last_endpoint = None # Endpoint decision for the most recent command, for latency reporting
+
+        # One microphone stream stays open for the listener's lifetime. Wake word detection and
+        # command capture both read from the shared ring buffer through their own cursors.
+        self.ring = AudioRingBuffer(capacity_seconds=30.0)
+        self.capture = MicrophoneCapture(self.ring)
+        self.capture.start()
+        self._wake_enabled = threading.Event()
+        self._closed = False
 
-        # Adjust for ambient noise once at the beginning
-        with self.microphone as source:
-            print("Calibrating microphone for ambient noise...")
-            self.recognizer.adjust_for_ambient_noise(source)
-            print("Calibration complete.")
+        # Measure ambient noise once at the beginning
+        print("Calibrating microphone for ambient noise...")
+        self._calibrate()
+        print("Calibration complete.")
+
+        self._wake_thread = threading.Thread(target=self._wake_loop, daemon=True)
+        self._wake_thread.start()
 
     def start(self):
         """Starts listening in the background for the wake word."""
-        if self.stop_listening is None: # Prevent starting multiple listeners
-            self.stop_listening = self.recognizer.listen_in_background(
-                self.microphone, self._listen_for_wake_word, phrase_time_limit=5
-            )
+        if not self._wake_enabled.is_set(): # Prevent starting multiple listeners
+            self._wake_enabled.set()
             print(f"Now listening in the background for '{self.assistant_name}'...")
 
     def stop(self):
-        """Stops the background listener and waits for it to terminate."""
-        if self.stop_listening:
-            # --- KEY FIX ---
-            # wait_for_stop=True ensures the thread is stopped and the
-            # microphone is released before this function returns.
-            self.stop_listening(wait_for_stop=True)
-            self.stop_listening = None # Mark as stopped
-            print("Background listening has been confirmed to be stopped.")
-
-    def _listen_for_wake_word(self, recognizer, audio):
+        """Pauses wake word detection. The microphone stream stays open."""
+        if self._wake_enabled.is_set():
+            self._wake_enabled.clear()
+            print("Background listening has been paused.")
+
+    def close(self):
+        """Stops wake word detection and releases the microphone."""
+        self._closed = True
+        self._wake_enabled.set() # Wake the background thread so it can exit
+        self.capture.stop()
+        self._wake_thread.join(timeout=2)
+
+    def _calibrate(self, duration=1.0):
+        """Sets the VAD noise floor from a short sample of ambient noise."""
+        cursor = self.ring.cursor()
+        samples = cursor.read(int(duration * self.ring.sample_rate), timeout=duration + 2)
+        if len(samples):
+            self.wake_vad.calibrate(samples)
+            self.command_vad.calibrate(samples)
+
+    def _capture_phrase(self, cursor, vad, timeout=None, phrase_time_limit=None, active=None, on_chunk=None):
+        """
+        Reads from `cursor` until `vad` decides an utterance has ended.
+        Returns the Endpoint with absolute ring positions, or None on timeout or when `active` is cleared.
+        """
+        rate = self.ring.sample_rate
+        origin = cursor.position
+        vad.reset()
+
+        while not self._closed and (active is None or active.is_set()):
+            chunk = cursor.read(CHUNK_SIZE, timeout=0.5)
+            if len(chunk) == 0:
+                continue
+            if on_chunk:
+                on_chunk(chunk)
+
+            endpoint = vad.process(chunk, max_speech_seconds=phrase_time_limit)
+            if endpoint:
+                endpoint.start += origin
+                endpoint.end += origin
+                return endpoint
+            if timeout and not vad.in_speech and vad.samples_seen / rate > timeout:
+                return None
+        return None
+
+    def _audio_data(self, start, end):
+        """Packages ring buffer samples as AudioData for speech_recognition."""
+        return sr.AudioData(self.ring.read(start, end).tobytes(), self.ring.sample_rate, 2)
+
+    def _wake_loop(self):
+        """Background thread: segments phrases from the ring buffer and checks them for the wake word."""
+        while not self._closed:
+            if not self._wake_enabled.wait(timeout=0.5) or self._closed:
+                continue
+            # Start from the live position so audio heard while paused isn't treated as a wake phrase.
+            cursor = self.ring.cursor()
+            hit = {'local': False}
+
+            def _on_chunk(chunk):
+                if self.wake_word_detector.process(chunk):
+                    hit['local'] = True
+
+            if self.wake_word_detector:
+                self.wake_word_detector.reset()
+            while self._wake_enabled.is_set() and not self._closed:
+                hit['local'] = False
+                phrase = self._capture_phrase(
+                    cursor, self.wake_vad, phrase_time_limit=5, active=self._wake_enabled,
+                    on_chunk=_on_chunk if self.wake_word_detector else None,
+                )
+                if phrase is None:
+                    continue
+                if self.wake_word_detector and not hit['local']:
+                    continue
+                if self.wake_word_detector:
+                    print("Local wake word hit. Confirming with cloud recognition.")
+                self._listen_for_wake_word(self.recognizer, self._audio_data(phrase.start, phrase.end), phrase.end)
+
+    def _listen_for_wake_word(self, recognizer, audio, phrase_end):
         try:
             text = recognizer.recognize_google(audio)
             print(f"Heard: {text}")
             if self.assistant_name in text.lower():
-                self.callback()
+                # Pass along anything said after the wake word so it can be used as the first command,
+                # and where the phrase ended so a follow-up command can be read from right after it.
+                self.callback(self._extract_command(text), phrase_end)
         except sr.UnknownValueError:
             pass # Ignore if speech is not understood
         except sr.RequestError as e:
             print(f"Could not request results from Google; {e}")
 
-    def listen_and_transcribe(self):
-        """Listens for a single command and transcribes it."""
+    def _extract_command(self, text):
+        """Returns the text following the wake word, e.g. 'open my calendar' from 'gemini, open my calendar'."""
+        index = text.lower().find(self.assistant_name)
+        if index == -1:
+            return ""
+        return text[index + len(self.assistant_name):].lstrip(" ,.!?:;-").strip()
+
+    def listen_and_transcribe(self, on_partial=None, start_position=None):
+        """
+        Listens for a single command and transcribes it.
+        `start_position` is the ring position to read from, e.g. the end of the wake phrase right after a wake word,
+        so nothing said in between is lost; by default listening starts now.
+        With a streaming recognizer, `on_partial` is called with each updated partial transcript.
+        """
         print("Listening for a command...")
+        start = start_position
+        if start is None:
+            start = self.ring.write_position - self.command_vad.preroll_samples
+        cursor = self.ring.cursor(max(start, self.ring.oldest_position))
+
+        stt = self.streaming_recognizer
+
+        def _feed_stt(chunk):
+            partial = stt.accept(chunk)
+            if partial and on_partial:
+                on_partial(partial)
+
+        on_chunk = _feed_stt if stt else None
+        if stt:
+            stt.start()
+
         try:
-            with self.microphone as source:
-                # Removed phrase_time_limit to allow pause_threshold to dictate end of speech.
-                # timeout=5 means it will wait 5s for speech to start.
-                audio = self.recognizer.listen(source, timeout=5)
+            # timeout=5 means it will wait 5s for speech to start; the VAD endpointer decides the end.
+            endpoint = self._capture_phrase(cursor, self.command_vad, timeout=5, on_chunk=on_chunk)
+            if endpoint is None:
+                if stt:
+                    stt.finish()
+                print("No command heard (timeout).")
+                return None
+            self.last_endpoint = endpoint
+            print(f"Endpoint: {endpoint.reason} after {endpoint.trailing_silence_seconds:.2f}s of trailing silence "
+                  f"(hangover {endpoint.hangover_seconds:.2f}s, speech {endpoint.speech_seconds:.2f}s).")
 
-            text = self.recognizer.recognize_google(audio)
+            if stt:
+                # The recognizer has already seen all the audio, so the final text is available immediately.
+                text = stt.finish()
+                if not text:
+                    raise sr.UnknownValueError()
+            else:
+                text = self.recognizer.recognize_google(self._audio_data(endpoint.start, endpoint.end))
             print(f"Command transcribed: '{text}'")
             return text
-        except sr.WaitTimeoutError:
-            print("No command heard (timeout).")
-            return None
         except sr.UnknownValueError:
             print("Could not understand the command.")
             return None
         except sr.RequestError as e:
             print(f"Speech recognition request failed: {e}")
-            return None
\ No newline at end of file
+            return None
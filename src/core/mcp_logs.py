@@ -0,0 +1,90 @@
+# src/core/mcp_logs.py
+import asyncio
+import collections
+import os
+import time
+
+
+class ServerLog:
+    """
+    Bounded in-memory log of one MCP server's stderr.
+    Every line is kept in a ring buffer; forwarding to the sink is rate limited with a token bucket,
+    so a chatty server can't flood the console. Suppressed lines are counted and reported.
+    """
+
+    def __init__(self, server_id: str, capacity: int = 500, lines_per_second: float = 20.0, burst: int = 40, sink=print):
+        self.server_id = server_id
+        self.lines = collections.deque(maxlen=capacity)
+        self.lines_per_second = lines_per_second
+        self.burst = burst
+        self.sink = sink
+        self.suppressed = 0
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+
+    def append(self, line: str):
+        self.lines.append(line)
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.lines_per_second)
+        self._refilled_at = now
+        if self._tokens < 1:
+            self.suppressed += 1
+            return
+        self._tokens -= 1
+        self.flush_suppressed()
+        self.sink(f"[MCP {self.server_id}] {line}")
+
+    def flush_suppressed(self):
+        if self.suppressed:
+            self.sink(f"[MCP {self.server_id}] ... {self.suppressed} lines not shown (see recent())")
+            self.suppressed = 0
+
+    def recent(self, n: int = 20) -> list:
+        """The last `n` lines, oldest first."""
+        return list(self.lines)[-n:]
+
+
+class LogPipe:
+    """
+    An OS pipe for a server's stderr, read by a task on the event loop instead of a thread.
+    Pass `writer` to stdio_client as errlog, then call close_writer() once the process has spawned.
+    """
+
+    def __init__(self, log: ServerLog):
+        read_fd, write_fd = os.pipe()
+        self.writer = os.fdopen(write_fd, 'w')
+        self._task = asyncio.create_task(self._pump(os.fdopen(read_fd, 'rb', buffering=0), log))
+
+    @staticmethod
+    async def _pump(pipe, log: ServerLog):
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=64 * 1024)
+        transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError: # Line longer than the limit; the reader has already dropped it
+                    log.append("<overlong line dropped>")
+                    continue
+                if not line:
+                    break
+                log.append(line.decode("utf-8", errors="replace").rstrip())
+        finally:
+            transport.close()
+            log.flush_suppressed()
+
+    def close_writer(self):
+        """Drops our copy of the write end, so the reader sees EOF when the server exits."""
+        if not self.writer.closed:
+            self.writer.close()
+
+    async def close(self, timeout: float = 1.0):
+        """Waits briefly for the server's last lines, then stops reading."""
+        self.close_writer()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        except Exception as e:
+            print(f"Error reading MCP server log: {e}")
@@ -0,0 +1,357 @@
+# src/core/mcp_manager.py
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import anyio
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.types import Tool as McpTool
+
+from .mcp_logs import LogPipe, ServerLog
+
+DEFAULT_STARTUP_TIMEOUT = 10.0 # Seconds a server gets to finish the initialize/list_tools handshake
+DEFAULT_PING_INTERVAL = 15.0
+PING_TIMEOUT = 5.0
+EXIT_POLL_INTERVAL = 0.5 # How often the transport is checked for a server process that has exited
+INITIAL_BACKOFF = 1.0
+HEALTHY_UPTIME = 60.0 # A session that stayed up this long resets the respawn backoff
+
+
+class McpServerConnection:
+    """
+    One stdio MCP server and its client session.
+    The session lives inside a single supervisor task, because the stdio transport must be entered
+    and exited from the same task. The server counts as ready once initialize and list_tools have succeeded.
+    After that the supervisor pings the session, notices when the process exits, and respawns it with
+    exponential backoff; tool calls made meanwhile wait in ensure_started() for the new session.
+    """
+
+    def __init__(self, config: dict, ping_interval: float = DEFAULT_PING_INTERVAL, max_backoff: float = 30.0):
+        self.config = config
+        self.server_id = config.get("id", "UnnamedServer")
+        self.ping_interval = ping_interval
+        self.max_backoff = max_backoff
+        self.session = None
+        self._read_stream = None # Transport of the current session; its sending side closes when the server exits
+        self.tools = [] # mcp.types.Tool specs reported by list_tools
+        self.timeline = [] # (event, seconds since start()) pairs for the latest spawn
+        self.error = None
+        self.log = ServerLog(self.server_id) # The server's stderr, across restarts
+        self.stats = {'restarts': 0, 'last_ping_ms': None, 'ping_failures': 0, 'connected_at': None}
+        self.on_tools_listed = None # Optional callback(connection), run after every successful handshake
+        self.closed = False # Set by close(); a closed connection is never started again
+        self._started_at = None
+        self._ready = None # Resolved by the first handshake after start()
+        self._connected = asyncio.Event()
+        self._stop = None
+        self._task = None
+        self._start_lock = asyncio.Lock()
+
+    def _mark(self, event: str):
+        self.timeline.append((event, time.perf_counter() - self._started_at))
+
+    def _server_params(self) -> StdioServerParameters:
+        env = None
+        if self.config.get("env"):
+            # An explicit env replaces the inherited one entirely, so merge it into ours.
+            env = {**os.environ, **self.config["env"]}
+        return StdioServerParameters(
+            command=self.config["command"],
+            args=self.config.get("args", []),
+            env=env,
+        )
+
+    async def start(self, timeout: float = DEFAULT_STARTUP_TIMEOUT) -> bool:
+        """Spawns the server and waits for the handshake. Returns whether it became ready within `timeout`."""
+        loop = asyncio.get_running_loop()
+        self._ready = loop.create_future()
+        self._stop = asyncio.Event()
+        self._task = asyncio.create_task(self._supervise(), name=f"mcp:{self.server_id}")
+        try:
+            await asyncio.wait_for(asyncio.shield(self._ready), timeout)
+            return True
+        except asyncio.TimeoutError:
+            self.error = f"no handshake within {timeout:.1f}s"
+            self._mark("timed_out")
+        except Exception as e:
+            self.error = str(e) or type(e).__name__
+        await self.stop()
+        return False
+
+    async def _supervise(self):
+        """Runs sessions back to back until stop(), respawning a server that dies after its first handshake."""
+        backoff = INITIAL_BACKOFF
+        while True:
+            session_started = time.monotonic()
+            await self._run_session()
+            if self._stop.is_set() or not self._ready.done() or self._ready.cancelled() or self._ready.exception():
+                return
+            if time.monotonic() - session_started >= HEALTHY_UPTIME:
+                backoff = INITIAL_BACKOFF
+            print(f"MCP server '{self.server_id}' went down ({self.error}). Respawning in {backoff:.0f}s.")
+            try:
+                await asyncio.wait_for(self._stop.wait(), backoff)
+                return # Stopped while waiting to respawn
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, self.max_backoff)
+            self.stats['restarts'] += 1
+
+    async def _run_session(self):
+        self._started_at = time.perf_counter()
+        self.timeline = []
+        try:
+            self._mark("spawn")
+            log_pipe = LogPipe(self.log)
+            try:
+                async with stdio_client(self._server_params(), errlog=log_pipe.writer) as (read_stream, write_stream):
+                    log_pipe.close_writer() # The child has its own copy now
+                    async with ClientSession(read_stream, write_stream) as session:
+                        await session.initialize()
+                        self._mark("initialized")
+                        self.tools = (await session.list_tools()).tools
+                        self._mark("tools_listed")
+                        self._read_stream = read_stream
+                        self.session = session
+                        self.error = None
+                        self.stats['connected_at'] = time.monotonic()
+                        self._connected.set()
+                        if not self._ready.done():
+                            self._ready.set_result(True)
+                        else:
+                            print(f"MCP server '{self.server_id}' reconnected [{self.format_timeline()}]")
+                        if self.on_tools_listed:
+                            try:
+                                self.on_tools_listed(self)
+                            except Exception as e:
+                                print(f"Error handling tool list from MCP server '{self.server_id}': {e}")
+                        await self._monitor(session)
+            finally:
+                # Drain the last stderr lines first, so they are available when a failed start is reported.
+                await log_pipe.close()
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            self._mark("failed")
+            error = _unwrap(e)
+            self.error = str(error) or type(error).__name__
+            if not self._ready.done():
+                self._ready.set_exception(error)
+        finally:
+            self.session = None
+            self._read_stream = None
+            self.stats['connected_at'] = None
+            self._connected.clear()
+
+    def _session_alive(self) -> bool:
+        """False once the server process has exited, even if the supervisor hasn't noticed yet."""
+        # stdio_client closes the sending side of the read stream when the server's stdout reaches EOF.
+        return self._read_stream is not None and self._read_stream.statistics().open_send_streams > 0
+
+    async def _monitor(self, session: ClientSession):
+        """Returns on stop(); raises once the server process has exited or stops answering pings."""
+        next_ping = time.monotonic() + self.ping_interval
+        while not self._stop.is_set():
+            if not self._session_alive():
+                raise ConnectionError("server process exited")
+            try:
+                await asyncio.wait_for(self._stop.wait(), EXIT_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            if self.ping_interval and time.monotonic() >= next_ping and not self._stop.is_set():
+                ping_started = time.perf_counter()
+                try:
+                    await asyncio.wait_for(session.send_ping(), PING_TIMEOUT)
+                except asyncio.TimeoutError:
+                    self.stats['ping_failures'] += 1
+                    raise ConnectionError(f"no ping response within {PING_TIMEOUT:.0f}s")
+                self.stats['last_ping_ms'] = (time.perf_counter() - ping_started) * 1000
+                next_ping = time.monotonic() + self.ping_interval
+
+    async def stop(self, timeout: float = 5.0):
+        """Stops supervision, closes the session and lets stdio_client terminate the process."""
+        if not self._task:
+            return
+        self._stop.set()
+        if self.session is None:
+            self._task.cancel() # Mid-handshake, so nothing is waiting on the stop event
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass # wait_for cancels the task on timeout, which also tears the transport down
+        except Exception as e:
+            print(f"Error stopping MCP server '{self.server_id}': {e}")
+        self._task = None
+
+    async def close(self, timeout: float = 5.0):
+        """Stops the server for good: tools still holding this connection can no longer respawn it."""
+        self.closed = True
+        await self.stop(timeout)
+
+    async def ensure_started(self, timeout: float = DEFAULT_STARTUP_TIMEOUT, stale: ClientSession = None) -> ClientSession:
+        """
+        Returns the live session. Spawns the server if it isn't running, and waits for the supervisor
+        if it is reconnecting, so callers queue up instead of failing. `stale` is a session the caller
+        found dead; it is never returned.
+        """
+        async with self._start_lock:
+            if self.closed:
+                raise RuntimeError(f"MCP server '{self.server_id}' has been removed")
+            if self.session is not None:
+                if self.session is not stale and self._session_alive():
+                    return self.session
+                # The server died before the supervisor noticed; wait for its respawn below.
+                self._connected.clear()
+            if self._task and not self._task.done():
+                try:
+                    await asyncio.wait_for(self._connected.wait(), timeout + self.max_backoff)
+                except asyncio.TimeoutError:
+                    raise RuntimeError(f"MCP server '{self.server_id}' is still reconnecting: {self.error}")
+                if self.session is not None:
+                    return self.session
+            if self._task:
+                await self.stop()
+            if not await self.start(timeout):
+                raise RuntimeError(f"MCP server '{self.server_id}' could not be started: {self.error}")
+            print(f"MCP server '{self.server_id}' started on first use [{self.format_timeline()}]")
+            return self.session
+
+    def health(self) -> dict:
+        """Uptime of the current session, restart count and latest ping round trip."""
+        if self.session is not None:
+            state = 'connected'
+        elif self._task and not self._task.done():
+            state = 'reconnecting' if self._ready and self._ready.done() else 'starting'
+        else:
+            state = 'stopped'
+        connected_at = self.stats['connected_at']
+        return {
+            'state': state,
+            'uptime_seconds': time.monotonic() - connected_at if connected_at else 0.0,
+            'restarts': self.stats['restarts'],
+            'last_ping_ms': self.stats['last_ping_ms'],
+            'ping_failures': self.stats['ping_failures'],
+            'last_error': self.error,
+        }
+
+    def format_timeline(self) -> str:
+        return ", ".join(f"{event} +{seconds * 1000:.0f} ms" for event, seconds in self.timeline)
+
+
+def _unwrap(error: BaseException) -> BaseException:
+    """anyio wraps transport failures in exception groups; the first leaf is the useful one."""
+    while isinstance(error, BaseExceptionGroup) and error.exceptions:
+        error = error.exceptions[0]
+    return error
+
+
+class LazySession:
+    """
+    Stands in for a ClientSession in dspy.Tool.from_mcp_tool.
+    The first call_tool spawns the server, so tools built from cached schemas cost nothing until used.
+    """
+
+    def __init__(self, connection: McpServerConnection, startup_timeout: float = DEFAULT_STARTUP_TIMEOUT, calls=None):
+        self.connection = connection
+        self.startup_timeout = startup_timeout
+        self.calls = calls # Optional ToolCallLayer for result caching and latency stats
+
+    async def call_tool(self, name: str, arguments: dict = None):
+        async def _invoke():
+            session = await self.connection.ensure_started(self.startup_timeout)
+            try:
+                return await session.call_tool(name, arguments=arguments)
+            except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+                # The transport closed before the request went out; retry once on the respawned session.
+                print(f"MCP server '{self.connection.server_id}' went away during '{name}'. Retrying once it is back.")
+                session = await self.connection.ensure_started(self.startup_timeout, stale=session)
+                return await session.call_tool(name, arguments=arguments)
+
+        if self.calls is None:
+            return await _invoke()
+        return await self.calls.call(self.connection.server_id, name, arguments, _invoke)
+
+
+def schema_cache_key(config: dict) -> str:
+    """
+    Hash of everything that can change a server's tool list: command, args, env, and the mtimes of the
+    executable and of any argument that is a file (usually the server script).
+    """
+    def _mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except (OSError, TypeError):
+            return None
+
+    command = config.get("command")
+    args = config.get("args", [])
+    material = {
+        "command": command,
+        "args": args,
+        "env": config.get("env"),
+        "command_mtime": _mtime(shutil.which(command) if command else None),
+        "file_mtimes": [_mtime(arg) if os.path.isfile(arg) else None for arg in args],
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ToolSchemaCache:
+    """Persists each server's list_tools result on disk, keyed by schema_cache_key()."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str):
+        """Returns the cached list of mcp.types.Tool, or None."""
+        try:
+            with open(self._path(key), 'r') as f:
+                return [McpTool.model_validate(spec) for spec in json.load(f)]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Warning: Ignoring unreadable MCP tool cache entry {key[:12]}: {e}")
+            return None
+
+    def put(self, key: str, tools: list):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, 'w') as f:
+                json.dump(tool_specs(tools), f)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"Warning: Could not write MCP tool cache entry: {e}")
+
+
+def tool_specs(tools: list) -> list:
+    """JSON-serialisable form of a list of mcp.types.Tool, also used to compare schemas."""
+    return [tool.model_dump(mode="json", exclude_none=True) for tool in tools]
+
+
+async def start_servers(connections: list, default_timeout: float = DEFAULT_STARTUP_TIMEOUT) -> list:
+    """
+    Starts the given connections concurrently and logs a startup timeline for each.
+    Returns the connections that became ready; the others have already been stopped.
+    """
+    started_at = time.perf_counter()
+    results = await asyncio.gather(
+        *(conn.start(conn.config.get("startup_timeout", default_timeout)) for conn in connections)
+    )
+    total_ms = (time.perf_counter() - started_at) * 1000
+
+    print(f"MCP startup finished in {total_ms:.0f} ms ({sum(results)}/{len(connections)} servers ready):")
+    for conn, ready in zip(connections, results):
+        status = f"ready, {len(conn.tools)} tools" if ready else f"failed: {conn.error}"
+        print(f"  {conn.server_id}: {status} [{conn.format_timeline()}]")
+        if not ready:
+            for line in conn.log.recent(5):
+                print(f"    | {line}")
+    return [conn for conn, ready in zip(connections, results) if ready]
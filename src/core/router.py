@@ -0,0 +1,183 @@
+# src/core/router.py
+import json
+import math
+import re
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "the", "to", "of", "in", "on", "for", "and", "or", "is", "are", "be", "it", "this", "that",
+    "me", "my", "i", "you", "your", "please", "can", "could", "would", "will", "with", "at", "by", "from",
+    "what", "how", "do", "does", "some", "any", "just", "now", "up", "so", "as", "if", "into", "about",
+}
+# Requests that open with one of these usually want something done rather than said.
+_ACTION_VERBS = {
+    "open", "close", "launch", "start", "stop", "run", "play", "pause", "resume", "set", "turn", "create",
+    "make", "delete", "remove", "send", "search", "find", "take", "move", "copy", "show", "list", "check",
+    "increase", "decrease", "raise", "lower", "mute", "unmute", "shut", "restart", "lock", "type", "click",
+    "schedule", "remind", "read", "write", "save", "download", "install", "switch", "enable", "disable",
+}
+_CHAT_CUES = re.compile(
+    r"\b(thanks|thank you|joke|hello|hi|hey|how are you|good (morning|afternoon|evening|night)|"
+    r"who are you|what'?s your name|what is your name|tell me about yourself|never ?mind|bye|goodbye)\b"
+)
+_POLITE_OPENERS = {"please", "can", "could", "would", "will", "you", "hey", "ok", "okay", "now", "just"}
+# Greetings and thanks in front of a request ("hi, open chrome") are skipped when looking for its verb.
+_GREETINGS = {"hi", "hello", "hey", "thanks", "thank", "good", "morning", "afternoon", "evening", "so", "well", "alright"}
+ACTION_BONUS = 0.15
+CHAT_PENALTY = 0.3
+
+
+def _stem(word: str) -> str:
+    for suffix in ("ing", "ed", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> list:
+    """Lowercased, stemmed content words. Tool names like open_application are split on underscores."""
+    words = _WORD.findall(text.replace("_", " ").lower())
+    return [_stem(word) for word in words if word not in _STOPWORDS and len(word) > 1]
+
+
+@dataclass
+class RouteDecision:
+    route: str # "tool" or "chat"
+    score: float
+    tool: str # Best matching tool name, or None
+    elapsed_ms: float
+
+
+class IntentRouter:
+    """
+    Cheap local router that decides whether a request needs the tool-using agent.
+    Scores are the TF-IDF cosine similarity between the request and the best matching tool
+    (name, description and argument names), nudged up for imperative openings and down for small talk.
+    """
+
+    def __init__(self, tools: list, threshold: float = 0.15):
+        """`tools` is a list of (name, description, arg_names) tuples."""
+        self.threshold = threshold
+        self._tool_names = []
+        documents = []
+        for name, description, arg_names in tools:
+            self._tool_names.append(name)
+            # The name is the strongest signal, so it counts twice.
+            documents.append(Counter(tokenize(name) * 2 + tokenize(description or "") + tokenize(" ".join(arg_names or []))))
+
+        document_frequency = Counter(term for doc in documents for term in doc)
+        self._idf = {term: math.log(1 + len(documents) / df) for term, df in document_frequency.items()}
+        self._vectors = [self._weigh(doc) for doc in documents]
+
+    def _weigh(self, counts: Counter) -> tuple:
+        # Terms no tool mentions get the highest IDF, so off-topic words dilute the similarity.
+        unseen_idf = math.log(1 + max(len(self._tool_names), 1))
+        vector = {term: count * self._idf.get(term, unseen_idf) for term, count in counts.items()}
+        return vector, math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+
+    def score(self, text: str) -> tuple:
+        """Returns (score, best tool name) for a request."""
+        tokens = tokenize(text)
+        query, query_norm = self._weigh(Counter(tokens))
+        best_score, best_tool = 0.0, None
+        for name, (vector, norm) in zip(self._tool_names, self._vectors):
+            similarity = sum(weight * vector.get(term, 0.0) for term, weight in query.items()) / (query_norm * norm)
+            if similarity > best_score:
+                best_score, best_tool = similarity, name
+
+        lowered = text.lower()
+        words = [word for word in _WORD.findall(lowered) if word not in _POLITE_OPENERS and word not in _GREETINGS]
+        if words and words[0] in _ACTION_VERBS:
+            best_score += ACTION_BONUS
+        # Small talk only counts against a request that is nothing but small talk, or that matches no tool anyway.
+        if _CHAT_CUES.search(lowered) and (not tokenize(_CHAT_CUES.sub(" ", lowered)) or best_score < self.threshold):
+            best_score -= CHAT_PENALTY
+        return best_score, best_tool
+
+    def route(self, text: str) -> RouteDecision:
+        started = time.perf_counter()
+        score, tool = self.score(text)
+        route = "tool" if score >= self.threshold else "chat"
+        return RouteDecision(route, score, tool, (time.perf_counter() - started) * 1000)
+
+
+class ToolIndex:
+    """
+    BM25 index over tool specs (name, description and argument names), built once when tools load.
+    Picks the tools most relevant to a request, so the agent only has to be shown those.
+    """
+
+    def __init__(self, tools: list, k1: float = 1.2, b: float = 0.75):
+        """`tools` is a list of (name, description, arg_names) tuples."""
+        self.k1 = k1
+        self.b = b
+        self.names = [name for name, _, _ in tools]
+        self._documents = [
+            Counter(tokenize(name) * 2 + tokenize(description or "") + tokenize(" ".join(arg_names or [])))
+            for name, description, arg_names in tools
+        ]
+        self._lengths = [sum(doc.values()) for doc in self._documents]
+        self._average_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+        document_frequency = Counter(term for doc in self._documents for term in doc)
+        n = len(self._documents)
+        self._idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    def scores(self, text: str) -> list:
+        """BM25 score of every tool for the request, in index order."""
+        terms = [term for term in set(tokenize(text)) if term in self._idf]
+        results = []
+        for doc, length in zip(self._documents, self._lengths):
+            score = 0.0
+            for term in terms:
+                tf = doc.get(term, 0)
+                if tf:
+                    norm = self.k1 * (1 - self.b + self.b * length / (self._average_length or 1.0))
+                    score += self._idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            results.append(score)
+        return results
+
+    def top_k(self, text: str, k: int) -> list:
+        """Names of the `k` best matching tools with a positive score, best first."""
+        ranked = sorted(zip(self.scores(text), self.names), key=lambda item: -item[0])
+        return [name for score, name in ranked[:k] if score > 0]
+
+
+def evaluate_router(router: IntentRouter, cases: list, thresholds=None) -> dict:
+    """
+    Scores labelled cases ({"text": ..., "route": "tool" | "chat"}) at several thresholds,
+    so the default can be tuned against real transcripts.
+    """
+    scored = [(router.score(case["text"])[0], case["route"], case["text"]) for case in cases]
+    thresholds = thresholds or [round(0.05 * i, 2) for i in range(1, 11)]
+    results = []
+    for threshold in thresholds:
+        predicted = [("tool" if score >= threshold else "chat", label, text) for score, label, text in scored]
+        tool_hits = sum(1 for route, label, _ in predicted if route == label == "tool")
+        predicted_tool = sum(1 for route, _, _ in predicted if route == "tool")
+        actual_tool = sum(1 for _, label, _ in predicted if label == "tool")
+        results.append({
+            'threshold': threshold,
+            'accuracy': sum(1 for route, label, _ in predicted if route == label) / len(predicted) if predicted else 0.0,
+            'tool_precision': tool_hits / predicted_tool if predicted_tool else 0.0,
+            'tool_recall': tool_hits / actual_tool if actual_tool else 0.0,
+            'misrouted': [text for route, label, text in predicted if route != label],
+        })
+    best = max(results, key=lambda result: (result['accuracy'], result['tool_recall']))
+    return {'cases': len(cases), 'best_threshold': best['threshold'], 'results': results}
+
+
+if __name__ == '__main__':
+    # Usage: python -m src.core.router tests/fixtures/router_cases.json
+    # Fixture format: {"tools": [{"name": ..., "description": ..., "args": [...]}], "cases": [{"text": ..., "route": "tool"|"chat"}]}
+    with open(sys.argv[1], 'r') as f:
+        fixtures = json.load(f)
+    router = IntentRouter([(tool["name"], tool.get("description"), tool.get("args")) for tool in fixtures["tools"]])
+    report = evaluate_router(router, fixtures["cases"])
+    for result in report['results']:
+        print(f"threshold {result['threshold']:.2f}: accuracy {result['accuracy']:.2f}, "
+              f"tool precision {result['tool_precision']:.2f}, tool recall {result['tool_recall']:.2f}")
+    print(f"Best threshold over {report['cases']} cases: {report['best_threshold']}")
@@ -0,0 +1,141 @@
+# src/core/speculation.py
+import asyncio
+import re
+import threading
+import time
+
+
+def _normalize(text: str) -> str:
+    """Normalises a transcript so trivial casing/punctuation differences still count as a match."""
+    return " ".join(re.sub(r"[^\w\s]", "", text or "").lower().split())
+
+
+class _Speculation:
+    """One in-flight speculative response, buffered on the asyncio loop until it is confirmed or cancelled."""
+
+    _DONE = object()
+
+    def __init__(self, loop, response_stream, text: str):
+        self.text = text
+        self.started_at = time.perf_counter()
+        self.first_chunk_at = None
+        self._queue = asyncio.Queue()
+        self._future = asyncio.run_coroutine_threadsafe(self._run(response_stream), loop)
+
+    async def _run(self, response_stream):
+        try:
+            async for chunk in response_stream:
+                if self.first_chunk_at is None:
+                    self.first_chunk_at = time.perf_counter()
+                self._queue.put_nowait(chunk)
+        except Exception as e:
+            self._queue.put_nowait(e)
+        finally:
+            self._queue.put_nowait(self._DONE)
+
+    async def chunks(self):
+        """Yields the buffered chunks followed by the rest of the stream as it arrives."""
+        while True:
+            item = await self._queue.get()
+            if item is self._DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def head_start_ms(self, now: float) -> float:
+        """How much earlier the first token is available than if the request had started at `now`."""
+        first = self.first_chunk_at if self.first_chunk_at is not None else now
+        return max(0.0, (min(now, first) - self.started_at) * 1000)
+
+    def cancel(self):
+        self._future.cancel()
+
+
+class SpeculativeDispatcher:
+    """
+    Starts the LLM response from a partial transcript once it has stopped changing for `stable_seconds`.
+    When the final transcript arrives, a matching speculation is handed over and anything else is cancelled.
+    """
+
+    def __init__(self, loop, start_response, stable_seconds: float = 0.3, can_speculate=None):
+        self.loop = loop
+        self.start_response = start_response # Callable(text) -> async iterator of response chunks
+        self.stable_seconds = stable_seconds
+        self.can_speculate = can_speculate # Optional Callable(text) -> bool, e.g. to avoid tool side effects
+        self._lock = threading.Lock()
+        self._timer = None
+        self._partial = None
+        self._current = None
+        self.stats = {'dispatched': 0, 'reissued': 0, 'hits': 0, 'misses': 0, 'saved_ms_total': 0.0}
+
+    def on_partial(self, text: str):
+        """Called with every new partial transcript; (re)arms the stability timer."""
+        with self._lock:
+            self._partial = text
+            if self._timer:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.stable_seconds, self._on_stable, args=(text,))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _on_stable(self, text: str):
+        with self._lock:
+            if text != self._partial:
+                return
+            if self._current and _normalize(self._current.text) == _normalize(text):
+                return
+            if self.can_speculate and not self.can_speculate(text):
+                return
+            if self._current:
+                self._current.cancel()
+                self.stats['reissued'] += 1
+            print(f"Speculatively dispatching on stable partial: '{text}'")
+            self._current = _Speculation(self.loop, self.start_response(text), text)
+            self.stats['dispatched'] += 1
+
+    def resolve(self, final_text: str):
+        """Returns the speculation matching the final transcript, or None. Any other speculation is cancelled."""
+        now = time.perf_counter()
+        with self._lock:
+            speculation = self._take()
+            if speculation is None:
+                return None
+            hit = _normalize(speculation.text) == _normalize(final_text)
+            if hit:
+                saved_ms = speculation.head_start_ms(now)
+                self.stats['hits'] += 1
+                self.stats['saved_ms_total'] += saved_ms
+            else:
+                self.stats['misses'] += 1
+            summary = self.summary()
+
+        if hit:
+            print(f"Speculation hit: saved {saved_ms:.0f} ms. Stats: {summary}")
+            return speculation
+        speculation.cancel()
+        print(f"Speculation miss: '{speculation.text}' != '{final_text}'. Stats: {summary}")
+        return None
+
+    def reset(self):
+        """Cancels any pending timer and speculation, e.g. when no command was heard."""
+        with self._lock:
+            speculation = self._take()
+        if speculation:
+            speculation.cancel()
+
+    def _take(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        self._partial = None
+        speculation, self._current = self._current, None
+        return speculation
+
+    def summary(self) -> dict:
+        resolved = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'hit_rate': self.stats['hits'] / resolved if resolved else 0.0,
+            'avg_saved_ms': self.stats['saved_ms_total'] / self.stats['hits'] if self.stats['hits'] else 0.0,
+        }
@@ -0,0 +1,97 @@
+# src/core/streaming_stt.py
+import abc
+import json
+import os
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+class StreamingRecognizer(abc.ABC):
+    """
+    Base class for speech recognizers that consume audio while the user is still speaking.
+    Call start() per utterance, accept() for each chunk, and finish() once the endpoint fires.
+    """
+    sample_rate = SAMPLE_RATE
+
+    @abc.abstractmethod
+    def start(self):
+        """Begins a new utterance."""
+
+    @abc.abstractmethod
+    def accept(self, samples: np.ndarray):
+        """Feeds int16 samples. Returns the updated partial transcript if it changed, else None."""
+
+    @abc.abstractmethod
+    def finish(self) -> str:
+        """Flushes the utterance and returns the final transcript ('' if nothing was recognised)."""
+
+
+class VoskStreamingRecognizer(StreamingRecognizer):
+    """Offline streaming recognizer backed by a local Vosk (Kaldi) model."""
+
+    def __init__(self, model_path: str):
+        from vosk import KaldiRecognizer, Model, SetLogLevel # Optional dependency, only needed for this backend
+        SetLogLevel(-1)
+        self._recognizer_cls = KaldiRecognizer
+        self.model = Model(model_path)
+        self._recognizer = None
+        self._segments = []
+        self._partial = ""
+
+    def start(self):
+        self._recognizer = self._recognizer_cls(self.model, self.sample_rate)
+        self._segments = []
+        self._partial = ""
+
+    def _text(self, partial: str = "") -> str:
+        return " ".join(s for s in self._segments + [partial] if s)
+
+    def accept(self, samples: np.ndarray):
+        if self._recognizer.AcceptWaveform(np.asarray(samples, dtype=np.int16).tobytes()):
+            # Vosk finalised a segment on its own (e.g. at a short pause); keep it and carry on.
+            segment = json.loads(self._recognizer.Result()).get('text', '')
+            if segment:
+                self._segments.append(segment)
+            partial = self._text()
+        else:
+            partial = self._text(json.loads(self._recognizer.PartialResult()).get('partial', ''))
+
+        if partial != self._partial:
+            self._partial = partial
+            return partial
+        return None
+
+    def finish(self) -> str:
+        final = json.loads(self._recognizer.FinalResult()).get('text', '')
+        text = self._text(final)
+        self._recognizer = None
+        return text
+
+
+def create_streaming_recognizer(settings: dict):
+    """
+    Builds the streaming speech recognizer configured in settings.
+    Returns None when commands should be transcribed with Google after the endpoint instead.
+    """
+    engine = settings.get('stt_engine', 'vosk')
+    if engine in (None, 'google'):
+        return None
+
+    if engine == 'vosk':
+        model_path = os.path.expanduser(settings.get('vosk_model_path') or '')
+        if not model_path or not os.path.isdir(model_path):
+            print("Warning: No Vosk model found. Falling back to Google speech recognition.")
+            return None
+        try:
+            return VoskStreamingRecognizer(model_path)
+        except ImportError:
+            print("Warning: The 'vosk' package is not installed (install the 'vosk' extra). Falling back to Google speech recognition.")
+            return None
+        except Exception as e:
+            print(f"Warning: Could not load Vosk model from {model_path}: {e}. Falling back to Google speech recognition.")
+            return None
+
+    print(f"Warning: Unknown speech recognition engine '{engine}'. Falling back to Google speech recognition.")
+    return None
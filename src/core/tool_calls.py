@@ -0,0 +1,181 @@
+# src/core/tool_calls.py
+import asyncio
+import bisect
+import collections
+import json
+import time
+
+import dspy
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket catches everything slower.
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+PARALLEL_TOOL_NAME = "run_tools_in_parallel"
+
+
+def canonical_arguments(arguments: dict) -> str:
+    """Stable form of tool arguments for cache keys: sorted keys, no whitespace differences."""
+    return json.dumps(arguments or {}, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with approximate percentiles."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.count = 0
+
+    def record(self, ms: float):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.total_ms += ms
+        self.count += 1
+
+    def percentile(self, fraction: float):
+        """Upper bound of the bucket holding the given fraction of samples (None for the open-ended bucket)."""
+        if not self.count:
+            return None
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS + (None,), self.counts):
+            seen += count
+            if seen >= fraction * self.count:
+                return bound
+        return None
+
+    def summary(self) -> dict:
+        labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            'count': self.count,
+            'avg_ms': self.total_ms / self.count if self.count else None,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'buckets': {label: count for label, count in zip(labels, self.counts) if count},
+        }
+
+
+class _Flight:
+    """One real call shared by identical concurrent callers."""
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class ToolCallLayer:
+    """
+    Sits between the agent's tools and the MCP sessions.
+    Results of opted-in tools are cached for a TTL keyed on (server, tool, canonical arguments),
+    identical calls already in flight share one request, and every real call is timed per tool.
+    A shared request runs in its own task, so one caller being cancelled doesn't cancel it for the others;
+    it is only cancelled once nobody is waiting for it.
+    """
+
+    def __init__(self, ttl_for, max_entries: int = 256):
+        self.ttl_for = ttl_for # Callable(server_id, tool_name) -> TTL in seconds; 0 means never cache
+        self.max_entries = max_entries
+        self._results = collections.OrderedDict() # key -> (expires_at, result), least recently used first
+        self._in_flight = {} # key -> _Flight shared by identical concurrent calls
+        self.histograms = collections.defaultdict(LatencyHistogram) # "server/tool" -> latency of completed calls
+        self.stats = {'calls': 0, 'cache_hits': 0, 'shared_in_flight': 0, 'failed': 0, 'cancelled': 0}
+
+    async def call(self, server_id: str, tool_name: str, arguments: dict, invoke):
+        """Runs `invoke()` (the real MCP call) unless a fresh cached or in-flight result can be used."""
+        self.stats['calls'] += 1
+        ttl = self.ttl_for(server_id, tool_name)
+        if not ttl:
+            return await self._timed(server_id, tool_name, invoke)
+
+        key = (server_id, tool_name, canonical_arguments(arguments))
+        entry = self._results.get(key)
+        if entry and entry[0] > time.monotonic():
+            self._results.move_to_end(key)
+            self.stats['cache_hits'] += 1
+            return entry[1]
+        flight = self._in_flight.get(key)
+        if flight is None:
+            flight = self._in_flight[key] = _Flight(asyncio.ensure_future(self._fetch(key, ttl, invoke)))
+            # Marks a failure retrieved even if the callers were cancelled before it arrived.
+            flight.task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        else:
+            self.stats['shared_in_flight'] += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # Every caller gave up, so nobody needs the result.
+                flight.task.cancel()
+                if self._in_flight.get(key) is flight:
+                    del self._in_flight[key]
+
+    async def _fetch(self, key: tuple, ttl: float, invoke):
+        """The shared request behind call(): runs it once and caches a successful result."""
+        try:
+            result = await self._timed(key[0], key[1], invoke)
+        finally:
+            flight = self._in_flight.get(key)
+            if flight is not None and flight.task is asyncio.current_task():
+                del self._in_flight[key]
+        if not getattr(result, "isError", False):
+            self._results[key] = (time.monotonic() + ttl, result)
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return result
+
+    async def _timed(self, server_id: str, tool_name: str, invoke):
+        """Runs `invoke()`. Only calls that complete go into the latency histogram; the rest are counted."""
+        started = time.perf_counter()
+        try:
+            result = await invoke()
+        except asyncio.CancelledError:
+            self.stats['cancelled'] += 1
+            raise
+        except Exception:
+            self.stats['failed'] += 1
+            raise
+        self.histograms[f"{server_id}/{tool_name}"].record((time.perf_counter() - started) * 1000)
+        return result
+
+    def invalidate(self, server_id: str):
+        """Drops cached results of one server, e.g. after its configuration changed."""
+        for key in [key for key in self._results if key[0] == server_id]:
+            del self._results[key]
+
+    def clear(self):
+        """Drops every cached result, e.g. after the TTL settings changed."""
+        self._results.clear()
+
+    def summary(self) -> dict:
+        return {**self.stats, 'tools': {name: histogram.summary() for name, histogram in self.histograms.items()}}
+
+
+def make_parallel_tool(tools: list) -> dspy.Tool:
+    """
+    A tool that runs several independent tool calls concurrently, so one agent step can issue all of them.
+    Calls to different servers run on their own sessions; calls to the same server are multiplexed on one.
+    """
+    by_name = {tool.name: tool for tool in tools}
+
+    async def run_tools_in_parallel(calls: list[dict]) -> list:
+        async def _one(call):
+            tool = by_name.get(call.get("tool"))
+            if tool is None:
+                return f"Unknown tool: {call.get('tool')}"
+            try:
+                return await tool.acall(**(call.get("args") or {}))
+            except Exception as e:
+                return f"Error calling {tool.name}: {e}"
+
+        return list(await asyncio.gather(*(_one(call) for call in calls)))
+
+    return dspy.Tool(
+        run_tools_in_parallel,
+        name=PARALLEL_TOOL_NAME,
+        desc=(
+            "Run several independent tool calls at the same time and get their results in order. "
+            'Each call is {"tool": <tool name>, "args": {<arguments>}}. Only use it for calls that do not depend on each other.'
+        ),
+    )
@@ -0,0 +1,166 @@
+# src/core/vad.py
+from dataclasses import dataclass
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+FRAME_LENGTH = 320 # 20 ms frames at 16 kHz
+
+
+def frame_features(samples: np.ndarray, frame_length: int = FRAME_LENGTH):
+    """
+    Computes per-frame energy (dB), zero-crossing rate and spectral flatness for int16 audio.
+    Returns three arrays of length len(samples) // frame_length; trailing partial frames are ignored.
+    """
+    n_frames = len(samples) // frame_length
+    frames = np.asarray(samples[:n_frames * frame_length], dtype=np.float32).reshape(n_frames, frame_length) / 32768.0
+
+    energy_db = 10.0 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    signs = np.signbit(frames)
+    zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+    power = np.abs(np.fft.rfft(frames * np.hanning(frame_length), axis=1)) ** 2 + 1e-12
+    flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+    return energy_db, zcr, flatness
+
+
+@dataclass
+class Endpoint:
+    """Where an utterance started and ended, and why the endpointer decided it was over."""
+    start: int # Sample offsets relative to the last reset()
+    end: int
+    speech_seconds: float
+    trailing_silence_seconds: float
+    hangover_seconds: float
+    reason: str # "finished", "mid_phrase_pause" or "max_length"
+
+
+class VadEndpointer:
+    """
+    Streaming voice activity detector that decides when an utterance is over.
+
+    Frames count as speech when they are well above the tracked noise floor and tonal (low spectral
+    flatness); noisy, high zero-crossing frames such as fricatives only extend speech that already
+    started. After speech stops, the required silence (hangover) adapts to how the speech ended:
+    a trailing-off ending is treated as a finished sentence and gets a short hangover, while an
+    abrupt stop at full volume is treated as a mid-phrase pause and gets a longer one.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, energy_margin_db: float = 9.0,
+                 flatness_threshold: float = 0.45, zcr_threshold: float = 0.25,
+                 min_speech_seconds: float = 0.06, preroll_seconds: float = 0.3,
+                 short_hangover_seconds: float = 0.45, long_hangover_seconds: float = 1.1,
+                 finished_drop_db: float = 6.0, min_sentence_seconds: float = 0.5):
+        self.sample_rate = sample_rate
+        self.frame_seconds = FRAME_LENGTH / sample_rate
+        self.energy_margin_db = energy_margin_db
+        self.flatness_threshold = flatness_threshold
+        self.zcr_threshold = zcr_threshold
+        self.min_speech_frames = max(1, round(min_speech_seconds / self.frame_seconds))
+        self.preroll_samples = int(preroll_seconds * sample_rate)
+        self.short_hangover_seconds = short_hangover_seconds
+        self.long_hangover_seconds = long_hangover_seconds
+        self.finished_drop_db = finished_drop_db
+        self.min_sentence_seconds = min_sentence_seconds
+        self.noise_floor_db = -60.0
+        self.reset()
+
+    def calibrate(self, samples: np.ndarray):
+        """Initialises the noise floor from a sample of ambient audio."""
+        energy_db, _, _ = frame_features(samples)
+        if len(energy_db):
+            self.noise_floor_db = float(np.median(energy_db))
+
+    def reset(self):
+        """Starts a new utterance. The noise floor estimate is kept."""
+        self._pending = np.zeros(0, dtype=np.int16)
+        self._frames_seen = 0
+        self._onset_run = 0
+        self._speech_start_frame = None
+        self._last_speech_frame = None
+        self._voiced_energies = []
+        self._hangover_seconds = None
+
+    @property
+    def in_speech(self) -> bool:
+        return self._speech_start_frame is not None
+
+    @property
+    def samples_seen(self) -> int:
+        return self._frames_seen * FRAME_LENGTH
+
+    def process(self, samples: np.ndarray, max_speech_seconds: float = None):
+        """Feeds audio into the endpointer. Returns an Endpoint once the utterance has ended, else None."""
+        samples = np.concatenate([self._pending, np.asarray(samples, dtype=np.int16)])
+        n_frames = len(samples) // FRAME_LENGTH
+        self._pending = samples[n_frames * FRAME_LENGTH:]
+        if n_frames == 0:
+            return None
+
+        energy_db, zcr, flatness = frame_features(samples[:n_frames * FRAME_LENGTH])
+        loud = energy_db > self.noise_floor_db + self.energy_margin_db
+        tonal = flatness < self.flatness_threshold
+        noisy = zcr > self.zcr_threshold
+
+        for i in range(n_frames):
+            frame = self._frames_seen
+            self._frames_seen += 1
+            is_speech = loud[i] and (tonal[i] or (self.in_speech and noisy[i]))
+
+            if not self.in_speech:
+                if is_speech:
+                    self._onset_run += 1
+                    if self._onset_run >= self.min_speech_frames:
+                        self._speech_start_frame = frame - self._onset_run + 1
+                        self._last_speech_frame = frame
+                else:
+                    self._onset_run = 0
+                    self._update_noise_floor(energy_db[i])
+                continue
+
+            if is_speech:
+                self._last_speech_frame = frame
+                self._hangover_seconds = None
+                self._voiced_energies.append(float(energy_db[i]))
+                speech_seconds = (frame - self._speech_start_frame + 1) * self.frame_seconds
+                if max_speech_seconds and speech_seconds >= max_speech_seconds:
+                    return self._endpoint(frame, "max_length")
+                continue
+
+            if self._hangover_seconds is None:
+                self._hangover_seconds = self._choose_hangover()
+            silence_seconds = (frame - self._last_speech_frame) * self.frame_seconds
+            if silence_seconds >= self._hangover_seconds:
+                reason = "finished" if self._hangover_seconds == self.short_hangover_seconds else "mid_phrase_pause"
+                return self._endpoint(frame, reason)
+        return None
+
+    def _update_noise_floor(self, energy_db: float):
+        # Follow drops in the noise floor immediately and rises slowly, so speech onsets don't inflate it.
+        if energy_db < self.noise_floor_db:
+            self.noise_floor_db = energy_db
+        else:
+            self.noise_floor_db = 0.98 * self.noise_floor_db + 0.02 * energy_db
+
+    def _choose_hangover(self) -> float:
+        """Picks the trailing-silence wait based on how the speech just ended."""
+        speech_seconds = (self._last_speech_frame - self._speech_start_frame + 1) * self.frame_seconds
+        tail_frames = max(1, round(0.15 / self.frame_seconds))
+        if len(self._voiced_energies) <= tail_frames or speech_seconds < self.min_sentence_seconds:
+            return self.long_hangover_seconds
+        energies = np.array(self._voiced_energies)
+        drop = np.percentile(energies, 75) - energies[-tail_frames:].mean()
+        return self.short_hangover_seconds if drop >= self.finished_drop_db else self.long_hangover_seconds
+
+    def _endpoint(self, frame: int, reason: str) -> Endpoint:
+        start = max(0, self._speech_start_frame * FRAME_LENGTH - self.preroll_samples)
+        end = (frame + 1) * FRAME_LENGTH
+        endpoint = Endpoint(
+            start=start,
+            end=end,
+            speech_seconds=(self._last_speech_frame - self._speech_start_frame + 1) * self.frame_seconds,
+            trailing_silence_seconds=(frame - self._last_speech_frame) * self.frame_seconds,
+            hangover_seconds=self._hangover_seconds or 0.0,
+            reason=reason,
+        )
+        self.reset()
+        return endpoint
@@ -0,0 +1,270 @@
+# src/core/wake_word.py
+import abc
+import glob
+import os
+import sys
+import time
+import wave
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+FRAME_LENGTH = 400 # 25 ms analysis window at 16 kHz
+HOP_LENGTH = 160 # 10 ms hop at 16 kHz
+N_FFT = 512
+N_MELS = 26
+
+
+def _mel_filterbank(sample_rate=SAMPLE_RATE, n_fft=N_FFT, n_mels=N_MELS):
+    """Builds a triangular mel filterbank matrix of shape (n_mels, n_fft // 2 + 1)."""
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def mel_to_hz(mel):
+        return 700.0 * (10.0 ** (mel / 2595.0) - 1.0)
+
+    mel_points = np.linspace(hz_to_mel(20.0), hz_to_mel(sample_rate / 2), n_mels + 2)
+    bins = np.floor((n_fft + 1) * mel_to_hz(mel_points) / sample_rate).astype(int)
+
+    fbank = np.zeros((n_mels, n_fft // 2 + 1))
+    for m in range(1, n_mels + 1):
+        left, center, right = bins[m - 1], bins[m], bins[m + 1]
+        if center > left:
+            fbank[m - 1, left:center] = (np.arange(left, center) - left) / (center - left)
+        if right > center:
+            fbank[m - 1, center:right] = (right - np.arange(center, right)) / (right - center)
+    return fbank
+
+
+_MEL_FBANK = _mel_filterbank()
+_WINDOW = np.hanning(FRAME_LENGTH)
+
+
+def log_mel_features(samples: np.ndarray) -> np.ndarray:
+    """
+    Computes per-frame log-mel features for 16 kHz mono audio.
+    Each row is mean-normalised across bands so the features are invariant to input gain.
+    """
+    samples = np.asarray(samples)
+    if np.issubdtype(samples.dtype, np.integer):
+        samples = samples.astype(np.float32) / 32768.0
+    if len(samples) < FRAME_LENGTH:
+        return np.zeros((0, N_MELS), dtype=np.float32)
+
+    n_frames = 1 + (len(samples) - FRAME_LENGTH) // HOP_LENGTH
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FRAME_LENGTH)[::HOP_LENGTH][:n_frames]
+    spectrum = np.abs(np.fft.rfft(frames * _WINDOW, n=N_FFT)) ** 2
+    mel = np.log(spectrum @ _MEL_FBANK.T + 1e-10)
+    mel -= mel.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(mel, axis=1, keepdims=True)
+    return (mel / np.maximum(norms, 1e-8)).astype(np.float32)
+
+
+def read_wav(path: str) -> np.ndarray:
+    """Reads a PCM WAV file as 16 kHz mono int16 samples."""
+    with wave.open(path, 'rb') as wf:
+        channels = wf.getnchannels()
+        width = wf.getsampwidth()
+        rate = wf.getframerate()
+        raw = wf.readframes(wf.getnframes())
+
+    if width != 2:
+        raise ValueError(f"Only 16-bit PCM WAV files are supported: {path}")
+    samples = np.frombuffer(raw, dtype=np.int16)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    if rate != SAMPLE_RATE:
+        duration = len(samples) / rate
+        target_len = int(duration * SAMPLE_RATE)
+        samples = np.interp(
+            np.linspace(0, len(samples) - 1, target_len), np.arange(len(samples)), samples
+        ).astype(np.int16)
+    return samples
+
+
+class WakeWordDetector(abc.ABC):
+    """
+    Base class for local wake-word detectors.
+    Detectors consume 16 kHz mono int16 audio incrementally and report whether the wake word was heard.
+    """
+    sample_rate = SAMPLE_RATE
+
+    @abc.abstractmethod
+    def process(self, samples: np.ndarray) -> bool:
+        """Feeds a block of samples into the detector. Returns True if the wake word ended in this block."""
+
+    def reset(self):
+        """Clears any streaming state, e.g. between unrelated phrases."""
+        pass
+
+    def detect(self, samples: np.ndarray) -> bool:
+        """Runs the detector over a complete phrase."""
+        self.reset()
+        hit = self.process(samples)
+        self.reset()
+        return hit
+
+
+class TemplateWakeWordDetector(WakeWordDetector):
+    """
+    Keyword spotter that matches incoming audio against enrolled recordings of the wake word.
+    Uses a streaming subsequence DTW over log-mel frames, so each 10 ms hop costs O(template length).
+    """
+
+    def __init__(self, templates: list, threshold: float = 0.35, energy_threshold: float = 300.0, refractory_seconds: float = 1.0):
+        self.templates = [t for t in (log_mel_features(s) for s in templates) if len(t) > 2]
+        if not self.templates:
+            raise ValueError("TemplateWakeWordDetector needs at least one non-empty template.")
+        self.threshold = threshold
+        self.energy_threshold = energy_threshold
+        self.refractory_frames = int(refractory_seconds * SAMPLE_RATE / HOP_LENGTH)
+        self.last_score = float('inf')
+        self.reset()
+
+    @classmethod
+    def from_wav_files(cls, paths: list, **kwargs):
+        return cls([read_wav(p) for p in paths], **kwargs)
+
+    def reset(self):
+        self._pending = np.zeros(0, dtype=np.int16)
+        self._costs = [np.full(len(t), np.inf) for t in self.templates]
+        self._lengths = [np.zeros(len(t)) for t in self.templates]
+        self._cooldown = 0
+        self._voiced_frames = 0
+
+    def process(self, samples: np.ndarray) -> bool:
+        samples = np.concatenate([self._pending, np.asarray(samples, dtype=np.int16)])
+        n_frames = 0 if len(samples) < FRAME_LENGTH else 1 + (len(samples) - FRAME_LENGTH) // HOP_LENGTH
+        self._pending = samples[n_frames * HOP_LENGTH:]
+        if n_frames == 0:
+            return False
+
+        features = log_mel_features(samples[:(n_frames - 1) * HOP_LENGTH + FRAME_LENGTH])
+        frames = np.lib.stride_tricks.sliding_window_view(samples, FRAME_LENGTH)[::HOP_LENGTH][:n_frames]
+        rms = np.sqrt(np.mean(frames.astype(np.float32) ** 2, axis=1))
+
+        hit = False
+        for feature, energy in zip(features, rms):
+            self._voiced_frames = self._voiced_frames + 1 if energy >= self.energy_threshold else 0
+            if self._step(feature) and self._cooldown == 0:
+                hit = True
+                self._cooldown = self.refractory_frames
+            elif self._cooldown:
+                self._cooldown -= 1
+        return hit
+
+    def _step(self, feature: np.ndarray) -> bool:
+        """Advances every template's DTW column by one input frame."""
+        best = float('inf')
+        for i, template in enumerate(self.templates):
+            cost = 1.0 - template @ feature # cosine distance, features are unit-norm
+            prev, prev_len = self._costs[i], self._lengths[i]
+
+            # Allowed steps from the previous column: stay (i, j-1), diagonal (i-1, j-1), skip (i-2, j-1).
+            candidates = np.stack([
+                prev,
+                np.concatenate([[0.0], prev[:-1]]),
+                np.concatenate([[0.0, np.inf], prev[:-2]]),
+            ])
+            lengths = np.stack([
+                prev_len,
+                np.concatenate([[0.0], prev_len[:-1]]),
+                np.concatenate([[0.0, 0.0], prev_len[:-2]]),
+            ])
+            choice = np.argmin(candidates, axis=0)
+            idx = np.arange(len(template))
+            self._costs[i] = candidates[choice, idx] + cost
+            self._lengths[i] = lengths[choice, idx] + 1
+            best = min(best, self._costs[i][-1] / self._lengths[i][-1])
+
+        self.last_score = best
+        # Require the match to end on voiced audio so silence cannot complete a template.
+        return best <= self.threshold and self._voiced_frames > 0
+
+
+def create_wake_word_detector(settings: dict):
+    """
+    Builds the local wake-word detector configured in settings.
+    Returns None when no local engine is configured, in which case callers fall back to cloud-only detection.
+    """
+    engine = settings.get('wake_word_engine', 'template')
+    if engine in (None, 'cloud', 'none'):
+        return None
+
+    if engine == 'template':
+        templates = settings.get('wake_word_templates') or []
+        paths = [p for p in (os.path.expanduser(t) for t in templates) if os.path.exists(p)]
+        if not paths:
+            print("Warning: No wake word templates found. Falling back to cloud wake word detection.")
+            return None
+        try:
+            return TemplateWakeWordDetector.from_wav_files(
+                paths,
+                threshold=settings.get('wake_word_threshold', 0.35),
+                energy_threshold=settings.get('wake_word_energy_threshold', 300.0),
+            )
+        except (ValueError, wave.Error) as e:
+            print(f"Warning: Could not load wake word templates: {e}. Falling back to cloud wake word detection.")
+            return None
+
+    print(f"Warning: Unknown wake word engine '{engine}'. Falling back to cloud wake word detection.")
+    return None
+
+
+def benchmark_detector(detector: WakeWordDetector, fixtures_dir: str, block_size: int = 1024) -> dict:
+    """
+    Measures false-accept/false-reject rates and processing latency against recorded WAV fixtures.
+    Expects `positive/*.wav` (contain the wake word) and `negative/*.wav` (do not) under fixtures_dir.
+    """
+    results = {'positives': 0, 'negatives': 0, 'false_rejects': 0, 'false_accepts': 0,
+               'negative_audio_seconds': 0.0, 'detection_times': [], 'block_latencies': []}
+
+    for label in ('positive', 'negative'):
+        for path in sorted(glob.glob(os.path.join(fixtures_dir, label, '*.wav'))):
+            samples = read_wav(path)
+            detector.reset()
+            hit_at = None
+            for start in range(0, len(samples), block_size):
+                t0 = time.perf_counter()
+                hit = detector.process(samples[start:start + block_size])
+                results['block_latencies'].append(time.perf_counter() - t0)
+                if hit and hit_at is None:
+                    hit_at = min(start + block_size, len(samples)) / SAMPLE_RATE
+
+            if label == 'positive':
+                results['positives'] += 1
+                if hit_at is None:
+                    results['false_rejects'] += 1
+                else:
+                    results['detection_times'].append(hit_at)
+            else:
+                results['negatives'] += 1
+                results['negative_audio_seconds'] += len(samples) / SAMPLE_RATE
+                if hit_at is not None:
+                    results['false_accepts'] += 1
+
+    latencies = np.array(results.pop('block_latencies') or [0.0]) * 1000
+    block_ms = block_size / SAMPLE_RATE * 1000
+    hours = results['negative_audio_seconds'] / 3600
+    results.update({
+        'false_reject_rate': results['false_rejects'] / max(results['positives'], 1),
+        'false_accept_rate': results['false_accepts'] / max(results['negatives'], 1),
+        'false_accepts_per_hour': results['false_accepts'] / hours if hours else 0.0,
+        'detection_time_s_mean': float(np.mean(results['detection_times'])) if results['detection_times'] else None,
+        'block_latency_ms_mean': float(latencies.mean()),
+        'block_latency_ms_p95': float(np.percentile(latencies, 95)),
+        'real_time_factor': float(latencies.mean() / block_ms),
+    })
+    return results
+
+
+if __name__ == '__main__':
+    # Usage: python -m src.core.wake_word <fixtures_dir> <template.wav> [<template.wav> ...]
+    if len(sys.argv) < 3:
+        print("Usage: python -m src.core.wake_word <fixtures_dir> <template.wav> [<template.wav> ...]")
+        sys.exit(1)
+    detector = TemplateWakeWordDetector.from_wav_files(sys.argv[2:])
+    report = benchmark_detector(detector, sys.argv[1])
+    for key, value in report.items():
+        if key != 'detection_times':
+            print(f"{key}: {value}")
@@ -0,0 +1,186 @@
+# src/services/audio_player.py
+import collections
+import threading
+import time
+
+SAMPLE_WIDTH = 2 # 16-bit PCM
+
+
+class NullAudioOutput:
+    """Headless output device. Accepts audio without playing it, optionally pacing writes in real time."""
+
+    def __init__(self, sample_rate: int, channels: int = 1, realtime: bool = False):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.realtime = realtime
+        self.bytes_written = 0
+        self.first_write_at = None
+
+    def write(self, data: bytes):
+        if self.first_write_at is None:
+            self.first_write_at = time.perf_counter()
+        self.bytes_written += len(data)
+        if self.realtime:
+            time.sleep(len(data) / (self.sample_rate * self.channels * SAMPLE_WIDTH))
+
+    def close(self):
+        pass
+
+
+class PyAudioOutput:
+    """Output device backed by one long-lived PyAudio stream, so each utterance skips device setup."""
+
+    def __init__(self, sample_rate: int, channels: int = 1):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self._pyaudio = None
+        self._stream = None
+
+    def _open(self):
+        import pyaudio
+        self._pyaudio = pyaudio.PyAudio()
+        self._stream = self._pyaudio.open(
+            format=pyaudio.paInt16, channels=self.channels, rate=self.sample_rate, output=True
+        )
+
+    def write(self, data: bytes):
+        if self._stream is None:
+            self._open()
+        self._stream.write(data)
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._pyaudio is not None:
+            self._pyaudio.terminate()
+            self._pyaudio = None
+
+
+class StreamingAudioPlayer:
+    """
+    Plays raw 16-bit PCM chunks from a streaming synthesis iterator as they arrive.
+
+    Chunks go into a bounded jitter buffer. Playback starts once `preroll_ms` of audio is buffered
+    (or the stream ends) and rebuffers the same way after an underrun. Audio is written to the device
+    in `frame_ms` slices so stop() takes effect almost immediately.
+    """
+
+    def __init__(self, output, preroll_ms: int = 150, max_buffer_ms: int = 3000, frame_ms: int = 20):
+        self.output = output
+        bytes_per_ms = output.sample_rate * output.channels * SAMPLE_WIDTH / 1000
+        self.frame_bytes = self._align(int(frame_ms * bytes_per_ms))
+        self.preroll_bytes = self._align(int(preroll_ms * bytes_per_ms))
+        self.max_buffer_bytes = max(self._align(int(max_buffer_ms * bytes_per_ms)), self.preroll_bytes)
+        self._buffer = collections.deque()
+        self._buffered = 0
+        self._condition = threading.Condition()
+        self._stopped = False
+        self.stats = {'underruns': 0, 'time_to_first_audio_ms': None}
+
+    def _align(self, n: int) -> int:
+        frame = self.output.channels * SAMPLE_WIDTH
+        return max(frame, n - n % frame)
+
+    def reset(self):
+        """Re-arms the player after stop(), e.g. at the start of a new turn."""
+        with self._condition:
+            self._stopped = False
+            self._buffer.clear()
+            self._buffered = 0
+
+    def play(self, chunks) -> bool:
+        """
+        Plays an iterator of PCM byte chunks and blocks until it has finished.
+        Returns False if playback was stopped early, or right away if stop() was called since the last reset().
+        """
+        with self._condition:
+            self._buffer.clear()
+            self._buffered = 0
+        state = {'done': False, 'error': None}
+        started_at = time.perf_counter()
+        self.stats['time_to_first_audio_ms'] = None
+
+        producer = threading.Thread(target=self._fill, args=(chunks, state), daemon=True)
+        producer.start()
+
+        playing = False
+        while True:
+            with self._condition:
+                if not playing:
+                    # Pre-roll: wait for enough audio to ride out network jitter before starting.
+                    self._condition.wait_for(lambda: self._stopped or state['done'] or self._buffered >= self.preroll_bytes)
+                    playing = True
+                if self._stopped:
+                    break
+                if self._buffered == 0:
+                    if state['done']:
+                        break
+                    self.stats['underruns'] += 1
+                    playing = False
+                    continue
+                frame = self._take(self.frame_bytes)
+
+            if self.stats['time_to_first_audio_ms'] is None:
+                self.stats['time_to_first_audio_ms'] = (time.perf_counter() - started_at) * 1000
+            self.output.write(frame)
+
+        producer.join(timeout=0.1)
+        if state['error']:
+            raise state['error']
+        return not self._stopped
+
+    def _fill(self, chunks, state):
+        """Producer thread: moves synthesized chunks into the bounded jitter buffer."""
+        remainder = b""
+        try:
+            for chunk in chunks:
+                data = remainder + chunk
+                # Keep whole samples together; a chunk may end in the middle of one.
+                cut = len(data) - len(data) % (self.output.channels * SAMPLE_WIDTH)
+                data, remainder = data[:cut], data[cut:]
+                with self._condition:
+                    self._condition.wait_for(
+                        lambda: self._stopped or self._buffered == 0 or self._buffered + len(data) <= self.max_buffer_bytes
+                    )
+                    if self._stopped:
+                        return
+                    self._buffer.append(data)
+                    self._buffered += len(data)
+                    self._condition.notify_all()
+        except Exception as e:
+            state['error'] = e
+        finally:
+            with self._condition:
+                state['done'] = True
+                self._condition.notify_all()
+
+    def _take(self, size: int) -> bytes:
+        """Removes up to `size` bytes from the front of the buffer. Caller holds the condition."""
+        parts = []
+        while size > 0 and self._buffer:
+            chunk = self._buffer[0]
+            if len(chunk) <= size:
+                parts.append(self._buffer.popleft())
+                size -= len(chunk)
+            else:
+                parts.append(chunk[:size])
+                self._buffer[0] = chunk[size:]
+                size = 0
+        frame = b"".join(parts)
+        self._buffered -= len(frame)
+        self._condition.notify_all()
+        return frame
+
+    def stop(self):
+        """Stops playback immediately and drops anything still buffered."""
+        with self._condition:
+            self._stopped = True
+            self._buffer.clear()
+            self._buffered = 0
+            self._condition.notify_all()
+
+    def close(self):
+        self.stop()
+        self.output.close()
@@ -0,0 +1,188 @@
+# src/services/client_registry.py
+import contextlib
+import hashlib
+import json
+import threading
+import time
+
+import httpx
+from elevenlabs.client import ElevenLabs
+from google import genai
+
+# Keep connections to the API hosts open between requests so each call skips TCP/TLS setup.
+_HTTP_LIMITS = httpx.Limits(max_connections=10, max_keepalive_connections=5, keepalive_expiry=120)
+
+
+def _fingerprint(config: dict) -> str:
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "client", "close", "users")
+
+    def __init__(self, fingerprint: str, client, close):
+        self.fingerprint = fingerprint
+        self.client = client
+        self.close = close # Callable that releases the client, or None
+        self.users = 0 # Leases currently held on the client
+
+
+class ClientRegistry:
+    """
+    Creates each service client once per configuration and hands out the same instance afterwards.
+    A client is rebuilt only when the settings it depends on change. The replaced client is closed once
+    the last lease on it has ended, so a request still using it (e.g. a speech stream) can finish.
+    """
+
+    def __init__(self):
+        self._clients = {} # name -> _Entry
+        self._retired = [] # (name, _Entry) replaced while leased; closed when their last lease ends
+        self._lock = threading.Lock()
+        self.stats = {'created': 0, 'reused': 0}
+
+    def _acquire(self, name: str, config: dict, factory, lease: bool) -> _Entry:
+        fingerprint = _fingerprint(config)
+        stale = None
+        with self._lock:
+            entry = self._clients.get(name)
+            if entry and entry.fingerprint == fingerprint:
+                self.stats['reused'] += 1
+            else:
+                if entry is not None:
+                    if entry.users:
+                        self._retired.append((name, entry))
+                    else:
+                        stale = entry
+                client, close = factory(config)
+                entry = self._clients[name] = _Entry(fingerprint, client, close)
+                self.stats['created'] += 1
+            if lease:
+                entry.users += 1
+        if stale:
+            _close(name, stale)
+        return entry
+
+    def get(self, name: str, config: dict, factory):
+        """
+        Returns the client registered under `name`, creating it if the config changed.
+        `factory(config)` returns (client, close) where close is a callable that releases it, or None.
+        Use lease() instead when the client must stay open until the caller is done with it.
+        """
+        return self._acquire(name, config, factory, lease=False).client
+
+    @contextlib.contextmanager
+    def lease(self, name: str, config: dict, factory):
+        """Like get(), but the client is not closed before the `with` block ends, even if it is replaced meanwhile."""
+        entry = self._acquire(name, config, factory, lease=True)
+        try:
+            yield entry.client
+        finally:
+            with self._lock:
+                entry.users -= 1
+                retired = not entry.users and (name, entry) in self._retired
+                if retired:
+                    self._retired.remove((name, entry))
+            if retired:
+                _close(name, entry)
+
+    def close_all(self):
+        """Closes every client that has a close callable and forgets all of them."""
+        with self._lock:
+            entries = list(self._clients.items()) + self._retired
+            self._clients, self._retired = {}, []
+        for name, entry in entries:
+            _close(name, entry)
+
+
+def _close(name: str, entry: _Entry):
+    if entry.close:
+        try:
+            entry.close()
+        except Exception as e:
+            print(f"Error closing '{name}' client: {e}")
+
+
+registry = ClientRegistry()
+
+
+def genai_client(settings: dict):
+    """
+    Lease on the shared Gemini client: `with genai_client(settings) as client: ...`.
+    Use `.aio` on it for the async API; both reuse the same connection pool.
+    """
+    api_key = settings.get('GOOGLE_API_KEY')
+    if not api_key:
+        raise ValueError("GOOGLE_API_KEY not found. Please set it in your environment variables or settings.")
+    return registry.lease('genai', {'api_key': api_key}, lambda config: (genai.Client(api_key=config['api_key']), None))
+
+
+def _new_elevenlabs_client(config: dict):
+    http_client = httpx.Client(limits=_HTTP_LIMITS, timeout=60)
+    return ElevenLabs(api_key=config['api_key'], httpx_client=http_client), http_client.close
+
+
+def elevenlabs_client(settings: dict):
+    """
+    Lease on the shared synchronous ElevenLabs client, backed by a keep-alive HTTP connection pool:
+    `with elevenlabs_client(settings) as client: ...`. A changed API key doesn't cut off a stream in progress.
+    """
+    api_key = settings.get('ELEVENLABS_API_KEY')
+    if not api_key:
+        raise ValueError("ELEVENLABS_API_KEY not found.")
+    return registry.lease('elevenlabs', {'api_key': api_key}, _new_elevenlabs_client)
+
+
+def benchmark_client_reuse(calls: int = 50) -> dict:
+    """
+    Compares a new HTTP client per call (the old behaviour) against one pooled keep-alive client,
+    using a local stand-in HTTP server so the result doesn't depend on the network.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1" # Allows keep-alive
+        disable_nagle_algorithm = True # Otherwise delayed ACKs dominate the keep-alive timings
+
+        def do_GET(self):
+            body = b'{"ok": true}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    try:
+        start = time.perf_counter()
+        for _ in range(calls):
+            with httpx.Client(limits=_HTTP_LIMITS) as client:
+                client.get(url)
+        fresh_ms = (time.perf_counter() - start) * 1000 / calls
+
+        start = time.perf_counter()
+        with httpx.Client(limits=_HTTP_LIMITS) as client:
+            for _ in range(calls):
+                client.get(url)
+        pooled_ms = (time.perf_counter() - start) * 1000 / calls
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return {
+        'calls': calls,
+        'new_client_per_call_ms': fresh_ms,
+        'pooled_client_ms': pooled_ms,
+        'saved_per_call_ms': fresh_ms - pooled_ms,
+    }
+
+
+if __name__ == '__main__':
+    # Usage: python -m src.services.client_registry
+    for key, value in benchmark_client_reuse().items():
+        print(f"{key}: {value}")
@@ -0,0 +1,195 @@
+# src/services/conversation_store.py
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+# External-content FTS5 index over messages.content. The table is append-only, so an insert trigger keeps it current.
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(content, content='messages', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+END;
+"""
+
+
+@dataclass(frozen=True)
+class StoredMessage:
+    id: int
+    role: str # "user" or "assistant"
+    content: str
+    created_at: float # Unix time
+
+
+def _fts_query(text: str) -> str:
+    """Quotes every word, so user input can't be misread as FTS5 query syntax."""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+class ConversationStore:
+    """
+    Append-only SQLite (WAL mode) log of conversation turns with full-text search.
+    append() only enqueues; a background writer commits queued turns in batches, so callers never wait on disk.
+    Ids are handed out by append() itself, so one process should write a database at a time.
+    Reads use a connection per thread and see everything committed so far, so read from a long-lived thread
+    (or call close_reader() when a thread is done).
+    """
+
+    def __init__(self, path: str, batch_size: int = 64, flush_interval: float = 0.5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.session_id = time.strftime("%Y%m%d-%H%M%S")
+        self.has_fts = True
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._closed = False
+        self._id_lock = threading.Lock()
+
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        try:
+            conn.executescript(_FTS_SCHEMA)
+        except sqlite3.OperationalError as e:
+            print(f"SQLite FTS5 unavailable ({e}); conversation search falls back to substring matching.")
+            self.has_fts = False
+        conn.commit()
+        self._next_id = (conn.execute("SELECT MAX(id) FROM messages").fetchone()[0] or 0) + 1
+
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA synchronous=NORMAL") # Safe with WAL; a crash loses at most the last commits
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def close_reader(self):
+        """Closes the calling thread's read connection, if it has one."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def append(self, role: str, content: str):
+        """Queues a turn for writing and returns its id immediately (None once closed)."""
+        if self._closed:
+            return None
+        with self._id_lock:
+            message_id = self._next_id
+            self._next_id += 1
+        self._queue.put((message_id, self.session_id, role, content, time.time()))
+        return message_id
+
+    def _write_loop(self):
+        conn = self._connect()
+        try:
+            while True:
+                item = self._queue.get()
+                batch, waiters, stop = [], [], False
+                deadline = time.monotonic() + self.flush_interval
+                # Gather whatever else arrives shortly after, so a burst of turns is one transaction.
+                while True:
+                    if item is None:
+                        stop = True
+                    elif isinstance(item, threading.Event):
+                        waiters.append(item)
+                    else:
+                        batch.append(item)
+                    if stop or waiters or len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+
+                if batch:
+                    try:
+                        with conn:
+                            conn.executemany(
+                                "INSERT INTO messages (id, session_id, role, content, created_at) VALUES (?, ?, ?, ?, ?)", batch
+                            )
+                    except sqlite3.Error as e:
+                        print(f"Error writing {len(batch)} conversation turns: {e}")
+                for waiter in waiters:
+                    waiter.set()
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Waits until everything appended so far is committed."""
+        if self._closed:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """Commits queued turns and stops the writer."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join(timeout)
+
+    def page(self, before_id: int = None, limit: int = 20) -> list:
+        """
+        Up to `limit` turns older than `before_id` (or the newest ones), oldest first.
+        Pass the first returned message's id as `before_id` to get the page before it.
+        """
+        rows = self._reader().execute(
+            "SELECT id, role, content, created_at FROM messages WHERE id < ? ORDER BY id DESC LIMIT ?",
+            (before_id if before_id is not None else sys.maxsize, limit),
+        ).fetchall()
+        return [StoredMessage(*row) for row in reversed(rows)]
+
+    def search(self, text: str, limit: int = 20, before_id: int = None) -> list:
+        """Turns containing every word of `text`, newest first. Page with `before_id` like page()."""
+        if not text.strip():
+            return []
+        before_id = before_id if before_id is not None else sys.maxsize
+        if self.has_fts:
+            rows = self._reader().execute(
+                "SELECT m.id, m.role, m.content, m.created_at FROM messages_fts f JOIN messages m ON m.id = f.rowid "
+                "WHERE messages_fts MATCH ? AND m.id < ? ORDER BY m.id DESC LIMIT ?",
+                (_fts_query(text), before_id, limit),
+            ).fetchall()
+        else:
+            clauses = " AND ".join("content LIKE ?" for _ in text.split())
+            rows = self._reader().execute(
+                f"SELECT id, role, content, created_at FROM messages WHERE {clauses} AND id < ? ORDER BY id DESC LIMIT ?",
+                [f"%{word}%" for word in text.split()] + [before_id, limit],
+            ).fetchall()
+        return [StoredMessage(*row) for row in rows]
+
+    def count(self) -> int:
+        return self._reader().execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+
+if __name__ == '__main__':
+    # Usage: python -m src.services.conversation_store "search words"
+    from ..config.settings import HISTORY_DB_FILE
+    store = ConversationStore(HISTORY_DB_FILE)
+    for message in store.search(" ".join(sys.argv[1:])):
+        print(f"[{time.strftime('%Y-%m-%d %H:%M', time.localtime(message.created_at))}] {message.role}: {message.content}")
+    store.close()
@@ -1,22 +1,30 @@
 # src/services/llm_service.py
-from google import genai
 from ..config.settings import load_settings
+from .client_registry import genai_client
 
 def get_response(prompt: str) -> str:
     try:
-        settings = load_settings()
-        api_key = settings.get('GOOGLE_API_KEY')
+        with genai_client(load_settings()) as client:
+            response = client.models.generate_content(
+                model='gemini-1.5-flash',
+                contents=prompt
+            )
+        
+        return response.text
 
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEY not found. Please set it in your environment variables or settings.")
+    except Exception as e:
+        print(f"An error occurred while getting response from Gemini: {e}")
+        return "Sorry, I couldn't process that."
+
+async def get_response_async(prompt: str) -> str:
+    """Async variant of get_response, sharing the same pooled client."""
+    try:
+        with genai_client(load_settings()) as client:
+            response = await client.aio.models.generate_content(
+                model='gemini-1.5-flash',
+                contents=prompt
+            )
 
-        client = genai.Client(api_key=api_key)
-        
-        response = client.models.generate_content(
-            model='gemini-1.5-flash',
-            contents=prompt
-        )
-        
         return response.text
 
     except Exception as e:
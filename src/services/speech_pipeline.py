@@ -0,0 +1,166 @@
+# src/services/speech_pipeline.py
+import queue
+import re
+import threading
+import time
+
+from . import tts_service
+
+# A sentence ends at ., ! or ? (optionally followed by closing quotes/brackets) and then whitespace, or at a newline.
+_SENTENCE_END = re.compile(r'(?<=[.!?])["\')\]]*\s+|\n+')
+_ABBREVIATIONS = ("mr.", "mrs.", "ms.", "dr.", "st.", "e.g.", "i.e.", "etc.", "vs.")
+
+
+class SentenceSegmenter:
+    """Splits streamed text chunks into complete sentences as soon as each one ends."""
+
+    def __init__(self, min_length: int = 12):
+        self.min_length = min_length # Very short fragments are merged into the next sentence
+        self._buffer = ""
+
+    def feed(self, chunk: str) -> list:
+        """Adds a chunk and returns any sentences it completed."""
+        self._buffer += chunk
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            candidate = self._buffer[start:match.start()].strip()
+            if len(candidate) < self.min_length or candidate.lower().endswith(_ABBREVIATIONS):
+                continue
+            sentences.append(candidate)
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> str:
+        """Returns whatever text is left once the stream has ended."""
+        remainder, self._buffer = self._buffer.strip(), ""
+        return remainder
+
+
+class _SentenceAudio:
+    """Audio chunks for one sentence, filled by the synthesis thread while earlier sentences play."""
+
+    _END = object()
+
+    def __init__(self):
+        self._chunks = queue.Queue()
+
+    def put(self, chunk: bytes):
+        self._chunks.put(chunk)
+
+    def close(self):
+        self._chunks.put(self._END)
+
+    def chunks(self):
+        while (chunk := self._chunks.get()) is not self._END:
+            yield chunk
+
+
+class SpeechPipeline:
+    """
+    Speaks a streamed response sentence by sentence.
+    One thread synthesizes while another plays, so sentence N+1 is synthesized while sentence N is playing.
+    Audio is streamed into an in-process player, so each sentence starts playing after its first chunks arrive.
+    """
+
+    _END_OF_TURN = object()
+
+    def __init__(self, synthesize=None, player=None):
+        self.synthesize = synthesize or tts_service.stream_synthesis # Callable(text) -> iterator of PCM chunks
+        self.player = player or tts_service.create_player()
+        self._segmenter = SentenceSegmenter()
+        self._text_queue = queue.Queue()
+        # Holds at most one sentence ahead of the one currently playing.
+        self._audio_queue = queue.Queue(maxsize=1)
+        self._idle = threading.Event()
+        self._idle.set()
+        self._generation = 0 # Bumped by stop() so in-flight work from a cancelled turn is dropped
+        self._turn_started_at = None
+        self._first_audio_at = None
+        self.last_time_to_first_audio_ms = None
+        threading.Thread(target=self._synthesis_loop, daemon=True).start()
+        threading.Thread(target=self._playback_loop, daemon=True).start()
+
+    def begin_turn(self, started_at: float = None):
+        """Starts a new spoken response. `started_at` is the perf_counter time the turn began (e.g. end of speech)."""
+        self._idle.clear()
+        self.player.reset() # A stop() of the previous turn must not silence this one
+        self._segmenter = SentenceSegmenter()
+        self._turn_started_at = started_at if started_at is not None else time.perf_counter()
+        self._first_audio_at = None
+
+    def feed(self, chunk: str):
+        """Feeds a streamed response chunk; complete sentences are queued for synthesis immediately."""
+        for sentence in self._segmenter.feed(chunk):
+            self._text_queue.put((self._generation, sentence))
+
+    def end_turn(self):
+        """Marks the end of the response text so the remainder is spoken and the turn can finish."""
+        remainder = self._segmenter.flush()
+        if remainder:
+            self._text_queue.put((self._generation, remainder))
+        self._text_queue.put((self._generation, self._END_OF_TURN))
+
+    def stop(self):
+        """Cancels the current turn: drops queued sentences and stops playback immediately."""
+        self._generation += 1
+        for q in (self._text_queue, self._audio_queue):
+            while not q.empty():
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    break
+        self.player.stop()
+        self._idle.set()
+
+    def close(self):
+        self.stop()
+        self.player.close()
+
+    def wait_until_idle(self, timeout: float = None) -> bool:
+        """Blocks until everything queued for the current turn has been played."""
+        return self._idle.wait(timeout)
+
+    def _synthesis_loop(self):
+        while True:
+            generation, item = self._text_queue.get()
+            if item is self._END_OF_TURN:
+                self._audio_queue.put((generation, item))
+                continue
+            audio = _SentenceAudio()
+            self._audio_queue.put((generation, audio))
+            try:
+                for chunk in self.synthesize(item):
+                    if generation != self._generation:
+                        break
+                    audio.put(chunk)
+            except Exception as e:
+                print(f"An error occurred while generating speech: {e}")
+            finally:
+                audio.close()
+
+    def _playback_loop(self):
+        while True:
+            generation, audio = self._audio_queue.get()
+            if generation != self._generation:
+                continue
+            if audio is self._END_OF_TURN:
+                self._report_turn()
+                self._idle.set()
+                continue
+            play_started_at = time.perf_counter()
+            try:
+                self.player.play(audio.chunks())
+            except Exception as e:
+                print(f"An error occurred while playing speech: {e}")
+            first_audio_ms = self.player.stats['time_to_first_audio_ms']
+            if self._first_audio_at is None and first_audio_ms is not None:
+                self._first_audio_at = play_started_at + first_audio_ms / 1000
+
+    def _report_turn(self):
+        if self._first_audio_at is None or self._turn_started_at is None:
+            self.last_time_to_first_audio_ms = None
+            return
+        self.last_time_to_first_audio_ms = (self._first_audio_at - self._turn_started_at) * 1000
+        print(f"Time to first audio: {self.last_time_to_first_audio_ms:.0f} ms")
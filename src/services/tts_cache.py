@@ -0,0 +1,146 @@
+# src/services/tts_cache.py
+import collections
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+
+
+def normalize_text(text: str) -> str:
+    """Normalises text for cache lookups: Unicode NFC and collapsed whitespace."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def cache_key(voice_id: str, model_id: str, output_format: str, text: str) -> str:
+    """Content address for a synthesized phrase. Anything that changes the audio is part of the key."""
+    material = "\0".join([voice_id or "", model_id or "", output_format or "", normalize_text(text)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class TtsCache:
+    """
+    Two-tier LRU cache of synthesized audio keyed by cache_key().
+    A bounded in-memory tier sits in front of an on-disk tier; both evict least recently used entries by size.
+    """
+
+    def __init__(self, directory: str, max_memory_bytes: int = 16 * 1024 * 1024, max_disk_bytes: int = 200 * 1024 * 1024):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = collections.OrderedDict() # key -> audio bytes, least recently used first
+        self._memory_bytes = 0
+        self._disk = collections.OrderedDict() # key -> file size, least recently used first
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        self._load_disk_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.audio")
+
+    def _load_disk_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".audio"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[:-len(".audio")], stat.st_size))
+        for _, key, size in sorted(entries): # Oldest access first
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    def get(self, key: str):
+        """Returns cached audio bytes, or None on a miss."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return self._memory[key]
+            on_disk = key in self._disk
+
+        if on_disk:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    audio = f.read()
+                os.utime(self._path(key)) # Records the access for LRU order across restarts
+            except OSError:
+                with self._lock:
+                    self._forget_disk(key)
+                audio = None
+            if audio is not None:
+                with self._lock:
+                    if key in self._disk:
+                        self._disk.move_to_end(key)
+                    self.stats['disk_hits'] += 1
+                    self._remember(key, audio)
+                return audio
+
+        with self._lock:
+            self.stats['misses'] += 1
+        return None
+
+    def put(self, key: str, audio: bytes):
+        """Stores audio in both tiers, evicting least recently used entries as needed."""
+        if not audio:
+            return
+        with self._lock:
+            self._remember(key, audio)
+
+        # Write to a temp file and rename, so a crash never leaves a truncated entry behind.
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, 'wb') as f:
+                f.write(audio)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"Warning: Could not write TTS cache entry: {e}")
+            return
+
+        with self._lock:
+            self._forget_disk(key)
+            self._disk[key] = len(audio)
+            self._disk_bytes += len(audio)
+            while self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+                old_key, _ = next(iter(self._disk.items()))
+                self._forget_disk(old_key)
+                try:
+                    os.remove(self._path(old_key))
+                except OSError:
+                    pass
+                self.stats['evictions'] += 1
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            return key in self._memory or key in self._disk
+
+    def _remember(self, key: str, audio: bytes):
+        """Adds to the memory tier. Caller holds the lock."""
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        if len(audio) > self.max_memory_bytes:
+            return
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, old_audio = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old_audio)
+            self.stats['evictions'] += 1
+
+    def _forget_disk(self, key: str):
+        """Drops a key from the disk index. Caller holds the lock."""
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_bytes -= size
+
+    def summary(self) -> dict:
+        with self._lock:
+            lookups = self.stats['memory_hits'] + self.stats['disk_hits'] + self.stats['misses']
+            hits = self.stats['memory_hits'] + self.stats['disk_hits']
+            return {
+                **self.stats,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'memory_bytes': self._memory_bytes,
+                'disk_bytes': self._disk_bytes,
+            }
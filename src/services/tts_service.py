@@ -1,29 +1,99 @@
 # src/services/tts_service.py
-from elevenlabs.client import ElevenLabs
-from elevenlabs import play
-from ..config.settings import load_settings
+import os
+import threading
 
-def speak(text: str):
-    try:
-        settings = load_settings()
-        api_key = settings.get('ELEVENLABS_API_KEY')
-        voice_id = settings.get('ELEVENLABS_VOICE_ID')
-
-        if not api_key:
-            raise ValueError("ELEVENLABS_API_KEY not found.")
-        
-        if not voice_id:
-            raise ValueError("ELEVENLABS_VOICE_ID not found in settings.")
-
-        client = ElevenLabs(api_key=api_key)
-        
-        audio = client.text_to_speech.convert(
+from ..config.settings import load_settings, CACHE_DIR
+from .client_registry import elevenlabs_client
+from .audio_player import PyAudioOutput, StreamingAudioPlayer
+from .tts_cache import TtsCache, cache_key
+
+# Raw 16-bit mono PCM, so audio can be written straight to the output device without decoding.
+OUTPUT_FORMAT = "pcm_22050"
+OUTPUT_SAMPLE_RATE = 22050
+CACHED_CHUNK_SIZE = 8192 # Cached audio is replayed in chunks like a live stream
+
+_player = None
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache(settings: dict = None) -> TtsCache:
+    """Returns the process-wide TTS cache, creating it from settings on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            settings = settings or load_settings()
+            _cache = TtsCache(
+                os.path.join(CACHE_DIR, "tts"),
+                max_memory_bytes=int(settings.get('tts_cache_memory_mb', 16) * 1024 * 1024),
+                max_disk_bytes=int(settings.get('tts_cache_disk_mb', 200) * 1024 * 1024),
+            )
+        return _cache
+
+def _replay(audio: bytes):
+    for i in range(0, len(audio), CACHED_CHUNK_SIZE):
+        yield audio[i:i + CACHED_CHUNK_SIZE]
+
+def _record(chunks, cache: TtsCache, key: str):
+    """Passes chunks through and caches the full audio once the stream completes."""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    cache.put(key, b"".join(parts))
+
+def stream_synthesis(text: str):
+    """
+    Converts text to speech and returns an iterator of raw PCM chunks as they arrive.
+    Phrases already in the cache are served from it without calling ElevenLabs.
+    """
+    settings = load_settings()
+    voice_id = settings.get('ELEVENLABS_VOICE_ID')
+    model_id = settings.get('ELEVENLABS_MODEL_ID')
+
+    if not voice_id:
+        raise ValueError("ELEVENLABS_VOICE_ID not found in settings.")
+
+    cache = get_cache(settings)
+    key = cache_key(voice_id, model_id, OUTPUT_FORMAT, text)
+    audio = cache.get(key)
+    if audio is not None:
+        return _replay(audio)
+
+    lease = elevenlabs_client(settings) # Raises now if the API key is missing; the client is held while streaming
+    return _record(_synthesize(lease, text, voice_id, model_id), cache, key)
+
+def _synthesize(lease, text: str, voice_id: str, model_id: str):
+    with lease as client:
+        yield from client.text_to_speech.stream(
             text=text,
-            voice_id=voice_id
+            voice_id=voice_id,
+            model_id=model_id,
+            output_format=OUTPUT_FORMAT
         )
-        
-        play(audio)
 
+def prewarm_cache(phrases: list):
+    """Synthesizes any phrases missing from the cache in the background, so they play instantly later."""
+    def _prewarm():
+        for phrase in phrases:
+            try:
+                for _ in stream_synthesis(phrase): # Consuming the stream stores it in the cache
+                    pass
+            except Exception as e:
+                print(f"Could not pre-warm TTS cache for '{phrase}': {e}")
+        print(f"TTS cache pre-warmed: {get_cache().summary()}")
+
+    threading.Thread(target=_prewarm, daemon=True).start()
+
+def create_player() -> StreamingAudioPlayer:
+    """Creates an in-process player for the PCM format produced by stream_synthesis."""
+    return StreamingAudioPlayer(PyAudioOutput(sample_rate=OUTPUT_SAMPLE_RATE))
+
+def speak(text: str):
+    global _player
+    try:
+        if _player is None:
+            _player = create_player()
+        _player.play(stream_synthesis(text))
     except Exception as e:
         print(f"An error occurred while generating speech: {e}")
 
@@ -31,4 +101,4 @@ if __name__ == '__main__':
     # For direct testing of this module
     test_text = "Hello! This is a test of the text to speech service."
     print(f"Testing ElevenLabs TTS with text: '{test_text}'")
-    speak(test_text)
\ No newline at end of file
+    speak(test_text)
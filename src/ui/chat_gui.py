@@ -4,6 +4,9 @@ from tkinter import scrolledtext, Toplevel, Label, Button, messagebox
 import os # Added for path manipulation
 import threading
 
+from .render_pump import RenderPump
+from .transcript import Transcript
+
 # New SettingsModal class
 class SettingsModal(Toplevel):
     def __init__(self, master, initial_settings_json_str: str, save_callback):
@@ -82,11 +85,41 @@ class ChatUI(tk.Tk):
         self.configure(bg='#1a1a1a')
         
         self.save_settings_callback = None # To be set by the Application class
+        self.stop_speaking_callback = None # Called when Escape is pressed; set by the Application
         self.current_settings_json_str_for_modal = "" # Will be populated by Application
         self.settings_modal = None # To hold the instance of the settings modal
+        # Called with the stored id to page back from (None at first) when the view reaches the top and nothing
+        # older is held in memory. Set by the Application; it answers later with prepend_messages().
+        self.load_older_callback = None
+        self._loading_older = False
+        self._history_exhausted = False
+        # Only the newest messages stay in the Text widget, so inserts cost the same however long the session runs.
+        self.transcript = Transcript(max_messages=2000)
+        self.transcript_window = 200 # Messages kept rendered while following the conversation
+        self.transcript_page_size = 20 # Messages rendered at a time when scrolling back; set from history_page_size
+        self._streaming_message = None
 
         self.setup_ui()
         self.current_assistant_message_id = None
+        self.bind("<Escape>", lambda event: self.stop_speaking_callback and self.stop_speaking_callback())
+
+        # Updates may come from any thread; they are queued and rendered on the main loop, one frame at a time.
+        self._scroll_to_end = False
+        self.render_pump = RenderPump(
+            {
+                "message": self._render_message,
+                "start": self._render_start,
+                "delta": self._render_delta,
+                "end": self._render_end,
+                "prepend": self._render_prepend,
+                "older": self._render_older,
+                "status": lambda text: self.status_label.config(text=text),
+                "partial": lambda text: self.partial_label.config(text=text),
+                "call": lambda fn, *args: fn(*args),
+            },
+            after_frame=self._after_frame,
+        )
+        self.render_pump.start(self)
 
     def setup_ui(self):
         main_frame = tk.Frame(self, bg='#1a1a1a', padx=15, pady=15)
@@ -106,12 +139,26 @@ class ChatUI(tk.Tk):
             borderwidth=0
         )
         self.chat_display.pack(expand=True, fill="both", pady=(0, 15))
+        self.chat_display.configure(yscrollcommand=self._on_chat_scrolled)
         
         # Configure tags for styling messages
         self.chat_display.tag_configure("user", foreground="#8ab4f8", justify='right', rmargin=10)
         self.chat_display.tag_configure("assistant", foreground="#97e5a4", justify='left', lmargin1=10, lmargin2=10)
         self.chat_display.tag_configure("status", foreground="#cccccc", justify='center', font=("Helvetica", 9, "italic"))
 
+        # Live transcript of the command being spoken
+        self.partial_label = tk.Label(
+            main_frame,
+            text="",
+            font=("Helvetica", 10, "italic"),
+            fg='#8ab4f8',
+            bg='#1a1a1a',
+            anchor='e',
+            justify='right',
+            wraplength=450
+        )
+        self.partial_label.pack(fill='x')
+
         # Status label
         self.status_label = tk.Label(
             main_frame,
@@ -136,40 +183,132 @@ class ChatUI(tk.Tk):
         settings_button.pack(fill='x', pady=(10,0))
 
 
-    def _insert_message(self, text, tags):
-        """Helper to insert text and ensure view scrolls to the end."""
-        self.chat_display.config(state='normal')
-        self.chat_display.insert(tk.END, text, tags)
-        self.chat_display.config(state='disabled')
-        self.chat_display.see(tk.END)
+    def _on_chat_scrolled(self, first, last):
+        """Updates the scrollbar, and asks for older messages once the top of the transcript is in view."""
+        self.chat_display.vbar.set(first, last)
+        if float(first) > 0.0 or self._loading_older:
+            return
+        has_held = self.transcript.rendered < len(self.transcript.messages)
+        if has_held or (self.load_older_callback and not self._history_exhausted):
+            self._loading_older = True
+            self.render_pump.push("older")
 
-    def add_message(self, sender: str, message: str):
+    def prepend_messages(self, messages: list):
+        """Inserts older stored turns (StoredMessage, oldest first) above the transcript, keeping the view in place."""
+        self.render_pump.push("prepend", messages)
+
+    def add_message(self, sender: str, message: str, stored_id: int = None):
         """Adds a complete message to the chat display."""
-        header = f"{sender}\n"
-        self._insert_message(header, ("user" if sender.lower() == "you" else "assistant",))
-        self._insert_message(f"{message}\n\n", ("user" if sender.lower() == "you" else "assistant",))
+        self.render_pump.push("message", sender, message, stored_id)
 
     def start_assistant_message(self):
         """Prepares the UI for a new assistant message."""
-        self._insert_message("Assistant\n", ("assistant",))
-        # Mark the start of the content to be updated
-        self.start_pos = self.chat_display.index(f"{tk.END}-1c")
+        self.render_pump.push("start")
 
     def update_assistant_message(self, chunk: str):
         """Appends a chunk of text to the current assistant message."""
-        self.chat_display.config(state='normal')
-        self.chat_display.insert(tk.END, chunk)
-        self.chat_display.config(state='disabled')
-        self.chat_display.see(tk.END)
-        self.update_idletasks()
+        self.render_pump.push("delta", chunk)
 
-    def end_assistant_message(self):
+    def end_assistant_message(self, stored_id: int = None):
         """Finalizes the assistant's message with spacing."""
-        self._insert_message("\n\n", ())
+        self.render_pump.push("end", stored_id)
 
     def set_status(self, text: str):
         """Updates the status bar text."""
-        self.status_label.config(text=text)
+        self.render_pump.push("status", text)
+
+    def set_partial_transcript(self, text: str):
+        """Shows the in-progress transcript of the user's command. Pass an empty string to clear it."""
+        self.render_pump.push("partial", text)
+
+    def call_on_main_thread(self, fn, *args):
+        """Runs fn(*args) on the Tk main loop with the next frame. Safe from any thread, unlike after_idle()."""
+        self.render_pump.push("call", fn, *args)
+
+    # --- Rendering, on the Tk main loop only (see RenderPump) ---
+    # Every rendered message has a mark named after its key at its first character, so it can be removed again.
+
+    def _append_rendered(self, message, *segments):
+        """Inserts a new message's text at the end; the view scrolls to the end once the frame is rendered."""
+        start = self.chat_display.index(f"{tk.END}-1c")
+        self.chat_display.config(state='normal')
+        self.chat_display.insert(tk.END, *segments)
+        self.chat_display.config(state='disabled')
+        self.chat_display.mark_set(f"msg{message.key}", start) # Set after inserting, so the text lands after it
+        self._scroll_to_end = True
+
+    def _insert_at_top(self, messages: list):
+        """Renders messages (oldest first) above everything shown, keeping the view where it was."""
+        self.chat_display.config(state='normal')
+        self.chat_display.mark_set("loaded_top", "1.0") # Right gravity: stays after text inserted at 1.0
+        for message in reversed(messages):
+            self.chat_display.insert("1.0", *message.segments())
+            self.chat_display.mark_set(f"msg{message.key}", "1.0")
+        self.chat_display.config(state='disabled')
+        self.chat_display.yview("loaded_top")
+
+    def _render_older(self):
+        page = self.transcript.unrendered_page(self.transcript_page_size)
+        if page:
+            self._insert_at_top(page)
+            self._loading_older = False
+        elif self.load_older_callback and not self._history_exhausted:
+            self.load_older_callback(self.transcript.older_cursor) # Answered with prepend_messages()
+        else:
+            self._loading_older = False
+
+    def _render_prepend(self, messages):
+        self._loading_older = False
+        if not messages:
+            self._history_exhausted = True
+            return
+        self._insert_at_top(self.transcript.prepend_stored(messages))
+
+    def _render_message(self, sender, text, stored_id):
+        tag = "user" if sender.lower() == "you" else "assistant"
+        message = self.transcript.append(sender, text, tag, tag, stored_id)
+        self._append_rendered(message, *message.segments())
+
+    def _render_start(self):
+        self._streaming_message = self.transcript.append("Assistant", "", "assistant", "")
+        self._append_rendered(self._streaming_message, "Assistant\n", ("assistant",))
+
+    def _render_delta(self, text):
+        # All chunks that arrived since the last frame, as one insert
+        self.chat_display.config(state='normal')
+        self.chat_display.insert(tk.END, text)
+        self.chat_display.config(state='disabled')
+        if self._streaming_message:
+            self._streaming_message.text += text
+        self._scroll_to_end = True
+
+    def _render_end(self, stored_id):
+        self.chat_display.config(state='normal')
+        self.chat_display.insert(tk.END, "\n\n")
+        self.chat_display.config(state='disabled')
+        if self._streaming_message:
+            self._streaming_message.stored_id = stored_id
+            self._streaming_message = None
+        self._scroll_to_end = True
+
+    def _trim_transcript(self):
+        """Removes the oldest rendered messages beyond transcript_window from the widget."""
+        transcript = self.transcript
+        if transcript.rendered > self.transcript_window:
+            self.chat_display.config(state='normal')
+            while transcript.rendered > self.transcript_window:
+                removed = transcript.unrender_first()
+                self.chat_display.delete("1.0", f"msg{transcript.first_rendered().key}")
+                self.chat_display.mark_unset(f"msg{removed.key}")
+            self.chat_display.config(state='disabled')
+        if transcript.drop_excess():
+            self._history_exhausted = False # What was dropped can be paged back in from the store
+
+    def _after_frame(self):
+        if self._scroll_to_end:
+            self._trim_transcript() # The view is about to follow the end, so the top can go
+            self.chat_display.see(tk.END)
+            self._scroll_to_end = False
 
     def update_settings_json_for_modal(self, settings_json_str: str):
         """Stores the current settings JSON string to be passed to the settings modal."""
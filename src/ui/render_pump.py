@@ -0,0 +1,144 @@
+# src/ui/render_pump.py
+import collections
+import threading
+import time
+
+FRAME_SAMPLES = 1000 # Recent frame render times kept for percentiles
+
+
+class RenderPump:
+    """
+    Thread-safe queue of UI events, drained on the Tk main loop at most `fps` times a second.
+    Any thread may push(); only the main loop renders. Consecutive events of a kind in `joined`
+    (e.g. streamed text) are concatenated into one handler call per frame, and consecutive events of
+    a kind in `latest` (e.g. a status line) collapse to the last one.
+    """
+
+    def __init__(self, handlers: dict, fps: float = 30.0, joined=("delta",), latest=("status", "partial"), after_frame=None):
+        self.handlers = handlers # kind -> callable(*args), run on the main loop
+        self.fps = fps
+        self.joined = set(joined)
+        self.latest = set(latest)
+        self.after_frame = after_frame # Called once after every frame that rendered something
+        self._events = collections.deque() # (kind, args); append/popleft are atomic, so no lock is needed
+        self._widget = None
+        self._after_id = None
+        self.frame_ms = collections.deque(maxlen=FRAME_SAMPLES)
+        self.stats = {'frames': 0, 'events': 0, 'handler_calls': 0, 'max_depth': 0}
+
+    def push(self, kind: str, *args):
+        """Queues an event from any thread."""
+        self._events.append((kind, args))
+
+    def depth(self) -> int:
+        return len(self._events)
+
+    def drain(self) -> int:
+        """Renders every queued event, merging runs as described above. Returns the number of events taken."""
+        depth = len(self._events)
+        if not depth:
+            return 0
+        started = time.perf_counter()
+        self.stats['max_depth'] = max(self.stats['max_depth'], depth)
+
+        batch = [self._events.popleft() for _ in range(depth)] # Events pushed meanwhile wait for the next frame
+        i = 0
+        while i < len(batch):
+            kind, args = batch[i]
+            j = i + 1
+            if kind in self.joined or kind in self.latest:
+                while j < len(batch) and batch[j][0] == kind:
+                    j += 1
+                if kind in self.joined:
+                    args = ("".join(event_args[0] for _, event_args in batch[i:j]),)
+                else:
+                    args = batch[j - 1][1]
+            try:
+                self.handlers[kind](*args)
+            except Exception as e:
+                print(f"Error rendering UI event '{kind}': {e}")
+            self.stats['handler_calls'] += 1
+            i = j
+        if self.after_frame:
+            self.after_frame()
+
+        self.stats['frames'] += 1
+        self.stats['events'] += depth
+        self.frame_ms.append((time.perf_counter() - started) * 1000)
+        return depth
+
+    def start(self, widget):
+        """Starts draining on `widget`'s main loop."""
+        self._widget = widget
+        self._tick()
+
+    def _tick(self):
+        self.drain()
+        self._after_id = self._widget.after(max(1, int(1000 / max(self.fps, 1))), self._tick) # fps below 1 would stall the UI
+
+    def stop(self):
+        if self._widget is not None and self._after_id is not None:
+            self._widget.after_cancel(self._after_id)
+        self._after_id = None
+
+    def summary(self) -> dict:
+        """Frames rendered, events per handler call, render time per frame and the deepest queue seen."""
+        samples = sorted(self.frame_ms)
+        return {
+            **self.stats,
+            'avg_frame_ms': sum(samples) / len(samples) if samples else None,
+            'p95_frame_ms': samples[int(0.95 * (len(samples) - 1))] if samples else None,
+            'max_frame_ms': samples[-1] if samples else None,
+        }
+
+
+def run_benchmark(tokens: int = 2000, tokens_per_second: float = 400.0, fps: float = 30.0, render_cost_ms: float = 0.2) -> dict:
+    """
+    Headless benchmark: a producer thread streams `tokens` deltas while the main thread drains at `fps`.
+    Each handler call costs `render_cost_ms` (standing in for a Tk insert), so the result shows how much
+    rendering coalescing saves compared with one insert per token.
+    """
+    rendered = []
+
+    def _insert(text):
+        rendered.append(text)
+        end = time.perf_counter() + render_cost_ms / 1000
+        while time.perf_counter() < end:
+            pass
+
+    pump = RenderPump({"delta": _insert, "status": lambda text: None}, fps=fps)
+
+    def _produce():
+        interval = 1 / tokens_per_second
+        for i in range(tokens):
+            pump.push("delta", f"tok{i} ")
+            if i % 100 == 0:
+                pump.push("status", f"{i} tokens")
+            time.sleep(interval)
+
+    producer = threading.Thread(target=_produce)
+    started = time.perf_counter()
+    producer.start()
+    while producer.is_alive() or pump.depth():
+        pump.drain()
+        time.sleep(1 / fps)
+    elapsed = time.perf_counter() - started
+
+    assert "".join(rendered) == "".join(f"tok{i} " for i in range(tokens))
+    return {
+        **pump.summary(),
+        'tokens': tokens,
+        'elapsed_s': elapsed,
+        'render_ms_total': len(rendered) * render_cost_ms,
+        'render_ms_unbatched': tokens * render_cost_ms,
+    }
+
+
+if __name__ == '__main__':
+    # Usage: python -m src.ui.render_pump
+    for fps in (15, 30, 60):
+        result = run_benchmark(fps=fps)
+        print(f"{fps} fps: {result['frames']} frames for {result['tokens']} tokens, {result['handler_calls']} handler calls, "
+              f"max queue depth {result['max_depth']}, frame avg {result['avg_frame_ms']:.2f} ms / "
+              f"p95 {result['p95_frame_ms']:.2f} ms / max {result['max_frame_ms']:.2f} ms, "
+              f"render time {result['render_ms_total']:.0f} ms vs {result['render_ms_unbatched']:.0f} ms unbatched")
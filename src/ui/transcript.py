@@ -0,0 +1,87 @@
+# src/ui/transcript.py
+import collections
+
+
+class TranscriptMessage:
+    """One message of the chat transcript; kept small since a long session holds thousands of them."""
+
+    __slots__ = ("key", "sender", "text", "tag", "body_tag", "stored_id")
+
+    def __init__(self, key: int, sender: str, text: str, tag: str, body_tag: str, stored_id: int = None):
+        self.key = key # Unique within the transcript; names the message's start mark in the Text widget
+        self.sender = sender
+        self.text = text
+        self.tag = tag # Style of the sender line
+        self.body_tag = body_tag # Style of the text; "" for the default
+        self.stored_id = stored_id # Id in the ConversationStore, if the message was stored
+
+    def segments(self) -> tuple:
+        """Arguments for Text.insert(index, *segments) that render the message."""
+        return (f"{self.sender}\n", (self.tag,), f"{self.text}\n\n", (self.body_tag,) if self.body_tag else ())
+
+
+class Transcript:
+    """
+    Messages behind the chat display, oldest first. The widget renders only the newest `rendered` of them;
+    older ones are paged back in from here, and once more than `max_messages` are held the oldest are
+    dropped and later paged in from the ConversationStore instead.
+    """
+
+    def __init__(self, max_messages: int = 2000):
+        self.max_messages = max_messages
+        self.messages = collections.deque()
+        self.rendered = 0 # The newest `rendered` messages are in the widget
+        self.older_cursor = None # Stored id to page back from once everything held here is rendered; None = newest
+        self._next_key = 0
+
+    def _make(self, sender, text, tag, body_tag, stored_id) -> TranscriptMessage:
+        self._next_key += 1
+        return TranscriptMessage(self._next_key, sender, text, tag, body_tag, stored_id)
+
+    def append(self, sender: str, text: str, tag: str, body_tag: str, stored_id: int = None) -> TranscriptMessage:
+        """Adds a new message at the end; the caller renders it."""
+        message = self._make(sender, text, tag, body_tag, stored_id)
+        self.messages.append(message)
+        self.rendered += 1
+        return message
+
+    def prepend_stored(self, stored_messages: list) -> list:
+        """Adds a page of StoredMessages (oldest first) in front; the caller renders the returned messages above the rest."""
+        added = []
+        for stored in stored_messages:
+            if stored.role == "user":
+                added.append(self._make("You", stored.content, "user", "user", stored.id))
+            else:
+                added.append(self._make("Assistant", stored.content, "assistant", "", stored.id))
+        self.messages.extendleft(reversed(added))
+        self.rendered += len(added)
+        if stored_messages:
+            self.older_cursor = stored_messages[0].id
+        return added
+
+    def unrendered_page(self, limit: int) -> list:
+        """Up to `limit` held messages just before the rendered ones, oldest first; marks them rendered."""
+        first_rendered = len(self.messages) - self.rendered
+        start = max(0, first_rendered - limit)
+        page = [self.messages[i] for i in range(start, first_rendered)]
+        self.rendered += len(page)
+        return page
+
+    def first_rendered(self) -> TranscriptMessage:
+        return self.messages[len(self.messages) - self.rendered] if self.rendered else None
+
+    def unrender_first(self) -> TranscriptMessage:
+        """Marks the oldest rendered message as no longer in the widget and returns it."""
+        message = self.first_rendered()
+        self.rendered -= 1
+        return message
+
+    def drop_excess(self) -> int:
+        """Forgets the oldest messages beyond max_messages that are not rendered. Returns how many were dropped."""
+        dropped = 0
+        while len(self.messages) > self.max_messages and len(self.messages) > self.rendered:
+            message = self.messages.popleft()
+            dropped += 1
+            if message.stored_id is not None:
+                self.older_cursor = message.stored_id + 1 # Paging back from the store resumes with this message
+        return dropped
@@ -0,0 +1,107 @@
+# tests/test_audio_player.py
+import threading
+import time
+
+from src.services.audio_player import NullAudioOutput, StreamingAudioPlayer
+
+SAMPLE_RATE = 8000 # 16 bytes per ms of 16-bit mono audio
+BYTES_PER_MS = SAMPLE_RATE * 2 // 1000
+
+
+def _audio(ms: int) -> bytes:
+    return b"\x01\x00" * (ms * BYTES_PER_MS // 2)
+
+
+def _player(realtime=False, **kwargs):
+    output = NullAudioOutput(SAMPLE_RATE, realtime=realtime)
+    return StreamingAudioPlayer(output, **kwargs), output
+
+
+def _play_in_thread(player, chunks):
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault('played', player.play(chunks)), daemon=True)
+    thread.start()
+    return thread, result
+
+
+def test_plays_every_byte():
+    player, output = _player()
+    assert player.play(_audio(10) for _ in range(50)) is True
+    assert output.bytes_written == 50 * len(_audio(10))
+
+
+def test_odd_sized_chunks_keep_samples_whole():
+    player, output = _player()
+    data = _audio(100)
+    chunks = [data[i:i + 33] for i in range(0, len(data), 33)]
+    assert player.play(chunks)
+    assert output.bytes_written == len(data)
+
+
+def test_nothing_is_written_before_preroll():
+    player, output = _player(preroll_ms=150)
+    release = threading.Event()
+
+    def _chunks():
+        yield _audio(100) # Less than the pre-roll
+        release.wait(2)
+        yield _audio(100)
+
+    thread, result = _play_in_thread(player, _chunks())
+    time.sleep(0.1)
+    assert output.bytes_written == 0
+    release.set()
+    thread.join(2)
+    assert result['played'] and output.bytes_written == len(_audio(200))
+
+
+def test_stream_shorter_than_preroll_still_plays():
+    player, output = _player(preroll_ms=500)
+    assert player.play([_audio(50)])
+    assert output.bytes_written == len(_audio(50))
+
+
+def test_underrun_rebuffers_and_finishes():
+    player, output = _player(realtime=True, preroll_ms=20)
+
+    def _chunks():
+        yield _audio(40)
+        time.sleep(0.15) # The network stalls for longer than the buffered audio lasts
+        yield _audio(40)
+
+    assert player.play(_chunks())
+    assert player.stats['underruns'] >= 1
+    assert output.bytes_written == len(_audio(80))
+
+
+def test_stop_drains_the_jitter_buffer_and_ends_playback():
+    player, output = _player(realtime=True, max_buffer_ms=2000)
+    produced = []
+
+    def _chunks():
+        for _ in range(200):
+            produced.append(1)
+            yield _audio(50)
+
+    thread, result = _play_in_thread(player, _chunks())
+    time.sleep(0.2)
+    player.stop()
+    thread.join(1)
+    assert not thread.is_alive()
+    assert result['played'] is False
+    assert player._buffered == 0 and not player._buffer
+    written = output.bytes_written
+    assert written < len(_audio(50)) * 200
+    time.sleep(0.1)
+    assert output.bytes_written == written # Nothing more is played after stop()
+    assert len(produced) < 200 # The producer stopped pulling from the synthesis stream too
+
+
+def test_stop_before_play_is_kept_until_reset():
+    player, output = _player()
+    player.stop()
+    assert player.play([_audio(100)]) is False
+    assert output.bytes_written == 0
+    player.reset()
+    assert player.play([_audio(100)]) is True
+    assert output.bytes_written == len(_audio(100))
@@ -0,0 +1,60 @@
+# tests/test_client_registry.py
+from src.services.client_registry import ClientRegistry
+
+
+class _FakeClient:
+    def __init__(self, config):
+        self.config = config
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _factory(config):
+    client = _FakeClient(config)
+    return client, client.close
+
+
+def test_same_config_reuses_the_client():
+    registry = ClientRegistry()
+    first = registry.get("svc", {"key": "a"}, _factory)
+    assert registry.get("svc", {"key": "a"}, _factory) is first
+    assert registry.stats == {'created': 1, 'reused': 1}
+
+
+def test_unleased_client_is_closed_when_replaced():
+    registry = ClientRegistry()
+    old = registry.get("svc", {"key": "a"}, _factory)
+    new = registry.get("svc", {"key": "b"}, _factory)
+    assert old.closed and not new.closed
+
+
+def test_leased_client_stays_open_until_the_lease_ends():
+    registry = ClientRegistry()
+    with registry.lease("svc", {"key": "a"}, _factory) as old:
+        new = registry.get("svc", {"key": "b"}, _factory) # e.g. the API key changed mid-stream
+        assert new is not old
+        assert not old.closed
+    assert old.closed and not new.closed
+
+
+def test_replaced_client_waits_for_every_lease():
+    registry = ClientRegistry()
+    outer = registry.lease("svc", {"key": "a"}, _factory)
+    old = outer.__enter__()
+    with registry.lease("svc", {"key": "a"}, _factory) as same:
+        assert same is old
+        registry.get("svc", {"key": "b"}, _factory)
+    assert not old.closed
+    outer.__exit__(None, None, None)
+    assert old.closed
+
+
+def test_close_all_closes_current_and_retired_clients():
+    registry = ClientRegistry()
+    lease = registry.lease("svc", {"key": "a"}, _factory)
+    old = lease.__enter__()
+    new = registry.get("svc", {"key": "b"}, _factory)
+    registry.close_all()
+    assert old.closed and new.closed
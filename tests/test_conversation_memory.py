@@ -0,0 +1,118 @@
+# tests/test_conversation_memory.py
+import asyncio
+import threading
+
+import pytest
+
+from src.core.conversation_memory import CHARS_PER_TOKEN, MESSAGE_OVERHEAD_TOKENS, ConversationMemory, count_tokens
+
+
+@pytest.fixture
+def loop():
+    """An event loop on its own thread, like the application's asyncio thread."""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield loop
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=2)
+    loop.close()
+
+
+def _turn(tokens: int) -> str:
+    """Text that counts as `tokens` tokens once the per-message overhead is added."""
+    return "x" * ((tokens - MESSAGE_OVERHEAD_TOKENS) * CHARS_PER_TOKEN)
+
+
+def _wait_for_summary(memory, timeout=2.0):
+    future = memory._summarizing
+    if future is not None:
+        future.result(timeout)
+
+
+def test_count_tokens_rounds_up():
+    assert count_tokens("") == 0
+    assert count_tokens("abcd") == 1
+    assert count_tokens("abcde") == 2
+
+
+def test_oldest_turns_are_evicted_into_pending_once_over_budget():
+    memory = ConversationMemory(token_budget=100) # No summarizer: evicted turns just wait
+    for i in range(5):
+        memory.append("user", f"{i}" + _turn(30)[1:])
+    assert len(memory) == 3 # 3 x 30 tokens fit the budget of 100
+    assert memory._window_tokens == 90
+    assert [message.content[0] for message in memory._pending] == ["0", "1"]
+    assert memory.stats['evicted'] == 2
+
+
+def test_pending_turns_beyond_the_budget_are_dropped():
+    memory = ConversationMemory(token_budget=100)
+    for _ in range(10):
+        memory.append("user", _turn(30))
+    # 7 turns are evicted, but only 3 of them (90 tokens) fit the pending budget.
+    assert len(memory._pending) == 3 and memory._pending_tokens == 90
+    assert memory.stats['evicted'] == 7 and memory.stats['dropped'] == 4
+
+
+def test_newest_turn_is_kept_even_if_over_budget():
+    memory = ConversationMemory(token_budget=50)
+    memory.append("user", _turn(20))
+    memory.append("assistant", _turn(80))
+    assert len(memory) == 1
+    assert memory.context()[0]["role"] == "assistant"
+
+
+def test_context_fits_budget_and_leads_with_summary():
+    memory = ConversationMemory(token_budget=100)
+    memory.summary = "earlier chat about the weather"
+    for i in range(3):
+        memory.append("user", _turn(30))
+    context = memory.context(extra={"role": "user", "content": "and tomorrow?"})
+    assert context[0]["role"] == "system" and "earlier chat about the weather" in context[0]["content"]
+    assert context[-1]["content"] == "and tomorrow?"
+    used = sum(count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS for message in context)
+    assert used <= 100 + MESSAGE_OVERHEAD_TOKENS # Allowing for the "Summary of..." prefix
+
+
+def test_evicted_turns_are_folded_into_the_summary(loop):
+    calls = []
+
+    async def summarize(summary, turns, summary_tokens):
+        calls.append((summary, [turn["content"] for turn in turns], summary_tokens))
+        return (summary + " " if summary else "") + " ".join(turn["content"][:1] for turn in turns)
+
+    memory = ConversationMemory(token_budget=100, summary_tokens=50, summarize=summarize, loop=loop)
+    for i in range(4):
+        memory.append("user", f"{i}" + _turn(30)[1:])
+    _wait_for_summary(memory)
+    memory.append("user", "4" + _turn(30)[1:])
+    _wait_for_summary(memory)
+
+    assert memory.summary == "0 1"
+    assert calls[0][2] == 50 # The budget is passed to the summarizer
+    assert memory.stats['summarized'] == 2 and not memory._pending
+
+
+def test_summary_is_cut_to_the_current_budget(loop):
+    async def summarize(summary, turns, summary_tokens):
+        return "y" * 1000
+
+    memory = ConversationMemory(token_budget=40, summary_tokens=100, summarize=summarize, loop=loop)
+    memory.summary_tokens = 10 # Changed at runtime, as the settings do
+    memory.append("user", _turn(30))
+    memory.append("user", _turn(30))
+    _wait_for_summary(memory)
+    assert len(memory.summary) == 10 * CHARS_PER_TOKEN
+
+
+def test_failed_summary_drops_the_batch(loop):
+    async def summarize(summary, turns, summary_tokens):
+        raise RuntimeError("LM unavailable")
+
+    memory = ConversationMemory(token_budget=40, summarize=summarize, loop=loop)
+    memory.append("user", _turn(30))
+    memory.append("user", _turn(30))
+    _wait_for_summary(memory)
+    assert memory.summary == ""
+    assert memory.stats['dropped'] == 1
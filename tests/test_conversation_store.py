@@ -0,0 +1,40 @@
+# tests/test_conversation_store.py
+import concurrent.futures
+
+import pytest
+
+from src.services.conversation_store import ConversationStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ConversationStore(str(tmp_path / "history.sqlite3"), flush_interval=0.01)
+    yield store
+    store.close()
+
+
+def test_pages_are_read_on_one_reader_thread(store):
+    ids = [store.append("user" if i % 2 == 0 else "assistant", f"turn {i}") for i in range(10)]
+    assert store.flush()
+
+    reader = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    try:
+        newest = reader.submit(store.page, None, 4).result()
+        older = reader.submit(store.page, newest[0].id, 4).result()
+        connections = reader.submit(lambda: store._local.conn).result()
+        assert reader.submit(lambda: store._reader()).result() is connections # Reused, not reopened
+    finally:
+        reader.submit(store.close_reader).result()
+        reader.shutdown()
+
+    assert [message.id for message in newest] == ids[6:]
+    assert [message.content for message in older] == [f"turn {i}" for i in range(2, 6)]
+
+
+def test_close_reader_reopens_on_next_read(store):
+    store.append("user", "hello world")
+    assert store.flush()
+    assert store.count() == 1
+    store.close_reader()
+    assert store._local.conn is None
+    assert [message.content for message in store.search("hello")] == ["hello world"]
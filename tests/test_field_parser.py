@@ -0,0 +1,101 @@
+# tests/test_field_parser.py
+import random
+
+import pytest
+
+from src.core.field_parser import FieldStreamParser
+
+COMPLETION = (
+    "[[ ## reasoning ## ]]\nThe user wants the time.\n\n"
+    "[[ ## answer ## ]]\nIt is 3 pm in Berlin.\nEnjoy your afternoon!\n\n"
+    "[[ ## completed ## ]]\n"
+)
+ANSWER = "It is 3 pm in Berlin.\nEnjoy your afternoon!"
+
+
+def _random_chunks(text: str, rng: random.Random, max_size: int = 8) -> list:
+    chunks, i = [], 0
+    while i < len(text):
+        size = rng.randint(1, max_size)
+        chunks.append(text[i:i + size])
+        i += size
+    return chunks
+
+
+def _parse(chunks: list, field: str = "answer") -> tuple:
+    """Feeds `chunks` and returns (the pieces released while streaming, the text released by finish())."""
+    parser = FieldStreamParser(field)
+    pieces = [parser.feed(chunk) for chunk in chunks]
+    return [piece for piece in pieces if piece], parser.finish()
+
+
+def test_whole_completion_in_one_chunk():
+    pieces, rest = _parse([COMPLETION])
+    assert "".join(pieces) == ANSWER and rest == ""
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_random_chunk_boundaries(seed):
+    rng = random.Random(seed)
+    pieces, rest = _parse(_random_chunks(COMPLETION, rng))
+    assert "".join(pieces) + rest == ANSWER
+    assert rest == "" # The completed marker closed the field
+
+
+@pytest.mark.parametrize("marker", ["[[ ## answer ## ]]", "[[ ## completed ## ]]"])
+def test_every_split_inside_a_marker(marker):
+    start = COMPLETION.index(marker)
+    for split in range(start + 1, start + len(marker)):
+        pieces, rest = _parse([COMPLETION[:split], COMPLETION[split:]])
+        assert "".join(pieces) + rest == ANSWER, f"split at {split - start} of {marker!r}"
+
+
+def test_one_character_at_a_time():
+    pieces, rest = _parse(list(COMPLETION))
+    assert "".join(pieces) == ANSWER and rest == ""
+
+
+def test_text_is_released_before_the_field_ends():
+    parser = FieldStreamParser("answer")
+    assert parser.feed("[[ ## answer ## ]]\nHello there, ") == "Hello there," # Trailing space held back
+    assert parser.emitted
+    assert parser.feed("friend.") == " friend."
+
+
+@pytest.mark.parametrize("answer", [
+    "Use [[double brackets]] for wiki links.",
+    "Arrays look like [[1, 2], [3, 4]].",
+    "The heading [[ ## is not a field name here.",
+    "Ends with brackets [[",
+])
+@pytest.mark.parametrize("seed", range(10))
+def test_literal_brackets_inside_the_answer(answer, seed):
+    completion = f"[[ ## answer ## ]]\n{answer}\n\n[[ ## completed ## ]]\n"
+    pieces, rest = _parse(_random_chunks(completion, random.Random(seed)))
+    assert "".join(pieces) + rest == answer
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_missing_completed_marker_is_flushed_by_finish(seed):
+    completion = "[[ ## answer ## ]]\nNo closing marker here [[ ## comp"
+    pieces, rest = _parse(_random_chunks(completion, random.Random(seed)))
+    assert "".join(pieces) + rest == "No closing marker here [[ ## comp"
+
+
+def test_finish_flushes_held_whitespace_and_partial_marker():
+    parser = FieldStreamParser("answer")
+    assert parser.feed("[[ ## answer ## ]]\nDone.  \n[[ ## ") == "Done."
+    assert parser.finish() == "  \n[[ ##"
+    assert parser.finish() == "" # Only once
+
+
+def test_other_field_is_ignored():
+    pieces, rest = _parse([COMPLETION], field="missing")
+    assert pieces == [] and rest == ""
+
+
+def test_reset_parses_the_next_completion():
+    parser = FieldStreamParser("answer")
+    assert parser.feed("[[ ## next_thought ## ]]\nthinking [[ ## ") == ""
+    parser.reset()
+    assert parser.feed("[[ ## answer ## ]]\nFinal.\n[[ ## completed ## ]]") == "Final."
@@ -0,0 +1,41 @@
+# tests/test_render_pump.py
+import threading
+
+import pytest
+
+from src.ui.render_pump import RenderPump
+
+
+class _FakeWidget:
+    """Records the delays passed to after() instead of running a Tk main loop."""
+
+    def __init__(self):
+        self.delays = []
+
+    def after(self, ms, callback):
+        self.delays.append(ms)
+        return len(self.delays)
+
+    def after_cancel(self, after_id):
+        pass
+
+
+def test_events_from_other_threads_run_on_drain_in_order():
+    calls = []
+    pump = RenderPump({"delta": lambda text: calls.append(("delta", text)), "call": lambda fn, *args: fn(*args)})
+    producer = threading.Thread(target=lambda: (
+        pump.push("delta", "a"), pump.push("delta", "b"), pump.push("call", calls.append, "applied"), pump.push("delta", "c"),
+    ))
+    producer.start()
+    producer.join()
+    assert calls == []
+    assert pump.drain() == 4
+    assert calls == [("delta", "ab"), "applied", ("delta", "c")]
+
+
+@pytest.mark.parametrize("fps, delay", [(30, 33), (1000, 1), (0, 1000), (-5, 1000), (0.5, 1000)])
+def test_frame_delay_is_clamped(fps, delay):
+    pump = RenderPump({}, fps=fps)
+    widget = _FakeWidget()
+    pump.start(widget)
+    assert widget.delays == [delay]
@@ -0,0 +1,42 @@
+# tests/test_router.py
+import json
+import os
+
+import pytest
+
+from src.core.router import IntentRouter, evaluate_router
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "router_cases.json")
+
+
+@pytest.fixture(scope="module")
+def fixtures():
+    with open(FIXTURES, 'r') as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="module")
+def router(fixtures):
+    return IntentRouter([(tool["name"], tool.get("description"), tool.get("args")) for tool in fixtures["tools"]])
+
+
+def test_labelled_cases_route_correctly_at_default_threshold(router, fixtures):
+    report = evaluate_router(router, fixtures["cases"], thresholds=[router.threshold])
+    result = report['results'][0]
+    assert result['misrouted'] == []
+    assert result['accuracy'] == 1.0
+
+
+@pytest.mark.parametrize("text", [
+    "hi, open chrome please",
+    "okay thanks, what is the weather in Berlin",
+    "good morning, what is the weather today",
+])
+def test_greeting_in_front_of_a_request_still_routes_to_tools(router, text):
+    decision = router.route(text)
+    assert decision.route == "tool"
+
+
+@pytest.mark.parametrize("text", ["hi", "thank you", "good morning", "tell me a joke"])
+def test_small_talk_routes_to_chat(router, text):
+    assert router.route(text).route == "chat"
@@ -0,0 +1,118 @@
+# tests/test_settings_store.py
+import json
+import os
+
+import pytest
+
+from src.config.settings import SettingsStore, _validate, get_default_settings
+
+
+@pytest.fixture
+def settings_path(tmp_path, monkeypatch):
+    monkeypatch.delenv('GOOGLE_API_KEY', raising=False)
+    monkeypatch.delenv('ELEVENLABS_API_KEY', raising=False)
+    return str(tmp_path / "settings.json")
+
+
+@pytest.fixture
+def store(settings_path):
+    return SettingsStore(settings_path)
+
+
+def _write(path: str, text: str):
+    """Writes the file behind the store's back, as an editor would, and makes sure its signature changes."""
+    previous = os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+    with open(path, 'w') as f:
+        f.write(text)
+    os.utime(path, ns=(previous + 1_000_000, previous + 1_000_000))
+
+
+def test_missing_file_gives_defaults(store):
+    settings = store.get()
+    assert settings['assistant_name'] == get_default_settings()['assistant_name']
+    assert settings['ui_frame_rate'] == 30
+
+
+def test_save_writes_atomically_and_leaves_no_temp_files(store, settings_path):
+    store.save({'assistant_name': 'jarvis'})
+    with open(settings_path) as f:
+        assert json.load(f) == {'assistant_name': 'jarvis'}
+    assert os.listdir(os.path.dirname(settings_path)) == ["settings.json"]
+
+
+def test_failed_save_keeps_the_old_file(store, settings_path):
+    store.save({'assistant_name': 'jarvis'})
+    with pytest.raises(TypeError):
+        store.save({'assistant_name': object()}) # Not JSON serialisable, fails halfway through the write
+    with open(settings_path) as f:
+        assert json.load(f) == {'assistant_name': 'jarvis'}
+    assert os.listdir(os.path.dirname(settings_path)) == ["settings.json"]
+    assert store.get()['assistant_name'] == 'jarvis'
+
+
+def test_change_event_lists_exactly_the_changed_keys(store):
+    store.save({'assistant_name': 'jarvis', 'ui_frame_rate': 30})
+    events = []
+    store.subscribe(events.append)
+    store.save({'assistant_name': 'friday', 'ui_frame_rate': 30, 'speak_responses': False})
+    assert len(events) == 1
+    assert events[0].changed_keys == {'assistant_name', 'speak_responses'}
+    assert events[0].old['assistant_name'] == 'jarvis' and events[0].new['assistant_name'] == 'friday'
+    assert events[0].changed('speak_responses') and not events[0].changed('ui_frame_rate')
+
+
+def test_saving_the_same_settings_sends_no_event(store):
+    store.save({'assistant_name': 'jarvis'})
+    events = []
+    store.subscribe(events.append)
+    store.save({'assistant_name': 'jarvis'})
+    assert events == []
+
+
+def test_external_edit_is_picked_up_with_an_event(store, settings_path):
+    store.save({'assistant_name': 'jarvis'})
+    events = []
+    unsubscribe = store.subscribe(events.append)
+    _write(settings_path, json.dumps({'assistant_name': 'friday'}))
+    assert store.get()['assistant_name'] == 'friday'
+    assert [event.changed_keys for event in events] == [{'assistant_name'}]
+    unsubscribe()
+    _write(settings_path, json.dumps({'assistant_name': 'karen'}))
+    store.get()
+    assert len(events) == 1
+
+
+@pytest.mark.parametrize("broken", ['{"assistant_name": "fri', '["not", "an", "object"]', ''])
+def test_invalid_json_keeps_the_last_good_settings(store, settings_path, broken):
+    store.save({'assistant_name': 'jarvis', 'ui_frame_rate': 60})
+    events = []
+    store.subscribe(events.append)
+    _write(settings_path, broken)
+    settings = store.get()
+    assert settings['assistant_name'] == 'jarvis' and settings['ui_frame_rate'] == 60
+    assert events == []
+
+    _write(settings_path, json.dumps({'assistant_name': 'friday', 'ui_frame_rate': 60}))
+    assert store.get()['assistant_name'] == 'friday'
+    assert [event.changed_keys for event in events] == [{'assistant_name'}]
+
+
+def test_invalid_json_on_first_load_uses_defaults(store, settings_path):
+    _write(settings_path, '{"assistant_name": ')
+    assert store.get()['assistant_name'] == get_default_settings()['assistant_name']
+
+
+@pytest.mark.parametrize("key, value, expected", [
+    ('ui_frame_rate', 60.0, 60), # float for an int setting is rounded
+    ('ui_frame_rate', 59.6, 60),
+    ('ui_frame_rate', 45, 45),
+    ('mcp_ping_interval_seconds', 5, 5), # int for a float setting is kept as is
+    ('mcp_ping_interval_seconds', 7.5, 7.5),
+    ('ui_frame_rate', "60", 30), # Wrong types fall back to the default
+    ('ui_frame_rate', True, 30), # bools are not numbers here
+    ('speak_responses', 1, True), # ...and numbers are not bools
+])
+def test_validate_coerces_numbers(key, value, expected):
+    settings = _validate({**get_default_settings(), key: value})
+    assert settings[key] == expected
+    assert type(settings[key]) is type(expected)
@@ -0,0 +1,146 @@
+# tests/test_speculation.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.core.speculation import SpeculativeDispatcher
+
+STABLE = 0.05
+
+
+@pytest.fixture
+def loop():
+    """An event loop on its own thread, like the application's asyncio thread."""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield loop
+
+    async def _cancel_pending():
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run_coroutine_threadsafe(_cancel_pending(), loop).result(2)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=2)
+    loop.close()
+
+
+class _Responses:
+    """start_response stand-in: records the texts it was started for and streams a short answer for each."""
+
+    def __init__(self, delay=0.0):
+        self.started = []
+        self.cancelled = []
+        self.delay = delay
+
+    def __call__(self, text):
+        self.started.append(text)
+
+        async def _stream():
+            try:
+                for word in ("answer", "to", text):
+                    await asyncio.sleep(self.delay)
+                    yield word + " "
+            except asyncio.CancelledError:
+                self.cancelled.append(text)
+                raise
+
+        return _stream()
+
+
+def _wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def _collect(loop, speculation) -> str:
+    async def _read():
+        return "".join([chunk async for chunk in speculation.chunks()])
+    return asyncio.run_coroutine_threadsafe(_read(), loop).result(2)
+
+
+def test_stable_partial_is_dispatched_and_handed_over_on_match(loop):
+    responses = _Responses()
+    dispatcher = SpeculativeDispatcher(loop, responses, stable_seconds=STABLE)
+    dispatcher.on_partial("what time is it")
+    _wait_until(lambda: responses.started)
+
+    speculation = dispatcher.resolve("What time is it?") # Casing and punctuation don't matter
+    assert speculation is not None
+    assert _collect(loop, speculation) == "answer to what time is it "
+    assert dispatcher.stats['hits'] == 1 and dispatcher.stats['misses'] == 0
+
+
+def test_changed_final_transcript_is_a_miss_and_cancels(loop):
+    responses = _Responses(delay=0.5)
+    dispatcher = SpeculativeDispatcher(loop, responses, stable_seconds=STABLE)
+    dispatcher.on_partial("what time")
+    _wait_until(lambda: responses.started)
+
+    assert dispatcher.resolve("what time is it in Tokyo") is None
+    assert dispatcher.stats['misses'] == 1 and dispatcher.stats['hits'] == 0
+    _wait_until(lambda: responses.cancelled == ["what time"])
+
+
+def test_partial_that_keeps_changing_is_not_dispatched(loop):
+    responses = _Responses()
+    dispatcher = SpeculativeDispatcher(loop, responses, stable_seconds=0.2)
+    for partial in ("what", "what time", "what time is"):
+        dispatcher.on_partial(partial)
+        time.sleep(0.05)
+    dispatcher.on_partial("what time is it")
+    _wait_until(lambda: responses.started)
+    assert responses.started == ["what time is it"]
+
+
+def test_new_stable_partial_reissues_the_speculation(loop):
+    responses = _Responses(delay=0.5)
+    dispatcher = SpeculativeDispatcher(loop, responses, stable_seconds=STABLE)
+    dispatcher.on_partial("play some")
+    _wait_until(lambda: len(responses.started) == 1)
+    dispatcher.on_partial("play some jazz")
+    _wait_until(lambda: dispatcher.stats['dispatched'] == 2)
+
+    assert responses.started == ["play some", "play some jazz"] and dispatcher.stats['reissued'] == 1
+    _wait_until(lambda: responses.cancelled == ["play some"])
+    assert dispatcher.resolve("play some jazz") is not None
+
+
+def test_same_partial_after_normalising_is_not_reissued(loop):
+    responses = _Responses()
+    dispatcher = SpeculativeDispatcher(loop, responses, stable_seconds=STABLE)
+    dispatcher.on_partial("hello there")
+    _wait_until(lambda: responses.started)
+    dispatcher.on_partial("Hello there.")
+    time.sleep(STABLE * 3)
+    assert responses.started == ["hello there"] and dispatcher.stats['reissued'] == 0
+
+
+def test_unsafe_requests_are_not_speculated(loop):
+    responses = _Responses()
+    dispatcher = SpeculativeDispatcher(loop, responses, stable_seconds=STABLE, can_speculate=lambda text: "open" not in text)
+    dispatcher.on_partial("open the browser")
+    time.sleep(STABLE * 3)
+    assert responses.started == []
+    assert dispatcher.resolve("open the browser") is None
+    assert dispatcher.stats['misses'] == 0 # Nothing was speculated, so nothing was missed
+
+
+def test_reset_cancels_pending_work(loop):
+    responses = _Responses(delay=0.5)
+    dispatcher = SpeculativeDispatcher(loop, responses, stable_seconds=STABLE)
+    dispatcher.on_partial("tell me a joke")
+    _wait_until(lambda: responses.started)
+    dispatcher.on_partial("tell me a joke about cats") # Timer armed again
+    dispatcher.reset()
+    time.sleep(STABLE * 3)
+    assert responses.started == ["tell me a joke"]
+    _wait_until(lambda: responses.cancelled == ["tell me a joke"])
+    assert dispatcher.resolve("tell me a joke") is None
@@ -0,0 +1,53 @@
+# tests/test_streaming_stt.py
+import os
+import socket
+
+import numpy as np
+import pytest
+
+from src.core.streaming_stt import StreamingRecognizer, create_streaming_recognizer
+
+
+@pytest.fixture
+def no_network(monkeypatch):
+    """Fails the test if anything tries to open a socket."""
+    def _refuse(*args, **kwargs):
+        raise AssertionError("streaming STT must not touch the network")
+    monkeypatch.setattr(socket, "socket", _refuse)
+    monkeypatch.setattr(socket, "create_connection", _refuse)
+
+
+def test_base_recognizer_is_abstract():
+    with pytest.raises(TypeError):
+        StreamingRecognizer()
+
+
+@pytest.mark.parametrize("settings", [
+    {'stt_engine': 'google'},
+    {'stt_engine': None},
+    {'stt_engine': 'vosk', 'vosk_model_path': None},
+    {'stt_engine': 'vosk', 'vosk_model_path': '/nonexistent/vosk-model'},
+    {'stt_engine': 'whisper'},
+])
+def test_falls_back_to_google_without_a_usable_backend(settings, no_network):
+    assert create_streaming_recognizer(settings) is None
+
+
+def test_falls_back_when_vosk_is_missing(tmp_path, no_network):
+    try:
+        import vosk # noqa: F401
+        pytest.skip("vosk is installed")
+    except ImportError:
+        pass
+    assert create_streaming_recognizer({'stt_engine': 'vosk', 'vosk_model_path': str(tmp_path)}) is None
+
+
+@pytest.mark.skipif(not os.environ.get("VOSK_MODEL_PATH"), reason="set VOSK_MODEL_PATH to a Vosk model directory")
+def test_vosk_transcribes_offline(no_network):
+    pytest.importorskip("vosk")
+    recognizer = create_streaming_recognizer({'stt_engine': 'vosk', 'vosk_model_path': os.environ["VOSK_MODEL_PATH"]})
+    assert recognizer is not None
+    recognizer.start()
+    for _ in range(10):
+        recognizer.accept(np.zeros(1600, dtype=np.int16))
+    assert recognizer.finish() == ""
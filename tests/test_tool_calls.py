@@ -0,0 +1,108 @@
+# tests/test_tool_calls.py
+import asyncio
+
+import pytest
+
+from src.core.tool_calls import ToolCallLayer
+
+
+class _SlowTool:
+    """Stands in for an MCP call that takes `delay` seconds."""
+
+    def __init__(self, delay=0.05, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return f"result {self.calls}"
+
+
+def test_identical_calls_share_one_request():
+    async def _run():
+        layer = ToolCallLayer(lambda server, tool: 60)
+        tool = _SlowTool()
+        results = await asyncio.gather(*(layer.call("s", "t", {"a": 1}, tool) for _ in range(3)))
+        cached = await layer.call("s", "t", {"a": 1}, tool)
+        return layer, tool, results, cached
+
+    layer, tool, results, cached = asyncio.run(_run())
+    assert tool.calls == 1
+    assert results == ["result 1"] * 3 and cached == "result 1"
+    assert layer.stats['shared_in_flight'] == 2 and layer.stats['cache_hits'] == 1
+    assert layer.histograms["s/t"].count == 1
+
+
+def test_cancelling_the_first_caller_does_not_cancel_the_others():
+    async def _run():
+        layer = ToolCallLayer(lambda server, tool: 60)
+        tool = _SlowTool()
+        leader = asyncio.ensure_future(layer.call("s", "t", {}, tool))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(layer.call("s", "t", {}, tool))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return layer, tool, await follower, leader
+
+    layer, tool, result, leader = asyncio.run(_run())
+    assert leader.cancelled()
+    assert result == "result 1" and tool.calls == 1
+    assert layer.stats['cancelled'] == 0
+
+
+def test_request_is_cancelled_once_every_caller_gave_up():
+    async def _run():
+        layer = ToolCallLayer(lambda server, tool: 60)
+        tool = _SlowTool()
+        callers = [asyncio.ensure_future(layer.call("s", "t", {}, tool)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        retry = await layer.call("s", "t", {}, tool)
+        return layer, tool, retry
+
+    layer, tool, retry = asyncio.run(_run())
+    assert layer.stats['cancelled'] == 1
+    assert tool.calls == 2 and retry == "result 2"
+    assert layer.histograms["s/t"].count == 1 # Only the completed call is timed
+
+
+def test_failures_reach_every_caller_and_are_not_timed():
+    async def _run():
+        layer = ToolCallLayer(lambda server, tool: 60)
+        tool = _SlowTool(error=ConnectionError("server went away"))
+        results = await asyncio.gather(*(layer.call("s", "t", {}, tool) for _ in range(2)), return_exceptions=True)
+        return layer, tool, results
+
+    layer, tool, results = asyncio.run(_run())
+    assert tool.calls == 1
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert layer.stats['failed'] == 1 and layer.histograms["s/t"].count == 0
+
+
+@pytest.mark.parametrize("ttl", [0, None])
+def test_uncached_tools_always_call_through(ttl):
+    async def _run():
+        layer = ToolCallLayer(lambda server, tool: ttl)
+        tool = _SlowTool(delay=0)
+        return tool, [await layer.call("s", "t", {}, tool) for _ in range(2)]
+
+    tool, results = asyncio.run(_run())
+    assert tool.calls == 2 and results == ["result 1", "result 2"]
+
+
+def test_clear_drops_cached_results():
+    async def _run():
+        layer = ToolCallLayer(lambda server, tool: 60)
+        tool = _SlowTool(delay=0)
+        first = await layer.call("s", "t", {}, tool)
+        layer.clear()
+        return first, await layer.call("s", "t", {}, tool)
+
+    assert asyncio.run(_run()) == ("result 1", "result 2")
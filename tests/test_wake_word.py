@@ -0,0 +1,76 @@
+# tests/test_wake_word.py
+import os
+import wave
+
+import numpy as np
+import pytest
+
+from src.config.settings import get_default_settings
+from src.core.wake_word import SAMPLE_RATE, TemplateWakeWordDetector, WakeWordDetector, benchmark_detector, create_wake_word_detector
+
+
+def _tones(frequencies, seconds_each=0.15, amplitude=8000):
+    """A sequence of pure tones, standing in for a spoken word with a fixed spectral trajectory."""
+    t = np.arange(int(seconds_each * SAMPLE_RATE)) / SAMPLE_RATE
+    return np.concatenate([amplitude * np.sin(2 * np.pi * f * t) for f in frequencies]).astype(np.int16)
+
+
+def _silence(seconds):
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.int16)
+
+
+def _noise(seconds, amplitude=50, seed=0):
+    return (np.random.default_rng(seed).normal(0, amplitude, int(seconds * SAMPLE_RATE))).astype(np.int16)
+
+
+WAKE = [400, 900, 1600, 700]
+
+
+def _write_wav(path, samples):
+    with wave.open(str(path), 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(samples.tobytes())
+
+
+def test_base_detector_is_abstract():
+    with pytest.raises(TypeError):
+        WakeWordDetector()
+
+
+def test_template_detector_matches_the_enrolled_word_only():
+    detector = TemplateWakeWordDetector([_tones(WAKE)])
+    # Spoken again: quieter, a little slower and over background noise.
+    spoken = _tones(WAKE, seconds_each=0.17, amplitude=3000) + _noise(0.68, amplitude=200, seed=2)
+    assert detector.detect(np.concatenate([_noise(0.5), spoken, _noise(0.3, seed=1)]))
+    assert not TemplateWakeWordDetector([_tones(WAKE)], threshold=0.0).detect(np.concatenate([_noise(0.5), spoken]))
+    assert not detector.detect(np.concatenate([_noise(0.5), _tones([2500, 300, 1200, 3000]), _noise(0.3, seed=1)]))
+    assert not detector.detect(_noise(2.0))
+
+
+def test_benchmark_detector_on_synthetic_fixtures(tmp_path):
+    for label in ('positive', 'negative'):
+        os.makedirs(tmp_path / label)
+    for i in range(3):
+        _write_wav(tmp_path / 'positive' / f'{i}.wav', np.concatenate([_silence(0.2 * i), _noise(0.3, seed=i), _tones(WAKE), _noise(0.3, seed=i + 10)]))
+        _write_wav(tmp_path / 'negative' / f'{i}.wav', np.concatenate([_noise(0.3, seed=i), _tones([3000 - 500 * i, 250, 2200, 1200]), _noise(0.3)]))
+
+    report = benchmark_detector(TemplateWakeWordDetector([_tones(WAKE)]), str(tmp_path))
+    assert (report['positives'], report['negatives']) == (3, 3)
+    assert report['false_rejects'] == 0
+    assert report['false_accepts'] == 0
+    assert len(report['detection_times']) == 3
+    assert report['real_time_factor'] < 1.0
+
+
+def test_settings_reach_the_detector(tmp_path):
+    _write_wav(tmp_path / 'wake.wav', _tones(WAKE))
+    settings = {**get_default_settings(), 'wake_word_templates': [str(tmp_path / 'wake.wav')]}
+    detector = create_wake_word_detector(settings)
+    assert detector.threshold == settings['wake_word_threshold']
+    assert detector.energy_threshold == settings['wake_word_energy_threshold']
+
+    loud_only = create_wake_word_detector({**settings, 'wake_word_energy_threshold': 20000.0})
+    assert loud_only.energy_threshold == 20000.0
+    assert not loud_only.detect(np.concatenate([_noise(0.5), _tones(WAKE), _noise(0.3, seed=1)])) # Never loud enough